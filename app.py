@@ -0,0 +1,6 @@
+# Entry point for hosts that run a script, such as Hugging Face Spaces; the
+# application itself is logviewer/app.py (`python -m logviewer.app`).
+from logviewer.app import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measures the throughput (MB/s) and peak RSS of the CLI's in-process mode.
+
+Usage:
+    python benchmarks/bench_cli_local.py --size-mb 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer.cli_app import process_log_locally  # noqa: E402
+from bench_line_store import write_log_of_size  # noqa: E402
+
+FILTERS = [
+    {"type": "Include Text", "value": "ERROR", "case_sensitive": True},
+    {"type": "Include Regex", "value": r"took \d{4} ms", "case_sensitive": True},
+    {"type": "Exclude Text", "value": "#", "case_sensitive": True},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local CLI mode.")
+    parser.add_argument("--size-mb", type=int, default=200, help="Synthetic log size in MB.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "bench.log")
+        filter_path = os.path.join(tmp, "filters.json")
+        write_log_of_size(log_path, args.size_mb)
+        with open(filter_path, "w") as f:
+            json.dump(FILTERS, f)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_log_locally(log_path, filter_path, os.path.join(tmp, "out.txt"))
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(log_path) / (1024 * 1024)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{size_mb:.0f} MB in {elapsed:.2f}s: {size_mb / elapsed:.1f} MB/s, peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures loading compressed logs: streaming decompression to a temporary
+file followed by indexing, per compression format.
+
+Usage:
+    python benchmarks/bench_compressed.py --lines 1000000
+"""
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.compression_utils import decompress_to_file  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from synthetic import write_log  # noqa: E402
+
+COMPRESSORS = {
+    "none": None,
+    "gzip": lambda data: gzip.compress(data, compresslevel=6),
+    "bz2": bz2.compress,
+    "xz": lzma.compress,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading compressed logs.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    try:
+        import zstandard
+        COMPRESSORS["zstd"] = zstandard.ZstdCompressor().compress
+    except ImportError:
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "bench.log")
+        write_log(plain, args.lines)
+        with open(plain, "rb") as f:
+            data = f.read()
+        size_mb = len(data) / 1024 / 1024
+
+        for name, compress in COMPRESSORS.items():
+            path = plain
+            if compress is not None:
+                path = os.path.join(tmp, f"bench.log.{name}")
+                with open(path, "wb") as f:
+                    f.write(compress(data))
+
+            start = time.perf_counter()
+            temporary = compress is not None
+            store = LineStore(decompress_to_file(path, tmp) if temporary else path, "bench.log", temporary=temporary)
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {len(store)} lines ({size_mb:.0f} MB, {os.path.getsize(path) / 1024 / 1024:.0f} MB on disk) "
+                  f"loaded in {elapsed:.2f}s ({size_mb / elapsed:.0f} MB/s)")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
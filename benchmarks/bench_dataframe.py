@@ -0,0 +1,73 @@
+"""
+Measures the time to turn a merged view into the log table's DataFrame:
+one dict per row plus a per-row strftime, as the app used to, against the
+columnar path of frame_utils.view_frame().
+
+Usage:
+    python benchmarks/bench_dataframe.py --lines 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.frame_utils import view_frame  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from logviewer.merge_utils import MergedView, sorted_run  # noqa: E402
+from synthetic import write_log  # noqa: E402
+from logviewer.timestamp_utils import from_epoch_ns  # noqa: E402
+
+
+def dict_frame(view):
+    # The previous approach: a list of per-row dicts, then strftime per row.
+    all_lines = [{"source": view.sources[s].source, "timestamp": from_epoch_ns(ts), "content": view.sources[s].line(i)}
+                 for ts, s, i in view]
+    df = pd.DataFrame(all_lines)
+    df["Timestamp"] = df["timestamp"].apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] if pd.notnull(x) else "")
+    df = df.rename(columns={"source": "File", "content": "Log Entry"})
+    return df[["File", "Timestamp", "Log Entry"]]
+
+
+def timed(build, view):
+    start = time.perf_counter()
+    df = build(view)
+    return df, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building the log table DataFrame.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = []
+        for n in range(args.files):
+            path = os.path.join(tmp, f"bench{n}.log")
+            write_log(path, args.lines // args.files, seed=n)
+            stores.append(LineStore(path, f"bench{n}.log"))
+        view = MergedView(stores, [sorted_run(store.timestamps, store.valid_indices()) for store in stores])
+
+        old, old_time = timed(dict_frame, view)
+        new, new_time = timed(view_frame, view)
+        assert old.astype(str).equals(new.astype(str))
+        print(f"{len(view)} rows from {args.files} files: per-row dicts {old_time:.2f}s, "
+              f"columnar {new_time:.2f}s ({old_time / new_time:.1f}x)")
+
+        page = view_frame(view, len(view) // 2, 500)
+        start = time.perf_counter()
+        for _ in range(20):
+            view_frame(view, len(view) // 2, 500)
+        print(f"one page of {len(page)} rows: {(time.perf_counter() - start) / 20 * 1000:.1f} ms")
+        for store in stores:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares cutting a date range out of filtered results with the previous
+per-line comparison against cutting it from cached time-ordered runs with
+two bisections per file.
+
+Usage:
+    python benchmarks/bench_date_range.py --files 5 --lines 1000000
+"""
+import argparse
+import array
+import bisect
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer.merge_utils import sorted_run  # noqa: E402
+
+
+def make_files(count, lines, seed=0):
+    rng = random.Random(seed)
+    files = []
+    for _ in range(count):
+        ts = 0
+        timestamps = array.array("q")
+        for _ in range(lines):
+            ts += rng.randint(0, 2_000_000)
+            timestamps.append(ts)
+        files.append(timestamps)
+    return files
+
+
+def linear_cut(files, start_ns, end_ns):
+    # The previous approach: compare every filtered line, then build the run.
+    total = 0
+    for timestamps in files:
+        processed = [i for i in range(len(timestamps)) if start_ns <= timestamps[i] <= end_ns]
+        keys, _ = sorted_run(timestamps, processed)
+        total += len(keys)
+    return total
+
+
+def bisect_cut(runs, start_ns, end_ns):
+    total = 0
+    for keys, indices in runs:
+        lo = bisect.bisect_left(keys, start_ns)
+        hi = bisect.bisect_right(keys, end_ns)
+        keys[lo:hi], indices[lo:hi]
+        total += hi - lo
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark date range queries.")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Lines per file.")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    files = make_files(args.files, args.lines)
+    runs = [sorted_run(timestamps, range(len(timestamps))) for timestamps in files]
+    end = max(timestamps[-1] for timestamps in files)
+    rng = random.Random(1)
+    ranges = [sorted((rng.randint(0, end), rng.randint(0, end))) for _ in range(args.queries)]
+
+    for name, fn, data in [("linear scan", linear_cut, files), ("bisection", bisect_cut, runs)]:
+        start = time.perf_counter()
+        rows = sum(fn(data, lo, hi) for lo, hi in ranges)
+        elapsed = (time.perf_counter() - start) / len(ranges)
+        print(f"{name}: {elapsed * 1000:.2f} ms per query over {args.files * args.lines} lines "
+              f"({rows // len(ranges)} rows on average)")
+
+
+if __name__ == "__main__":
+    main()
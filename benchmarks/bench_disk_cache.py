@@ -0,0 +1,46 @@
+"""
+Compares a cold load (parse and cache the index) with a warm load (hash the
+file and read the cached index) of the same log.
+
+Usage:
+    python benchmarks/bench_disk_cache.py --size-mb 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer import disk_cache  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from bench_line_store import write_log_of_size  # noqa: E402
+
+
+def load(path):
+    start = time.perf_counter()
+    index, = disk_cache.cached_index_files([path])
+    store = LineStore(path, os.path.basename(path), index=index)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return len(store), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the on-disk index cache.")
+    parser.add_argument("--size-mb", type=int, default=500, help="Synthetic log size in MB.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_cache.CACHE_DIR = os.path.join(tmp, "cache")
+        path = os.path.join(tmp, "bench.log")
+        write_log_of_size(path, args.size_mb)
+
+        lines, cold = load(path)
+        _, warm = load(path)
+        print(f"{args.size_mb} MB, {lines} lines: cold {cold:.2f}s, warm {warm:.2f}s ({cold / warm:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
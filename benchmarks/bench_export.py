@@ -0,0 +1,65 @@
+"""
+Measures exporting a merged view to a file in each format and compression,
+against building the whole text in memory first as the app used to.
+
+Usage:
+    python benchmarks/bench_export.py --lines 1000000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.export_utils import COMPRESSIONS, EXPORT_FORMATS, export_view  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from logviewer.merge_utils import MergedView, sorted_run  # noqa: E402
+from synthetic import write_log  # noqa: E402
+from logviewer.timestamp_utils import from_epoch_ns  # noqa: E402
+
+
+def concatenate(view, path):
+    # The previous approach: one string for the whole result, one strftime per row.
+    log_content = ""
+    for ts, s, i in view:
+        timestamp = from_epoch_ns(ts).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        log_content += f"[{view.sources[s].source}] [{timestamp}] {view.sources[s].line(i)}"
+    with open(path, "w") as f:
+        f.write(log_content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exporting the filtered view.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # zstd output needs the optional package
+    compressions = list(COMPRESSIONS)
+    if importlib.util.find_spec("zstandard") is None:
+        print("zstandard is not installed: skipping zstd compression")
+        compressions.remove("zstd")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.log")
+        write_log(path, args.lines)
+        store = LineStore(path, "export.log")
+        view = MergedView([store], [sorted_run(store.timestamps, store.valid_indices())])
+
+        start = time.perf_counter()
+        concatenate(view, os.path.join(tmp, "concatenated.txt"))
+        print(f"in-memory concatenation: {len(view)} rows in {time.perf_counter() - start:.2f}s")
+
+        for fmt in EXPORT_FORMATS:
+            for compression in compressions:
+                out, rows, seconds = export_view(view, fmt, compression, directory=tmp)
+                size = os.path.getsize(out) / 1024 / 1024
+                print(f"{fmt}, compression {compression}: {rows} rows in {seconds:.2f}s ({size:.0f} MB)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
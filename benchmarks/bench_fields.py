@@ -0,0 +1,62 @@
+"""
+Compares field filters on the parsed JSON columns of a log with the
+equivalent regex filter over the raw JSON lines.
+
+Usage:
+    python benchmarks/bench_fields.py --lines 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.filter_utils import compile_filters  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from synthetic import write_log  # noqa: E402
+
+QUERIES = [
+    ("levelname=ERROR", r'"levelname": "ERROR"'),
+    ("levelname=warning", r'(?i)"levelname": "warning"'),
+]
+
+
+def timed(plan, store, indices):
+    start = time.perf_counter()
+    matched = list(plan.apply(store, indices))
+    return matched, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON field filters against raw-line regexes.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.log")
+        write_log(path, args.lines, fmt="json")
+        store = LineStore(path, "bench.log")
+        indices = list(range(len(store)))
+
+        start = time.perf_counter()
+        store.fields()
+        print(f"Parsed {len(store)} lines into {len(store.fields().names())} field columns "
+              f"in {time.perf_counter() - start:.2f}s (once per file)")
+
+        for condition, regex in QUERIES:
+            case = condition == condition.lower()
+            field_plan = compile_filters([{"type": "Include Field", "value": condition, "case_sensitive": not case}])
+            regex_plan = compile_filters([{"type": "Include Regex", "value": regex, "case_sensitive": True}])
+            by_field, field_time = timed(field_plan, store, indices)
+            by_regex, regex_time = timed(regex_plan, store, indices)
+            assert by_field == by_regex, condition
+            print(f"{condition}: {len(by_field)} rows, field {field_time:.3f}s, "
+                  f"regex {regex_time:.3f}s ({regex_time / field_time:.1f}x)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Compares the compiled single-pass filter plan with the previous per-filter
+list rebuilds of `generate_merged_view` on synthetic logs, and with testing
+every rule separately as the growing number of filters is varied.
+
+Usage:
+    python benchmarks/bench_filter_engine.py --lines 2000000 --legacy-lines 20000 --sweep-lines 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer.filter_utils import FilterPlan, compile_filters, filter_lines  # noqa: E402
+from synthetic import generate_lines  # noqa: E402
+
+FILTERS = [
+    {"type": "Include Text", "value": "ERROR", "case_sensitive": True},
+    {"type": "Include Regex", "value": r"took \d{4} ms", "case_sensitive": True},
+    {"type": "Include Text", "value": "warning", "case_sensitive": False},
+    {"type": "Exclude Text", "value": "#", "case_sensitive": True},
+    {"type": "Exclude Regex", "value": r"\[cache\]", "case_sensitive": False},
+]
+
+
+def legacy_filter(lines, filters):
+    """The filtering loop `generate_merged_view` used before the filter plan."""
+    include_filters = [f for f in filters if "Include" in f["type"]]
+    exclude_filters = [f for f in filters if "Exclude" in f["type"]]
+    if include_filters:
+        included_content = set()
+        for f in include_filters:
+            if f["type"] == "Include Text":
+                included_content.update(filter_lines(lines, include_text=f["value"], case_sensitive=f["case_sensitive"]))
+            elif f["type"] == "Include Regex":
+                included_content.update(filter_lines(lines, include_regex=f["value"], case_sensitive=f["case_sensitive"]))
+        processed = [line for line in lines if line in included_content]
+    else:
+        processed = lines
+    for f in exclude_filters:
+        if f["type"] == "Exclude Text":
+            filtered = filter_lines(processed, exclude_text=f["value"], case_sensitive=f["case_sensitive"])
+        elif f["type"] == "Exclude Regex":
+            filtered = filter_lines(processed, exclude_regex=f["value"], case_sensitive=f["case_sensitive"])
+        else:
+            filtered = processed
+        processed = [line for line in processed if line in filtered]
+    return processed
+
+
+class PerRulePlan(FilterPlan):
+    """The filter plan before multi-pattern matching: every rule tested on its own."""
+
+    @staticmethod
+    def _rule_match(rules, line, lowered):
+        for kind, matcher, case in rules:
+            if kind == "text":
+                if matcher in (line if case else lowered):
+                    return True
+            elif matcher.search(line):
+                return True
+        return False
+
+    def __init__(self, filters):
+        super().__init__(filters)
+        self.needs_lower = any(kind == "text" and not case for kind, _, case in self.includes + self.excludes)
+
+    def matches(self, line):
+        if self.exclude_all:
+            return False
+        lowered = line.lower() if self.needs_lower else None
+        if self.has_includes and not self.include_all and not self._rule_match(self.includes, line, lowered):
+            return False
+        return not self._rule_match(self.excludes, line, lowered)
+
+
+def per_rule_filter(lines, filters):
+    plan = PerRulePlan(filters)
+    return [lines[i] for i in plan.apply(lines)]
+
+
+def sweep_filters(count, seed=0):
+    """
+    A filter list of `count` rules, like one accumulated while investigating an
+    incident: mostly case-insensitive text includes and excludes, a few regexes.
+    """
+    rng = random.Random(seed)
+    words = ["timeout", "refused", "deadlock", "retry", "checksum", "overflow", "denied", "latency",
+             "session", "upstream", "throttled", "evicted", "rollback", "handshake", "quota"]
+    filters = []
+    for k in range(count):
+        word = f"{rng.choice(words)}{k}" if k >= len(words) else words[k]
+        if k % 10 == 9:
+            filters.append({"type": "Include Regex", "value": rf"{word}\s+after \d+ ms", "case_sensitive": True})
+        elif k % 4 == 3:
+            filters.append({"type": "Exclude Text", "value": word.upper(), "case_sensitive": False})
+        else:
+            filters.append({"type": "Include Text", "value": word, "case_sensitive": False})
+    return filters
+
+
+def plan_filter(lines, filters):
+    plan = compile_filters(filters)
+    return [lines[i] for i in plan.apply(lines)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled filter plan.")
+    parser.add_argument("--lines", type=int, default=2_000_000, help="Lines for the filter plan run.")
+    parser.add_argument("--legacy-lines", type=int, default=20_000,
+                        help="Lines for the legacy run (its exclude step is quadratic).")
+    parser.add_argument("--sweep-lines", type=int, default=200_000,
+                        help="Lines for the run varying the number of filters.")
+    args = parser.parse_args()
+
+    legacy_lines = list(generate_lines(args.legacy_lines))
+    legacy_result, legacy_time = timed(legacy_filter, legacy_lines, FILTERS)
+    plan_result, plan_time = timed(plan_filter, legacy_lines, FILTERS)
+    assert legacy_result == plan_result, "filter plan diverged from the legacy semantics"
+    print(f"{args.legacy_lines} lines: legacy {legacy_time:.3f}s, plan {plan_time:.3f}s "
+          f"({legacy_time / plan_time:.1f}x), {len(plan_result)} lines kept")
+
+    lines = list(generate_lines(args.lines))
+    plan_result, plan_time = timed(plan_filter, lines, FILTERS)
+    print(f"{args.lines} lines: plan {plan_time:.3f}s "
+          f"({args.lines / plan_time / 1e6:.2f}M lines/s), {len(plan_result)} lines kept")
+
+    sweep_lines = list(generate_lines(args.sweep_lines, seed=1))
+    for count in (1, 5, 10, 20, 50, 100):
+        filters = sweep_filters(count)
+        rule_result, rule_time = timed(per_rule_filter, sweep_lines, filters)
+        plan_result, plan_time = timed(plan_filter, sweep_lines, filters)
+        assert rule_result == plan_result, "multi-pattern matching changed the result"
+        print(f"{count} filters over {len(sweep_lines)} lines: per rule {rule_time:.3f}s, "
+              f"plan {plan_time:.3f}s ({rule_time / plan_time:.1f}x), {len(plan_result)} lines kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures follow-mode throughput: lines appended to a log with a large history
+are indexed, filtered and added to the merged view without touching the
+history.
+
+Usage:
+    python benchmarks/bench_follow.py --history 1000000 --batch 20000 --batches 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.filter_cache import FilterCache  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from logviewer.merge_utils import MergedView  # noqa: E402
+from synthetic import generate_lines  # noqa: E402
+
+FILTERS = [
+    {"type": "Include Text", "value": "error", "case_sensitive": False},
+    {"type": "Include Regex", "value": r"user=\w+", "case_sensitive": True},
+    {"type": "Exclude Text", "value": "healthcheck", "case_sensitive": False},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark follow mode.")
+    parser.add_argument("--history", type=int, default=1_000_000, help="Lines in the file before following.")
+    parser.add_argument("--batch", type=int, default=20_000, help="Lines appended per refresh.")
+    parser.add_argument("--batches", type=int, default=10)
+    args = parser.parse_args()
+
+    lines = generate_lines(args.history + args.batch * args.batches, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "follow.log")
+        with open(path, "w") as f:
+            for _ in range(args.history):
+                f.write(next(lines))
+
+        store = LineStore(path, "follow.log", follow=True)
+        cache = FilterCache()
+        (keys, indices), _, _ = cache.lookup_run(store, FILTERS)
+        # Like the app, the view gets its own copy of the cached run
+        view = MergedView([store], [(keys[:], indices[:])])
+
+        elapsed = 0.0
+        for _ in range(args.batches):
+            with open(path, "a") as f:
+                for _ in range(args.batch):
+                    f.write(next(lines))
+            start = time.perf_counter()
+            first = store.refresh()
+            keys, indices = cache.extend(store, FILTERS, first)
+            view.extend(0, keys, indices)
+            elapsed += time.perf_counter() - start
+
+        appended = args.batch * args.batches
+        print(f"Appended {appended} lines to a {args.history}-line history in {elapsed:.2f}s "
+              f"({appended / elapsed:,.0f} lines/s), view has {len(view)} rows")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
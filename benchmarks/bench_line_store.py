@@ -0,0 +1,73 @@
+"""
+Measures resident memory of loading a log as per-line dicts (the previous
+`add_file` layout) versus the memory-mapped `LineStore`.
+
+Each mode runs in a fresh subprocess so peak RSS is not shared between them.
+
+Usage:
+    python benchmarks/bench_line_store.py --size-mb 100 --size-mb 1000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from synthetic import generate_lines  # noqa: E402
+
+
+def write_log_of_size(path, size_mb):
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w") as f:
+        for line in generate_lines(sys.maxsize):
+            f.write(line)
+            written += len(line)
+            if written >= target:
+                break
+
+
+def load(mode, path):
+    from logviewer.timestamp_utils import parse_timestamp
+    from logviewer.line_store import LineStore
+
+    start = time.perf_counter()
+    if mode == "dicts":
+        with open(path) as f:
+            lines = f.readlines()
+        data = [{"timestamp": parse_timestamp(line), "content": line, "source": "bench.log"} for line in lines]
+        count = len(data)
+    else:
+        data = LineStore(path, "bench.log")
+        count = len(data)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode}: {count} lines in {elapsed:.1f}s, peak RSS {peak_mb:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark line store memory use.")
+    parser.add_argument("--size-mb", type=int, action="append", help="Synthetic log size in MB (repeatable).")
+    parser.add_argument("--mode", action="append", choices=["dicts", "store"], help="Modes to run (repeatable).")
+    parser.add_argument("--load", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load(*args.load)
+        return
+
+    for size_mb in args.size_mb or [100]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.log")
+            write_log_of_size(path, size_mb)
+            print(f"--- {size_mb} MB log")
+            for mode in args.mode or ["dicts", "store"]:
+                subprocess.run([sys.executable, __file__, "--load", mode, path], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares the previous concatenate-and-sort of all filtered lines with the
+k-way merge of per-file sorted runs, in time and peak traced memory.
+
+Usage:
+    python benchmarks/bench_merge.py --files 12 --lines 200000
+"""
+import argparse
+import array
+import itertools
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer.merge_utils import merge_runs, timestamp_run  # noqa: E402
+
+
+def make_files(count, lines, seed=0):
+    rng = random.Random(seed)
+    files = []
+    for _ in range(count):
+        ts = rng.randint(0, 10 ** 9)
+        timestamps = array.array("q")
+        for _ in range(lines):
+            ts += rng.randint(0, 5_000_000)
+            timestamps.append(ts)
+        files.append(timestamps)
+    return files
+
+
+def global_sort(files):
+    rows = []
+    for s, timestamps in enumerate(files):
+        rows.extend((timestamps[i], s, i) for i in range(len(timestamps)))
+    rows.sort(key=lambda row: row[0])
+    return sum(1 for _ in rows)
+
+
+def kway_merge(files):
+    runs = [timestamp_run(timestamps, range(len(timestamps)), s) for s, timestamps in enumerate(files)]
+    return sum(1 for _ in merge_runs(runs))
+
+
+def kway_first_page(files, page_size=100):
+    runs = [timestamp_run(timestamps, range(len(timestamps)), s) for s, timestamps in enumerate(files)]
+    return sum(1 for _ in itertools.islice(merge_runs(runs), page_size))
+
+
+def measure(fn, files):
+    # Time and memory are measured in separate passes: tracing slows the run down.
+    start = time.perf_counter()
+    count = fn(files)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(files)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merging per-file runs.")
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--lines", type=int, default=200_000, help="Lines per file.")
+    args = parser.parse_args()
+
+    files = make_files(args.files, args.lines)
+    for name, fn in [("global sort", global_sort), ("k-way merge", kway_merge),
+                     ("k-way merge, first 100 rows", kway_first_page)]:
+        count, elapsed, peak = measure(fn, files)
+        print(f"{name}: {count} rows in {elapsed:.2f}s, peak traced memory {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures how ingestion and filtering scale with the number of worker processes.
+
+Usage:
+    python benchmarks/bench_parallel.py --size-mb 200 --files 4 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer import parallel  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from bench_line_store import write_log_of_size  # noqa: E402
+from bench_cli_local import FILTERS  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel ingestion and filtering.")
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of each synthetic log in MB.")
+    parser.add_argument("--files", type=int, default=1, help="Number of logs ingested together.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.files):
+            path = os.path.join(tmp, f"bench{n}.log")
+            write_log_of_size(path, args.size_mb)
+            paths.append(path)
+        total_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        print(f"{args.files} file(s), {total_mb:.0f} MB, {os.cpu_count()} CPUs")
+
+        baseline = {}
+        for workers in args.workers:
+            indexes, ingest_time = timed(parallel.index_files, paths, workers=workers)
+            stores = [LineStore(path, os.path.basename(path), index=index) for path, index in zip(paths, indexes)]
+            _, filter_time = timed(lambda: [parallel.filter_store(store, FILTERS, workers=workers) for store in stores])
+            _, cli_time = timed(lambda: [sum(map(len, parallel.filter_file_chunks(path, FILTERS, workers))) for path in paths])
+            baseline.setdefault("ingest", ingest_time)
+            baseline.setdefault("filter", filter_time)
+            baseline.setdefault("cli", cli_time)
+            print(f"workers={workers:2}: ingest {ingest_time:6.2f}s ({baseline['ingest'] / ingest_time:4.1f}x), "
+                  f"filter {filter_time:6.2f}s ({baseline['filter'] / filter_time:4.1f}x), "
+                  f"cli {cli_time:6.2f}s ({baseline['cli'] / cli_time:4.1f}x)")
+            for store in stores:
+                store.close()
+
+
+if __name__ == "__main__":
+    main()
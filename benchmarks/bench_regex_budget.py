@@ -0,0 +1,62 @@
+"""
+Measures the regex time budget: the cost of running risky regexes under the
+watchdog, and how long a pathological regex runs before it is stopped.
+
+A few lines of runaway input are mixed into synthetic logs; the risky regex
+is timed with and without the budget on the normal lines, then run on all of
+them with the budget.
+
+Usage:
+    python benchmarks/bench_regex_budget.py --lines 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer import filter_utils  # noqa: E402
+from logviewer.filter_utils import RegexTimeout, compile_filters  # noqa: E402
+from synthetic import generate_lines  # noqa: E402
+
+RISKY = [{"type": "Include Regex", "value": r"(\w+\s?)+ERROR", "case_sensitive": True}]
+# Contains the regex's required literal, so the regex runs, but cannot match:
+# every split of the word is tried before giving up
+RUNAWAY_LINE = "2024-01-01 00:00:00,000 " + "x" * 40 + "-ERROR\n"
+
+
+def timed_matches(plan, lines):
+    start = time.perf_counter()
+    with plan.budget():
+        kept = sum(1 for line in lines if plan.matches(line))
+    return kept, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the regex time budget.")
+    parser.add_argument("--lines", type=int, default=200_000)
+    args = parser.parse_args()
+
+    lines = list(generate_lines(args.lines, seed=1))
+    budget = filter_utils.REGEX_BUDGET_SECONDS
+
+    guarded = compile_filters(RISKY)
+    kept, guarded_time = timed_matches(guarded, lines)
+    filter_utils.REGEX_BUDGET_SECONDS = 0
+    kept, plain_time = timed_matches(compile_filters(RISKY), lines)
+    filter_utils.REGEX_BUDGET_SECONDS = budget
+    print(f"{RISKY[0]['value']!r} on {args.lines} lines, {kept} kept: plain {plain_time:.3f}s, "
+          f"guarded {guarded_time:.3f}s ({(guarded_time - plain_time) / args.lines * 1e9:+.0f} ns/line)")
+
+    start = time.perf_counter()
+    try:
+        timed_matches(guarded, lines[:len(lines) // 2] + [RUNAWAY_LINE] + lines[len(lines) // 2:])
+        print("The runaway line finished within the budget")
+    except RegexTimeout as e:
+        print(f"Stopped after {time.perf_counter() - start:.2f}s (budget {budget:g}s): {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Compares `parse_timestamp` with the format-specialised `TimestampParser` on
+synthetic logs in each supported timestamp format.
+
+Usage:
+    python benchmarks/bench_timestamp_parser.py --lines 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logviewer.timestamp_utils import TimestampParser, parse_timestamp, to_epoch_ns  # noqa: E402
+from synthetic import FORMATS, generate_lines  # noqa: E402
+
+
+def timed(fn, lines):
+    start = time.perf_counter()
+    result = [fn(line) for line in lines]
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark timestamp parsing.")
+    parser.add_argument("--lines", type=int, default=200_000, help="Lines per format.")
+    args = parser.parse_args()
+
+    for fmt in FORMATS:
+        lines = list(generate_lines(args.lines, fmt=fmt))
+        expected, chain_time = timed(lambda line: to_epoch_ns(parse_timestamp(line)), lines)
+        fast = TimestampParser.for_lines(lines)
+        result, fast_time = timed(fast.parse_ns, lines)
+        assert result == expected, f"{fmt}: fast path diverged from parse_timestamp"
+        print(f"{fmt:8} detected={fast.format:8} chain {args.lines / chain_time / 1e6:.2f}M lines/s, "
+              f"fast {args.lines / fast_time / 1e6:.2f}M lines/s ({chain_time / fast_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measures the token index of a log: its build time and size, and the latency
+of text and regex filters narrowed by it against a full scan.
+
+Usage:
+    python benchmarks/bench_token_index.py --lines 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from logviewer.filter_utils import compile_filters  # noqa: E402
+from logviewer.line_store import LineStore  # noqa: E402
+from logviewer.parallel import filter_store  # noqa: E402
+from synthetic import write_log  # noqa: E402
+
+QUERIES = [
+    {"type": "Include Text", "value": "ERROR", "case_sensitive": True},
+    {"type": "Include Text", "value": "database query", "case_sensitive": False},
+    {"type": "Include Text", "value": "user42 ", "case_sensitive": True},
+    {"type": "Include Text", "value": "job 1234", "case_sensitive": True},
+    {"type": "Include Regex", "value": r"retrying job \d+7 ", "case_sensitive": True},
+    {"type": "Include Regex", "value": r"took \d{4} ms", "case_sensitive": False},
+]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the token index against scanning every line.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the filtering.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.log")
+        write_log(path, args.lines)
+        store = LineStore(path, "bench.log")
+
+        index, build_time = timed(store.index_tokens)
+        size = os.path.getsize(path)
+        print(f"Indexed {len(store)} lines ({size / 1e6:.0f} MB) in {build_time:.2f}s: {len(index)} distinct tokens, "
+              f"{index.nbytes() / 1e6:.1f} MB ({index.nbytes() / size:.0%} of the file)")
+
+        for query in QUERIES:
+            indexed, indexed_time = timed(lambda: filter_store(store, [query], workers=args.workers))
+            candidates = index.candidates(compile_filters([query]))
+            store.token_index = None
+            scanned, scan_time = timed(lambda: filter_store(store, [query], workers=args.workers))
+            store.token_index = index
+            assert indexed == scanned, query
+            print(f"{query['type']} {query['value']!r}: {len(indexed)} rows from "
+                  f"{len(candidates) if candidates is not None else len(store)} candidates, "
+                  f"indexed {indexed_time * 1000:.1f} ms, scan {scan_time * 1000:.1f} ms "
+                  f"({scan_time / indexed_time:.1f}x)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
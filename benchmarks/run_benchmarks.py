@@ -0,0 +1,285 @@
+"""
+Benchmark suite for the hot paths of the web app, with machine-readable output.
+
+For every timestamp format it writes synthetic logs (see synthetic.py) and
+times, over several repetitions:
+
+* `parse_timestamp`: the generic parser and the per-format fast path, per line
+* `filter_lines`: one text filter over the lines of a file
+* `add_file`: uploading the files into a fresh session (index cache disabled
+  unless --disk-cache is given)
+* `generate_merged_view`: filtering and merging with the chosen filter mix,
+  cold (empty filter caches) and warm
+* `token_index_build`: building the token index of the files, with its size
+* `generate_merged_view_indexed`: the cold view again, with the token indexes
+* `show_timeline`: the histogram of the view (the first run builds the
+  timelines, the others reuse them)
+* `show_page`: rendering random pages of the view
+* `save_filtered_log`: exporting the whole view as plain text
+
+Each stage reports latency percentiles, throughput in lines per second and the
+process's peak RSS after the stage. `--json` writes everything to a file, and
+`--compare` prints the change against an earlier file.
+
+Usage:
+    python benchmarks/run_benchmarks.py --lines 200000 --files 2 --json results.json
+    python benchmarks/run_benchmarks.py --compare results.json --json new.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import FORMATS, write_log  # noqa: E402
+
+# Filter lists applied to every file by generate_merged_view; "field" only
+# has an effect on JSON logs.
+FILTER_MIXES = {
+    "none": [],
+    "text": [
+        {"type": "Include Text", "value": "ERROR", "case_sensitive": True},
+        {"type": "Include Text", "value": "warning", "case_sensitive": False},
+        {"type": "Exclude Text", "value": "heartbeat", "case_sensitive": True},
+    ],
+    "regex": [
+        {"type": "Include Regex", "value": r"took \d{4} ms", "case_sensitive": True},
+        {"type": "Exclude Regex", "value": r"user\d+5 ", "case_sensitive": False},
+    ],
+    "mixed": [
+        {"type": "Include Text", "value": "ERROR", "case_sensitive": True},
+        {"type": "Include Regex", "value": r"retrying job \d+", "case_sensitive": False},
+        {"type": "Exclude Text", "value": "cache", "case_sensitive": False},
+    ],
+    "many": [{"type": "Include Text", "value": f"user{n} ", "case_sensitive": True} for n in range(1, 101)],
+    "field": [
+        {"type": "Include Field", "value": "levelname=ERROR", "case_sensitive": True},
+        {"type": "Exclude Field", "value": "name=cache", "case_sensitive": True},
+    ],
+}
+
+# Lines timed one by one for the per-line stages.
+SAMPLE_LINES = 50_000
+
+
+class Upload:
+    # Stands in for the file objects Gradio passes to add_file.
+    def __init__(self, name):
+        self.name = name
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of this process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(stage, fmt, samples, lines):
+    """
+    Returns the result record of one stage from its latencies in seconds.
+
+    Args:
+        stage (str): Name of the stage.
+        fmt (str): Timestamp format of the logs.
+        samples (list): One latency per repetition.
+        lines (int): Lines processed per repetition, for the throughput.
+    """
+    ordered = sorted(samples)
+
+    def percentile(p):
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    median = statistics.median(ordered)
+    return {
+        "stage": stage,
+        "format": fmt,
+        "runs": len(ordered),
+        "lines": lines,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": median * 1000,
+        "p90_ms": percentile(90) * 1000,
+        "p99_ms": percentile(99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "lines_per_s": lines / median if median else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_format(app, fmt, paths, filters, repeat, rng):
+    from logviewer.filter_utils import filter_lines
+    from logviewer.timestamp_utils import TimestampParser, parse_timestamp
+
+    results = []
+    with open(paths[0]) as f:
+        sample = [line for line, _ in zip(f, range(SAMPLE_LINES))]
+
+    parser = TimestampParser(fmt)
+    for stage, parse in [("parse_timestamp", parse_timestamp), ("parse_timestamp_fast", parser.parse_ns)]:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in sample:
+                parse(line)
+            samples.append(time.perf_counter() - start)
+        results.append(summarize(stage, fmt, samples, len(sample)))
+
+    samples = [timed(lambda: filter_lines(sample, include_text="ERROR"))[1] for _ in range(repeat)]
+    results.append(summarize("filter_lines", fmt, samples, len(sample)))
+
+    uploads = [Upload(path) for path in paths]
+    samples = []
+    for _ in range(repeat):
+        state, elapsed = timed(lambda: app.add_file(uploads, {})[0])
+        samples.append(elapsed)
+        app.release_session(state)
+    state = app.add_file(uploads, {})[0]
+    total = sum(len(data["store"]) for _, data in app.file_items(state))
+    results.append(summarize("add_file", fmt, samples, total))
+
+    for _, data in app.file_items(state):
+        data["filters"] = list(filters)
+    cold = []
+    for _ in range(repeat):
+        for _, data in app.file_items(state):
+            data["cache"] = app.FilterCache()
+        cold.append(timed(app.generate_merged_view, state)[1])
+    results.append(summarize("generate_merged_view_cold", fmt, cold, total))
+    warm = [timed(app.generate_merged_view, state)[1] for _ in range(repeat)]
+    results.append(summarize("generate_merged_view_warm", fmt, warm, total))
+
+    stores = [data["store"] for _, data in app.file_items(state)]
+    samples = []
+    for _ in range(repeat):
+        for store in stores:
+            store.token_index = None
+        samples.append(timed(lambda: [store.index_tokens() for store in stores])[1])
+    record = summarize("token_index_build", fmt, samples, total)
+    record["index_bytes"] = sum(store.token_index.nbytes() for store in stores)
+    results.append(record)
+    indexed = []
+    for _ in range(repeat):
+        for _, data in app.file_items(state):
+            data["cache"] = app.FilterCache()
+        indexed.append(timed(app.generate_merged_view, state)[1])
+    results.append(summarize("generate_merged_view_indexed", fmt, indexed, total))
+
+    samples = [timed(app.show_timeline, state)[1] for _ in range(max(repeat, 20))]
+    results.append(summarize("show_timeline", fmt, samples, total))
+
+    view = state["_view"]
+    page_size = app.DEFAULT_PAGE_SIZE
+    pages = max((len(view) + page_size - 1) // page_size, 1)
+    samples = [timed(app.show_page, state, rng.randint(1, pages), page_size)[1] for _ in range(max(repeat, 20))]
+    results.append(summarize("show_page", fmt, samples, min(page_size, len(view))))
+
+    samples = []
+    for _ in range(repeat):
+        path, elapsed = timed(app.save_filtered_log, state, "Plain", "None")
+        samples.append(elapsed)
+        if path:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+    results.append(summarize("save_filtered_log", fmt, samples, len(view)))
+
+    app.release_session(state)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {(r["format"], r["stage"]): r for r in baseline or []}
+    print(f"{'format':8} {'stage':28} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'lines/s':>12} {'RSS MB':>8}")
+    for r in results:
+        line = (f"{r['format']:8} {r['stage']:28} {r['p50_ms']:10.2f} {r['p90_ms']:10.2f} {r['p99_ms']:10.2f} "
+                f"{r['lines_per_s'] or 0:12.0f} {r['peak_rss_mb']:8.0f}")
+        old = previous.get((r["format"], r["stage"]))
+        if old and old["p50_ms"]:
+            line += f"  {r['p50_ms'] / old['p50_ms'] - 1:+.0%} p50"
+        if "index_bytes" in r:
+            line += f"  index {r['index_bytes'] / 1024 / 1024:.1f} MB"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths on synthetic logs.")
+    parser.add_argument("--lines", type=int, default=200_000, help="Lines per file.")
+    parser.add_argument("--files", type=int, default=2, help="Files per format.")
+    parser.add_argument("--format", action="append", choices=FORMATS, help="Formats to run (repeatable). Defaults to all.")
+    parser.add_argument("--filters", choices=list(FILTER_MIXES), default="mixed", help="Filter mix for the merged view.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per stage.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--disk-cache", action="store_true", help="Keep the on-disk index cache enabled.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against.")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's log output.")
+    args = parser.parse_args()
+
+    if not args.disk_cache:
+        os.environ["LOGVIEWER_CACHE_DIR"] = ""
+    from logviewer import app
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.format or FORMATS:
+            paths = [write_log(os.path.join(tmp, f"bench-{fmt}-{n}.log"), args.lines, seed=args.seed + n, fmt=fmt)
+                     for n in range(args.files)]
+            results.extend(bench_format(app, fmt, paths, FILTER_MIXES[args.filters], args.repeat, rng))
+            for path in paths:
+                os.remove(path)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.json:
+        report = {
+            "meta": {
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "args": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
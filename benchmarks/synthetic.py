@@ -0,0 +1,65 @@
+"""
+Synthetic log generation shared by the benchmark scripts.
+"""
+import datetime
+import json
+import random
+
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+COMPONENTS = ["db", "http", "auth", "cache", "scheduler", "worker"]
+MESSAGES = [
+    "connection established to {host}",
+    "request {req} completed in {ms} ms",
+    "user {user} logged in",
+    "cache miss for key session:{req}",
+    "retrying job {req} after timeout",
+    "database query took {ms} ms",
+    "# heartbeat",
+]
+
+
+# The timestamp formats understood by `timestamp_utils.parse_timestamp`.
+FORMATS = ["iso", "syslog", "bracket", "json"]
+
+
+def format_line(fmt, ts, level, component, message):
+    """
+    Renders one log line with its timestamp in the given format.
+    """
+    if fmt == "iso":
+        return f"{ts.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} {level} [{component}] {message}\n"
+    if fmt == "syslog":
+        return f"{ts.strftime('%b %d %H:%M:%S')} host {component}: {level} {message}\n"
+    if fmt == "bracket":
+        return f"[{ts.strftime('%Y-%b-%d %H:%M:%S.%f')}] {level} [{component}] {message}\n"
+    if fmt == "json":
+        return json.dumps({"asctime": ts.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3], "levelname": level,
+                           "name": component, "message": message}) + "\n"
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def generate_lines(count, seed=0, start=None, step_ms=7, fmt="iso"):
+    """
+    Yields `count` timestamped log lines in time order.
+    """
+    rng = random.Random(seed)
+    ts = start or datetime.datetime(2024, 1, 1)
+    step = datetime.timedelta(milliseconds=step_ms)
+    for _ in range(count):
+        message = rng.choice(MESSAGES).format(
+            host=f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+            req=rng.randint(1000, 99999),
+            ms=rng.randint(1, 5000),
+            user=f"user{rng.randint(1, 500)}",
+        )
+        yield format_line(fmt, ts, rng.choice(LEVELS), rng.choice(COMPONENTS), message)
+        ts += step
+
+
+def write_log(path, count, seed=0, fmt="iso"):
+    """
+    Writes a synthetic log file with `count` lines and returns its path.
+    """
+    with open(path, "w") as f:
+        f.writelines(generate_lines(count, seed=seed, fmt=fmt))
+    return path
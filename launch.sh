@@ -9,5 +9,5 @@
 # Get the directory where this script is located.
 SCRIPT_DIR=$(dirname -- "$0")
 
-# Run the main application file.
-python "$SCRIPT_DIR/logviewer/app.py"
\ No newline at end of file
+# Run the web app as a module of the logviewer package.
+cd "$SCRIPT_DIR" && python -m logviewer.app
\ No newline at end of file
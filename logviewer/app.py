@@ -1,46 +1,127 @@
 import gradio as gr
+import array
+import bisect
+import importlib.util
+import itertools
 import json
 import logging
 import os
+import numpy as np
 import pandas as pd
 import datetime
-from filter_utils import filter_lines
-from timestamp_utils import parse_timestamp, get_timestamp_range, filter_by_time_range
+from .compression_utils import decompress_to_file, detect_compression, remove_quietly
+from .dataset_registry import REGISTRY
+from .disk_cache import cached_index_files, file_digest
+from .export_utils import COMPRESSIONS, EXPORT_FORMATS, export_view
+from .field_utils import sniff_fields
+from .filter_cache import FilterCache
+from .filter_utils import compile_filters, regex_status
+from .frame_utils import build_frame, merged_columns, view_frame
+from .line_store import LineStore
+from .merge_utils import MergedView
+from .metrics import METRICS_PORT, Timings, serve_metrics
+from .parallel import profile_store
+from .timeline import bar_layout, width_label
+from .timestamp_utils import NO_TIMESTAMP, SNIFF_LINES, from_epoch_ns, to_epoch_ns
+from .token_index import TOKEN_INDEX
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# State keys that hold view settings rather than a loaded file
+RESERVED_KEYS = {"_date_range", "_view", "_timings"}
+
+PAGE_SIZES = [100, 500, 1000, 5000]
+DEFAULT_PAGE_SIZE = 500
+
+# Lines scanned per file for the first page shown while a view is recomputed
+PREVIEW_MAX_LINES = 200_000
+
+# Directories whose files may be followed by path on the server, separated by
+# os.pathsep; following is disabled when empty.
+FOLLOW_DIRS = [os.path.realpath(d) for d in os.environ.get("LOGVIEWER_FOLLOW_DIRS", "").split(os.pathsep) if d]
+FOLLOW_INTERVAL = float(os.environ.get("LOGVIEWER_FOLLOW_INTERVAL", 1.0))
+
+# zstd output is only offered when the optional package is installed
+EXPORT_COMPRESSIONS = [c for c in COMPRESSIONS if c != "zstd" or importlib.util.find_spec("zstandard")]
+
+def file_items(state):
+    return [(filename, data) for filename, data in state.items() if filename not in RESERVED_KEYS]
+
+def session_timings(state):
+    return state.setdefault("_timings", Timings())
+
 def add_file(files, state):
+    timings = session_timings(state)
     if files:
+        new_files = {}
         for file in files:
             filename = os.path.basename(file.name)
-            if filename not in state:
-                with open(file.name) as f:
-                    lines = f.readlines()
-                
-                logging.info(f"Read {len(lines)} lines from {filename}")
-                
-                parsed_lines = []
-                for line in lines:
-                    parsed_lines.append({
-                        "timestamp": parse_timestamp(line),
-                        "content": line,
-                        "source": filename
-                    })
-                state[filename] = {"lines": parsed_lines, "filters": []}
-
-    # After adding new files, recalculate the total date range
-    all_lines_content = []
-    for filename, data in state.items():
-        if filename != "_date_range":
-            all_lines_content.extend([line["content"] for line in data["lines"]])
-    
-    if all_lines_content:
-        min_ts, max_ts = get_timestamp_range(all_lines_content)
+            if filename not in state and filename not in new_files:
+                new_files[filename] = file.name
+
+        # Compressed logs are decompressed, in a streaming fashion, to
+        # temporary files owned by their stores so they can be mapped
+        temporary = set()
+        with timings.stage("read", detail=f"{len(new_files)} files") as entry:
+            for filename, path in new_files.items():
+                if detect_compression(path):
+                    new_files[filename] = decompress_to_file(path)
+                    temporary.add(filename)
+                    logging.info(f"Decompressed {filename} to {new_files[filename]}")
+
+            # Logs another session already opened are shared through the
+            # registry; only the others are loaded
+            keys = {filename: (file_digest(path), filename) for filename, path in new_files.items()}
+            entry["detail"] += f", {len(temporary)} decompressed"
+        stores = {}
+        for filename, path in new_files.items():
+            store = REGISTRY.acquire(keys[filename])
+            if store is not None:
+                if filename in temporary:
+                    remove_quietly(path)
+                logging.info(f"Sharing the loaded {filename} with other sessions")
+                stores[filename] = store
+        misses = [filename for filename in new_files if filename not in stores]
+
+        # Index all new files at once so they are parsed in parallel, reusing
+        # indexes cached on disk for files that were opened before
+        with timings.stage("parse", detail=f"{len(misses)} files, {len(stores)} shared") as entry:
+            indexes = cached_index_files([new_files[filename] for filename in misses],
+                                         digests=[keys[filename][0] for filename in misses])
+            for filename, index in zip(misses, indexes):
+                store = LineStore(new_files[filename], filename, index=index, temporary=filename in temporary)
+                logging.info(f"Read {len(store)} lines from {filename} ({store.nbytes()} bytes of index)")
+                stores[filename] = REGISTRY.add(keys[filename], store)
+            entry["detail"] += f", {sum(len(stores[filename]) for filename in misses)} lines"
+
+        # Token indexes make later text searches look up candidate lines
+        # instead of scanning every line
+        if TOKEN_INDEX:
+            for filename in misses:
+                store = stores[filename]
+                if store.token_index is None:
+                    with timings.stage("token_index", f"token index {filename}") as entry:
+                        index = store.index_tokens()
+                        entry["detail"] = f"{len(index)} tokens, {index.nbytes()} bytes"
+                    logging.info(f"Indexed {len(index)} distinct tokens of {filename} in {index.nbytes()} bytes")
+
+        for filename in new_files:
+            state[filename] = {"store": stores[filename], "filters": [], "cache": FilterCache(), "dataset": keys[filename]}
+        REGISTRY.enforce(keep=keys.values())
+
+    # After adding new files, recalculate the total date range from the stored timestamps
+    ranges = [data["store"].time_range() for filename, data in file_items(state)]
+    starts = [start for start, end in ranges if start is not None]
+    ends = [end for start, end in ranges if end is not None]
+
+    if starts:
+        min_ts, max_ts = min(starts), max(ends)
         state["_date_range"] = {"start": min_ts, "end": max_ts}
         logging.info(f"Recalculated date range: {min_ts} to {max_ts}")
     
-    file_selector_update = gr.update(choices=list(state.keys()), value=list(state.keys())[0] if state else None)
-    selected_file = list(state.keys())[0] if state else None
+    filenames = [filename for filename, data in file_items(state)]
+    file_selector_update = gr.update(choices=filenames, value=filenames[0] if filenames else None)
+    selected_file = filenames[0] if filenames else None
     
     filter_list_update = update_filter_list(selected_file, state)
 
@@ -49,12 +130,47 @@ def add_file(files, state):
 
     return state, file_selector_update, filter_list_update, start_date_update, end_date_update
 
+def follow_files(paths, state):
+    for path in (p.strip() for p in (paths or "").replace("\n", ",").split(",")):
+        if not path:
+            continue
+        real_path = os.path.realpath(path)
+        if not any(os.path.commonpath([real_path, d]) == d for d in FOLLOW_DIRS):
+            gr.Warning(f"{path} is not in a directory allowed by LOGVIEWER_FOLLOW_DIRS")
+            continue
+        if not os.path.isfile(real_path):
+            gr.Warning(f"{path} is not a file")
+            continue
+        filename = os.path.basename(real_path)
+        if filename in state:
+            continue
+        store = LineStore(real_path, filename, follow=True)
+        logging.info(f"Following {real_path} from line {len(store)}")
+        state[filename] = {"store": store, "filters": [], "cache": FilterCache()}
+
+    # The end of the range is left open so that appended lines stay in view
+    outputs = add_file(None, state)
+    state.setdefault("_date_range", {})["end"] = None
+    return outputs[:4] + (gr.update(value=None), gr.Timer(active=True))
+
+def stop_following():
+    return gr.Timer(active=False)
+
 def select_file(selected_file, state):
     if selected_file and selected_file in state:
         filter_list_update = update_filter_list(selected_file, state)
         return filter_list_update
     return gr.update(choices=[])
 
+def show_fields(selected_file, state):
+    if selected_file and selected_file in state:
+        store = state[selected_file]["store"]
+        if store.timestamp_format == "json":
+            names = sniff_fields(store.lines(range(min(len(store), SNIFF_LINES))))
+            return (f"**Fields:** {', '.join(f'`{name}`' for name in names)}. Field filters look like "
+                    "`levelname=ERROR`, `status=500..599` or `duration_ms>=250`.")
+    return ""
+
 def add_filter(state, selected_file, filter_type, filter_value, case_sensitive):
     if selected_file and filter_value:
         state[selected_file]["filters"].append({"type": filter_type, "value": filter_value, "case_sensitive": case_sensitive})
@@ -115,106 +231,205 @@ def generate_merged_view(state):
 
     logging.info(f"Generating merged view with start_date: {start_date}, end_date: {end_date}")
 
-    all_lines = []
-    for filename, data in state.items():
-        if filename == "_date_range":
-            continue
-        
-        original_lines = data["lines"]
+    start_ns = to_epoch_ns(start_date) if start_date else None
+    end_ns = to_epoch_ns(end_date) if end_date else None
+
+    timings = session_timings(state)
+    runs = []
+    stores = []
+    total = 0
+    cache_outcomes = {"hit": 0, "narrowed": 0, "miss": 0}
+    seconds_saved = 0.0
+    for filename, data in file_items(state):
+        store = data["store"]
         filters = data["filters"]
 
-        # Ignore lines with invalid timestamps from the start
-        valid_lines = [line for line in original_lines if line["timestamp"] is not None]
-
-        include_filters = [f for f in filters if "Include" in f["type"]]
-        exclude_filters = [f for f in filters if "Exclude" in f["type"]]
-
-        # Apply include filters to get the base set of lines
-        if include_filters:
-            included_content = set()
-            for f in include_filters:
-                filter_type = f["type"]
-                value = f["value"]
-                case = f["case_sensitive"]
-                
-                # Always filter from the original valid lines
-                content_lines = [line["content"] for line in valid_lines]
-                
-                if filter_type == "Include Text":
-                    filtered_content = filter_lines(content_lines, include_text=value, case_sensitive=case)
-                elif filter_type == "Include Regex":
-                    filtered_content = filter_lines(content_lines, include_regex=value, case_sensitive=case)
-                else:
-                    filtered_content = []
-                
-                included_content.update(filtered_content)
-            
-            processed_lines = [line for line in valid_lines if line["content"] in included_content]
-        else:
-            # If no include filters, start with all valid lines
-            processed_lines = valid_lines
-
-        # Apply exclude filters on the result of includes
-        for f in exclude_filters:
-            filter_type = f["type"]
-            value = f["value"]
-            case = f["case_sensitive"]
-            
-            content_lines = [line["content"] for line in processed_lines]
-
-            if filter_type == "Exclude Text":
-                filtered_content = filter_lines(content_lines, exclude_text=value, case_sensitive=case)
-            elif filter_type == "Exclude Regex":
-                filtered_content = filter_lines(content_lines, exclude_regex=value, case_sensitive=case)
-            else:
-                # Should not happen for exclude filters, but as a safeguard:
-                filtered_content = content_lines
-            
-            processed_lines = [line for line in processed_lines if line["content"] in filtered_content]
-
-        logging.info(f"Filtered {filename} from {len(original_lines)} to {len(processed_lines)} lines")
-        all_lines.extend(processed_lines)
-
-    if not all_lines:
-        return pd.DataFrame(columns=["File", "Timestamp", "Log Entry"])
-
-    logging.info(f"Total lines before date range filter: {len(all_lines)}")
-
-    # Apply date range filter
-    if start_date or end_date:
-        all_lines = [line for line in all_lines if (isinstance(line["timestamp"], datetime.datetime) and \
-                                                    (start_date is None or line["timestamp"] >= start_date) and \
-                                                    (end_date is None or line["timestamp"] <= end_date))]
-
-    logging.info(f"Total lines after date range filter: {len(all_lines)}")
-
-    # Sort lines by timestamp
-    all_lines.sort(key=lambda x: x["timestamp"])
-
-    logging.info(f"Total lines after merging and sorting: {len(all_lines)}")
-
-    df = pd.DataFrame(all_lines)
-    if not df.empty:
-        df["Timestamp"] = df["timestamp"].apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] if pd.notnull(x) else "")
-        df = df.rename(columns={"source": "File", "content": "Log Entry"})
-        return df[["File", "Timestamp", "Log Entry"]]
-    else:
-        return pd.DataFrame(columns=["File", "Timestamp", "Log Entry"])
+        # Lines with invalid timestamps are ignored; results for unchanged
+        # filter sets are reused and added excludes only narrow them. The
+        # result comes back as a time-ordered run for the k-way merge.
+        with timings.stage("filter", f"filter {filename}") as entry:
+            (keys, indices), outcome, saved = data["cache"].lookup_run(store, filters)
+            entry["detail"] = f"cache {outcome}, {len(indices)} of {len(store)} lines"
+        cache_outcomes[outcome] += 1
+        seconds_saved += saved
+
+        logging.info(f"Filtered {filename} from {len(store)} to {len(indices)} lines (cache {outcome})")
+
+        # A regex stopped for overrunning its time budget is treated as invalid
+        for f in filters:
+            if regex_status(f, data["cache"].stopped) == "stopped":
+                logging.warning(f"{filename}: {f['type']} {f['value']!r} was stopped as pathological")
+                gr.Warning(f"{filename}: the regex `{f['value']}` took too long on a line and was stopped; "
+                           f"it is treated as invalid in this session until you remove it")
+
+        # Cut the date range with two bisections on the run's timestamps
+        with timings.stage("date_range", f"date range {filename}") as entry:
+            lo = bisect.bisect_left(keys, start_ns) if start_ns is not None else 0
+            hi = bisect.bisect_right(keys, end_ns) if end_ns is not None else len(keys)
+            entry["detail"] = f"{hi - lo} of {len(keys)} lines"
+        runs.append((keys[lo:hi], indices[lo:hi]))
+        stores.append(store)
+        total += hi - lo
+
+    logging.info(f"Filter cache: {cache_outcomes['hit']} hits, {cache_outcomes['narrowed']} narrowed, "
+                 f"{cache_outcomes['miss']} misses, ~{seconds_saved:.3f}s saved")
+    logging.info(f"Total lines after date range filter: {total}")
+
+    # The view only keeps the sorted runs; pages are merged on demand
+    state["_view"] = MergedView(stores, runs)
+
+    datasets = [data["dataset"] for filename, data in file_items(state) if "dataset" in data]
+    REGISTRY.touch(datasets)
+    REGISTRY.enforce(keep=datasets)
+
+    return (state,) + show_page(state, 1, DEFAULT_PAGE_SIZE)
+
+def preview_page(state, page_size):
+    date_range = state.get("_date_range", {})
+    start_date, end_date = date_range.get("start"), date_range.get("end")
+    start_ns = to_epoch_ns(start_date) if isinstance(start_date, datetime.datetime) else None
+    end_ns = to_epoch_ns(end_date) if isinstance(end_date, datetime.datetime) else None
+
+    # In time-ordered files the earliest matches come first, so scanning
+    # the start of every file gives the first rows of the merged view
+    # without filtering the whole files. Rows at or after the point where
+    # a scan stopped early may still be preceded by unscanned lines.
+    runs, stores = [], []
+    cutoff = None
+    for filename, data in file_items(state):
+        store = data["store"]
+        plan = compile_filters(data["filters"], data["cache"].stopped)
+        # Risky regexes can only be stopped in a worker, which the full filtering uses
+        if plan.has_field_rules or plan.has_unguarded_regexes or not store.is_time_ordered():
+            return None
+        timestamps = store.timestamps
+        first = store.first_at_or_after(start_ns) if start_ns is not None else 0
+        stop = min(first + PREVIEW_MAX_LINES, len(store))
+        candidates = [i for i in range(first, stop)
+                      if timestamps[i] != NO_TIMESTAMP and (end_ns is None or timestamps[i] <= end_ns)]
+        matches = list(itertools.islice(plan.apply(store, candidates), page_size))
+        last = next((timestamps[i] for i in range(stop - 1, first - 1, -1) if timestamps[i] != NO_TIMESTAMP), None)
+        if len(matches) < page_size and stop < len(store) and (end_ns is None or last is None or last <= end_ns):
+            if last is None:
+                return None
+            cutoff = last if cutoff is None else min(cutoff, last)
+        runs.append((array.array("q", (timestamps[i] for i in matches)), array.array("q", matches)))
+        stores.append(store)
+
+    if cutoff is not None:
+        runs = [(keys[:bisect.bisect_left(keys, cutoff)], indices[:bisect.bisect_left(keys, cutoff)]) for keys, indices in runs]
+    view = MergedView(stores, runs)
+    if not len(view):
+        return None
+    df = view_frame(view, 0, page_size)
+    return df, 1, f"Rows 1–{len(df)} of … (filtering, the full result follows)"
+
+def recompute_view(state):
+    # Runs as a generator so that Gradio can cancel it between steps when a
+    # newer edit supersedes it; a first page is shown as soon as possible
+    items = file_items(state)
+    if not all(data["cache"].has(data["filters"]) for filename, data in items):
+        preview = preview_page(state, DEFAULT_PAGE_SIZE)
+        if preview is not None:
+            yield (state,) + preview
+        for filename, data in items:
+            # Filter one file per step; the results land in the file's cache
+            data["cache"].lookup_run(data["store"], data["filters"])
+            yield gr.skip(), gr.skip(), gr.skip(), gr.skip()
+    yield generate_merged_view(state)
+
+def follow_tick(state, page, page_size):
+    view = state.get("_view")
+    if view is None:
+        return state, gr.skip(), gr.skip(), gr.skip()
+
+    start_ns, end_ns = [to_epoch_ns(value) if isinstance(value, datetime.datetime) else None
+                        for value in (state.get("_date_range", {}).get("start"), state.get("_date_range", {}).get("end"))]
+    page_size = int(page_size or DEFAULT_PAGE_SIZE)
+    at_end = int(page or 1) >= (len(view) + page_size - 1) // page_size
+    appended = 0
+    for filename, data in file_items(state):
+        store = data["store"]
+        if not store.follow:
+            continue
+        first = store.refresh()
+        if first is None:
+            # Truncated or rotated: start over on the new file
+            logging.info(f"{filename} was truncated or replaced, reopening it")
+            store.close()
+            data["store"] = LineStore(store.path, filename, follow=True)
+            data["cache"] = FilterCache()
+            return generate_merged_view(state)
+        if first == len(store):
+            continue
 
+        # Only the appended lines are parsed and filtered
+        run = data["cache"].extend(store, data["filters"], first)
+        if run is None or store not in view.sources:
+            return generate_merged_view(state)
+        keys, indices = run
+        lo = bisect.bisect_left(keys, start_ns) if start_ns is not None else 0
+        hi = bisect.bisect_right(keys, end_ns) if end_ns is not None else len(keys)
+        view.extend(view.sources.index(store), keys[lo:hi], indices[lo:hi])
+        appended += hi - lo
+        logging.info(f"Appended {len(store) - first} lines to {filename}, {hi - lo} shown")
+
+    if not appended:
+        return state, gr.skip(), gr.skip(), gr.skip()
+    # Stay at the end of the log if that is where the user was
+    if at_end:
+        page = (len(view) + page_size - 1) // page_size
+    return (state,) + show_page(state, page, page_size)
+
+def show_page(state, page, page_size):
+    view = state.get("_view")
+    page_size = int(page_size or DEFAULT_PAGE_SIZE)
+    total = len(view) if view is not None else 0
+    page_count = max((total + page_size - 1) // page_size, 1)
+    page = min(max(int(page or 1), 1), page_count)
+
+    if view is None:
+        df = pd.DataFrame(columns=["File", "Timestamp", "Log Entry"])
+    else:
+        timings = session_timings(state)
+        with timings.stage("merge", detail=f"page {page}"):
+            columns = merged_columns(view, (page - 1) * page_size, page_size)
+        with timings.stage("dataframe", detail=f"{len(columns[0])} rows"):
+            df = build_frame(view, *columns)
+
+    first = (page - 1) * page_size + 1 if total else 0
+    last = min(page * page_size, total)
+    info = f"Rows {first}–{last} of {total} (page {page} of {page_count})"
+    return df, page, info
+
+def previous_page(state, page, page_size):
+    return show_page(state, int(page or 1) - 1, page_size)
+
+def next_page(state, page, page_size):
+    return show_page(state, int(page or 1) + 1, page_size)
+
+def jump_to_timestamp(state, jump_date, page_size):
+    view = state.get("_view")
+    jump_date = to_datetime(jump_date)
+    if view is None or jump_date is None:
+        return show_page(state, 1, page_size)
+    page_size = int(page_size or DEFAULT_PAGE_SIZE)
+    row = view.rank(to_epoch_ns(jump_date))
+    return show_page(state, row // page_size + 1, page_size)
+
+def to_datetime(value):
+    if isinstance(value, (int, float)):
+        value = datetime.datetime.fromtimestamp(value)
+    if not isinstance(value, datetime.datetime):
+        return None
+    return value
 
 def update_date_range(start_date, end_date, state):
     logging.info(f"Received start_date: {start_date} (type: {type(start_date)}), end_date: {end_date} (type: {type(end_date)})")
 
-    if isinstance(start_date, (int, float)):
-        start_date = datetime.datetime.fromtimestamp(start_date)
-    if isinstance(end_date, (int, float)):
-        end_date = datetime.datetime.fromtimestamp(end_date)
-
     # Ensure start_date and end_date are datetime objects or None
-    if not isinstance(start_date, datetime.datetime):
-        start_date = None
-    if not isinstance(end_date, datetime.datetime):
-        end_date = None
+    start_date = to_datetime(start_date)
+    end_date = to_datetime(end_date)
 
     state["_date_range"] = {"start": start_date, "end": end_date}
     logging.info(f"Date range updated to: {start_date} - {end_date}")
@@ -241,17 +456,100 @@ def load_filters(selected_file, state, filter_file):
             state[selected_file]["filters"] = json.load(f)
     return state
 
-def save_filtered_log(log_data):
-    if not log_data.empty:
-        log_content = ""
-        for index, row in log_data.iterrows():
-            log_content += f"[{row['File']}] [{row['Timestamp']}] {row['Log Entry']}"
-        
-        with open("filtered_log.txt", "w") as f:
-            f.write(log_content)
-        return "filtered_log.txt"
+def save_filtered_log(state, export_format, compression):
+    view = state.get("_view")
+    if view is not None and len(view):
+        # Rows are streamed from the line stores to a file of this export's own
+        timings = session_timings(state)
+        stages = {}
+        with timings.stage("export", detail=f"{export_format}, {compression}") as entry:
+            path, rows, seconds = export_view(view, export_format or "Plain", compression or "None", stages=stages)
+            entry["detail"] += f", {rows} rows"
+        # The export's split between producing the rows and serialising them
+        timings.record("export_rows", stages["rows"], "export rows", f"{rows} rows")
+        timings.record("serialise", stages["serialise"], detail=f"{export_format}, {compression}")
+        logging.info(f"Exported {rows} rows to {path} in {seconds:.2f}s")
+        return path
     return None
 
+def release_session(state):
+    for filename, data in file_items(state):
+        if "dataset" in data:
+            REGISTRY.release(data["dataset"])
+        else:
+            # Followed logs are not shared through the registry; the session owns them
+            data["store"].close()
+
+def show_memory_usage():
+    return pd.DataFrame(REGISTRY.usage(), columns=["Dataset", "Digest", "Sessions", "Lines", "Memory (MB)", "Loaded"])
+
+def show_timings(state):
+    timings = state.get("_timings")
+    if timings is None or not timings.stages:
+        return "No timings yet."
+    lines = ["| Stage | ms | Details |", "|---|---:|---|"]
+    lines += [f"| {label} | {seconds * 1000:.1f} | {detail} |" for label, (seconds, detail) in timings.stages.items()]
+    # Profiles of filter lists that have changed since are left out
+    profiled = [(filename, entry) for filename, profile in timings.filters.items()
+                if filename in state and [entry["filter"] for entry in profile] == state[filename]["filters"]
+                for entry in profile]
+    if profiled:
+        lines += ["", "Filters timed alone on a sample, slowest first:", "",
+                  "| File | Filter | Est. ms | Matched/removed | Regex |", "|---|---|---:|---:|---|"]
+        for filename, entry in sorted(profiled, key=lambda item: -item[1]["seconds"]):
+            f = entry["filter"]
+            value = f["value"].replace("|", "\\|")
+            selectivity = "–" if entry["selectivity"] is None else f"{entry['selectivity']:.1%}"
+            lines.append(f"| {filename} | {f['type']}: `{value}` | {entry['seconds'] * 1000:.1f} | "
+                         f"{selectivity} | {entry['status']} |")
+    return "\n".join(lines)
+
+def profile_session_filters(state):
+    # The plan runs all filters in one pass; on request each filter is timed
+    # alone on a sample of the lines, outside the filtering it would slow down
+    timings = session_timings(state)
+    for filename, data in file_items(state):
+        if data["filters"]:
+            with timings.stage("profile", f"profile {filename}", f"{len(data['filters'])} filters"):
+                timings.filters[filename] = profile_store(data["store"], data["filters"],
+                                                               stopped=data["cache"].stopped)
+    return show_timings(state)
+
+def show_timeline(state):
+    items = file_items(state)
+    if not all(data["cache"].has(data["filters"]) for filename, data in items):
+        # A recompute is still filtering; its final page updates the plot
+        return gr.skip()
+    with session_timings(state).stage("timeline", detail=f"{len(items)} files") as entry:
+        timelines = [(data["store"].source, data["cache"].timeline(data["store"], data["filters"]))
+                     for filename, data in items]
+        timelines = [(source, timeline) for source, timeline in timelines if len(timeline)]
+        date_range = state.get("_date_range", {})
+        start_date, end_date = date_range.get("start"), date_range.get("end")
+        start_ns = to_epoch_ns(start_date) if isinstance(start_date, datetime.datetime) else None
+        end_ns = to_epoch_ns(end_date) if isinstance(end_date, datetime.datetime) else None
+        if not timelines:
+            return gr.update(value=pd.DataFrame(columns=["Time", "Lines", "File"]))
+
+        # Each file's bars come from its precomputed bucket counts
+        low = start_ns if start_ns is not None else min(timeline.first for _, timeline in timelines)
+        high = end_ns if end_ns is not None else max(timeline.last for _, timeline in timelines)
+        first, width, bars = bar_layout(low, max(high, low))
+        times = (first + np.arange(bars, dtype=np.int64) * width).astype("datetime64[ns]")
+        df = pd.DataFrame({
+            "Time": np.tile(times, len(timelines)),
+            "Lines": np.concatenate([timeline.histogram(first, width, bars, start_ns, end_ns)
+                                     for _, timeline in timelines]),
+            "File": np.repeat([source for source, _ in timelines], bars),
+        })
+        entry["detail"] += f", {bars} bars of {width_label(width)}"
+    return gr.update(value=df, y_title=f"Lines per {width_label(width)}")
+
+def select_time_range(selection: gr.SelectData):
+    # The plot reports the selected interval in epoch seconds
+    start, end = selection.index
+    return from_epoch_ns(int(start * 1e9)), from_epoch_ns(int(end * 1e9))
+
 def show_regex_help():
     gr.Info("""
     **Regular Expression Quick Guide**
@@ -269,170 +567,255 @@ def show_regex_help():
     **Example:** `^ERROR.*database` will find lines starting with "ERROR" that also contain "database".
     """)
 
-with gr.Blocks(theme=gr.themes.Soft(), css="#log_content .gr-dataframe { font-family: monospace; } .gradio-toast { max-width: 500px !important; }") as demo:
-    files_state = gr.State({})
-
-    gr.Markdown("## Log File Viewer")
-
-    with gr.Row():
-        file_input = gr.File(label="Upload Log File(s)", file_count="multiple")
-        file_selector = gr.Dropdown(label="Select Log File")
-
-    gr.Markdown("### Filters")
-
-    with gr.Row(elem_id="filter_row"):
-        filter_type = gr.Dropdown([
-            "Include Text", "Exclude Text", "Include Regex", "Exclude Regex"
-        ], label="Filter Type")
-        filter_value = gr.Textbox(label="Filter Value", scale=4)
-        with gr.Column(scale=0, min_width=50):
-            help_button = gr.Button("?", scale=0)
-        case_sensitive_checkbox = gr.Checkbox(label="Case Sensitive", value=True)
-        with gr.Column(scale=0):
-            add_filter_button = gr.Button("Add Filter")
-            save_filters_button = gr.Button("Save Filters")
-            load_filters_file = gr.UploadButton("Load Filters (.json)", file_types=[".json"])
-
-    with gr.Row():
-        applied_filters_list = gr.Radio(label="Applied Filters", interactive=True)
-        remove_filter_button = gr.Button("Remove Selected Filter")
-        move_up_button = gr.Button("Move Up")
-        move_down_button = gr.Button("Move Down")
-
-    gr.Markdown("### Date Range Filter")
-    with gr.Row():
-        start_date_input = gr.DateTime(label="Start Date")
-        end_date_input = gr.DateTime(label="End Date")
-
-    with gr.Row():
-        save_filtered_log_button = gr.Button("Save Filtered Log")
-    
-    log_table = gr.DataFrame(headers=["File", "Timestamp", "Log Entry"], interactive=False, elem_id="log_content")
-
-    # Event Handlers
-    help_button.click(show_regex_help, inputs=None, outputs=None)
-    
-    file_input.upload(
-        add_file,
-        inputs=[file_input, files_state],
-        outputs=[files_state, file_selector, applied_filters_list, start_date_input, end_date_input]
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    file_selector.change(
-        select_file,
-        inputs=[file_selector, files_state],
-        outputs=[applied_filters_list]
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    start_date_input.change(
-        update_date_range,
-        inputs=[start_date_input, end_date_input, files_state],
-        outputs=files_state
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    end_date_input.change(
-        update_date_range,
-        inputs=[start_date_input, end_date_input, files_state],
-        outputs=files_state
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    add_filter_button.click(
-        add_filter,
-        inputs=[files_state, file_selector, filter_type, filter_value, case_sensitive_checkbox],
-        outputs=[files_state, filter_value]
-    ).then(
-        update_filter_list,
-        inputs=[file_selector, files_state],
-        outputs=applied_filters_list
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    remove_filter_button.click(
-        remove_filter,
-        inputs=[files_state, file_selector, applied_filters_list],
-        outputs=[files_state, applied_filters_list]
-    ).then(
-        update_filter_list,
-        inputs=[file_selector, files_state],
-        outputs=applied_filters_list
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    move_up_button.click(
-        move_filter_up,
-        inputs=[files_state, file_selector, applied_filters_list],
-        outputs=[files_state, applied_filters_list]
-    ).then(
-        update_filter_list,
-        inputs=[file_selector, files_state],
-        outputs=applied_filters_list
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    move_down_button.click(
-        move_filter_down,
-        inputs=[files_state, file_selector, applied_filters_list],
-        outputs=[files_state, applied_filters_list]
-    ).then(
-        update_filter_list,
-        inputs=[file_selector, files_state],
-        outputs=applied_filters_list
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    save_filters_button.click(
-        save_filters,
-        inputs=[file_selector, files_state],
-        outputs=gr.File(label="Download Filter File")
-    )
-
-    load_filters_file.upload(
-        load_filters,
-        inputs=[file_selector, files_state, load_filters_file],
-        outputs=files_state
-    ).then(
-        update_filter_list,
-        inputs=[file_selector, files_state],
-        outputs=applied_filters_list
-    ).then(
-        generate_merged_view,
-        inputs=[files_state],
-        outputs=log_table
-    )
-
-    save_filtered_log_button.click(
-        save_filtered_log,
-        inputs=log_table,
-        outputs=gr.File(label="Download Filtered Log")
-    )
+def build_ui():
+    with gr.Blocks(theme=gr.themes.Soft(), css="#log_content .gr-dataframe { font-family: monospace; } .gradio-toast { max-width: 500px !important; }") as demo:
+        # Loaded logs live in the shared registry; a session only holds references
+        files_state = gr.State({}, delete_callback=release_session)
+
+        gr.Markdown("## Log File Viewer")
+
+        with gr.Row():
+            file_input = gr.File(label="Upload Log File(s)", file_count="multiple")
+            file_selector = gr.Dropdown(label="Select Log File")
+
+        gr.Markdown("### Filters")
+
+        with gr.Row(elem_id="filter_row"):
+            filter_type = gr.Dropdown([
+                "Include Text", "Exclude Text", "Include Regex", "Exclude Regex", "Include Field", "Exclude Field"
+            ], label="Filter Type")
+            filter_value = gr.Textbox(label="Filter Value", scale=4)
+            with gr.Column(scale=0, min_width=50):
+                help_button = gr.Button("?", scale=0)
+            case_sensitive_checkbox = gr.Checkbox(label="Case Sensitive", value=True)
+            with gr.Column(scale=0):
+                add_filter_button = gr.Button("Add Filter")
+                save_filters_button = gr.Button("Save Filters")
+                load_filters_file = gr.UploadButton("Load Filters (.json)", file_types=[".json"])
+
+        fields_info = gr.Markdown()
+
+        with gr.Row():
+            applied_filters_list = gr.Radio(label="Applied Filters", interactive=True)
+            remove_filter_button = gr.Button("Remove Selected Filter")
+            move_up_button = gr.Button("Move Up")
+            move_down_button = gr.Button("Move Down")
+
+        if FOLLOW_DIRS:
+            gr.Markdown("### Follow Server Logs")
+            with gr.Row():
+                follow_paths_input = gr.Textbox(label="Log Paths", placeholder=", ".join(FOLLOW_DIRS), scale=4)
+                follow_button = gr.Button("Follow")
+                stop_following_button = gr.Button("Stop Following")
+            follow_timer = gr.Timer(FOLLOW_INTERVAL, active=False)
+
+        gr.Markdown("### Date Range Filter")
+        with gr.Row():
+            start_date_input = gr.DateTime(label="Start Date")
+            end_date_input = gr.DateTime(label="End Date")
+        timeline_plot = gr.BarPlot(x="Time", y="Lines", color="File", label="Timeline (select a span to set the date range)",
+                                   x_title="Time", y_title="Lines", height=220)
+
+        with gr.Row():
+            export_format_dropdown = gr.Dropdown(list(EXPORT_FORMATS), value="Plain", label="Export Format")
+            export_compression_dropdown = gr.Dropdown(EXPORT_COMPRESSIONS, value="None", label="Compression")
+            save_filtered_log_button = gr.Button("Save Filtered Log")
+
+        with gr.Row():
+            previous_page_button = gr.Button("Previous Page")
+            page_number = gr.Number(label="Page", value=1, precision=0, minimum=1)
+            next_page_button = gr.Button("Next Page")
+            page_size_dropdown = gr.Dropdown(PAGE_SIZES, value=DEFAULT_PAGE_SIZE, label="Rows per Page")
+            jump_date_input = gr.DateTime(label="Jump to Timestamp")
+
+        view_info = gr.Markdown()
+        log_table = gr.DataFrame(headers=["File", "Timestamp", "Log Entry"], interactive=False, elem_id="log_content")
+
+        with gr.Accordion("Server Memory", open=False):
+            memory_table = gr.DataFrame(interactive=False)
+            refresh_memory_button = gr.Button("Refresh")
+
+        with gr.Accordion("Timings", open=False):
+            timings_info = gr.Markdown()
+            profile_filters_button = gr.Button("Profile Filters")
+
+        view_outputs = [files_state, log_table, page_number, view_info]
+        page_inputs = [files_state, page_number, page_size_dropdown]
+        page_outputs = [log_table, page_number, view_info]
+
+        # Event Handlers
+        help_button.click(show_regex_help, inputs=None, outputs=None)
+        refresh_memory_button.click(show_memory_usage, inputs=None, outputs=memory_table)
+        log_table.change(show_timings, inputs=files_state, outputs=timings_info)
+        profile_filters_button.click(profile_session_filters, inputs=files_state, outputs=timings_info)
+        log_table.change(show_timeline, inputs=files_state, outputs=timeline_plot)
+        timeline_plot.select(select_time_range, inputs=None, outputs=[start_date_input, end_date_input])
+
+        upload_event = file_input.upload(
+            add_file,
+            inputs=[file_input, files_state],
+            outputs=[files_state, file_selector, applied_filters_list, start_date_input, end_date_input]
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        file_selector.change(show_fields, inputs=[file_selector, files_state], outputs=fields_info)
+
+        select_event = file_selector.change(
+            select_file,
+            inputs=[file_selector, files_state],
+            outputs=[applied_filters_list]
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        start_date_event = start_date_input.change(
+            update_date_range,
+            inputs=[start_date_input, end_date_input, files_state],
+            outputs=files_state,
+            trigger_mode="always_last"
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        end_date_event = end_date_input.change(
+            update_date_range,
+            inputs=[start_date_input, end_date_input, files_state],
+            outputs=files_state,
+            trigger_mode="always_last"
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        add_filter_event = add_filter_button.click(
+            add_filter,
+            inputs=[files_state, file_selector, filter_type, filter_value, case_sensitive_checkbox],
+            outputs=[files_state, filter_value]
+        ).then(
+            update_filter_list,
+            inputs=[file_selector, files_state],
+            outputs=applied_filters_list
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        remove_filter_event = remove_filter_button.click(
+            remove_filter,
+            inputs=[files_state, file_selector, applied_filters_list],
+            outputs=[files_state, applied_filters_list]
+        ).then(
+            update_filter_list,
+            inputs=[file_selector, files_state],
+            outputs=applied_filters_list
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        move_up_event = move_up_button.click(
+            move_filter_up,
+            inputs=[files_state, file_selector, applied_filters_list],
+            outputs=[files_state, applied_filters_list]
+        ).then(
+            update_filter_list,
+            inputs=[file_selector, files_state],
+            outputs=applied_filters_list
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        move_down_event = move_down_button.click(
+            move_filter_down,
+            inputs=[files_state, file_selector, applied_filters_list],
+            outputs=[files_state, applied_filters_list]
+        ).then(
+            update_filter_list,
+            inputs=[file_selector, files_state],
+            outputs=applied_filters_list
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        save_filters_button.click(
+            save_filters,
+            inputs=[file_selector, files_state],
+            outputs=gr.File(label="Download Filter File")
+        )
+
+        load_filters_event = load_filters_file.upload(
+            load_filters,
+            inputs=[file_selector, files_state, load_filters_file],
+            outputs=files_state
+        ).then(
+            update_filter_list,
+            inputs=[file_selector, files_state],
+            outputs=applied_filters_list
+        ).then(
+            recompute_view,
+            inputs=[files_state],
+            outputs=view_outputs
+        )
+
+        save_filtered_log_button.click(
+            save_filtered_log,
+            inputs=[files_state, export_format_dropdown, export_compression_dropdown],
+            outputs=gr.File(label="Download Filtered Log")
+        )
+
+        if FOLLOW_DIRS:
+            follow_button.click(
+                follow_files,
+                inputs=[follow_paths_input, files_state],
+                outputs=[files_state, file_selector, applied_filters_list, start_date_input, end_date_input, follow_timer]
+            ).then(
+                generate_merged_view,
+                inputs=[files_state],
+                outputs=view_outputs
+            )
+            stop_following_button.click(stop_following, inputs=None, outputs=follow_timer)
+            follow_timer.tick(follow_tick, inputs=page_inputs, outputs=view_outputs)
+
+        # An edit cancels the recomputes still running for earlier edits, so
+        # rapid changes do not queue up full recomputes; date changes made
+        # while one is pending are coalesced into the last one
+        recompute_events = [upload_event, select_event, start_date_event, end_date_event, add_filter_event,
+                            remove_filter_event, move_up_event, move_down_event, load_filters_event]
+        for trigger in [file_input.upload, file_selector.change, start_date_input.change, end_date_input.change,
+                        add_filter_button.click, remove_filter_button.click, move_up_button.click,
+                        move_down_button.click, load_filters_file.upload]:
+            trigger(None, cancels=recompute_events)
+
+        page_number.submit(show_page, inputs=page_inputs, outputs=page_outputs)
+        page_size_dropdown.change(show_page, inputs=page_inputs, outputs=page_outputs)
+        previous_page_button.click(previous_page, inputs=page_inputs, outputs=page_outputs)
+        next_page_button.click(next_page, inputs=page_inputs, outputs=page_outputs)
+        jump_date_input.change(
+            jump_to_timestamp,
+            inputs=[files_state, jump_date_input, page_size_dropdown],
+            outputs=page_outputs
+        )
+
+    return demo
+
+def main():
+    if METRICS_PORT:
+        serve_metrics(int(METRICS_PORT))
+    build_ui().launch(server_name="0.0.0.0", server_port=7860)
 
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
+    main()
@@ -0,0 +1,335 @@
+import fnmatch
+import glob
+import heapq
+import io
+import itertools
+import json
+import operator
+import os
+import struct
+import sys
+import tempfile
+import time
+from .compression_utils import open_decompressed, remove_quietly, strip_compression_suffix
+from .export_utils import BATCH_ROWS, format_timestamp, open_output, write_batches
+from .filter_utils import compile_filters
+from .line_store import normalize_newline
+from .timestamp_utils import NO_TIMESTAMP, SNIFF_LINES, TimestampParser
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+# Bytes of filtered lines held in memory while forming sorted runs.
+MEMORY_BYTES = 256 * 1024 * 1024
+
+# Estimated memory of one held line beyond its text (the heap entry, its
+# tuple and integers).
+RECORD_OVERHEAD = 200
+
+# Most runs merged at once; more runs are first merged into fewer in extra
+# passes, so open files and read buffers stay bounded.
+MAX_FAN_IN = 64
+
+# Read and write buffer of every run file.
+RUN_BUFFER_BYTES = 256 * 1024
+
+# Run file record header: timestamp, file number, line number, text length.
+_HEADER = struct.Struct("<qIQI")
+
+
+def expand_inputs(inputs) -> list[str]:
+    """
+    Expands log files, directories and glob patterns into a list of files.
+
+    Directories contribute the files directly inside them and patterns their
+    matches (`**` matches subdirectories), each in name order; files listed
+    twice are kept once.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [os.path.join(item, name) for name in sorted(os.listdir(item))]
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            matches = [item]
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return list(dict.fromkeys(paths))
+
+
+def load_filter_mapping(path: str) -> list[tuple[str, list]]:
+    """
+    Reads the filters to apply per file in a batch.
+
+    The file holds either a filter list, in the format written by
+    `save_filters`, which applies to every file, or an object mapping file
+    name patterns (e.g. `"web-*.log"`) to a filter list or to the path of a
+    filter file, relative to the mapping file. Patterns are matched against
+    the file name without a compression suffix, then against the whole path;
+    the first matching pattern wins and `"*"` catches the remaining files.
+
+    Returns:
+        list: `(pattern, filters)` pairs, in file order.
+    """
+    with open(path) as f:
+        mapping = json.load(f)
+    if isinstance(mapping, list):
+        return [("*", mapping)]
+    rules = []
+    for pattern, filters in mapping.items():
+        if isinstance(filters, str):
+            with open(os.path.join(os.path.dirname(path), filters)) as f:
+                filters = json.load(f)
+        rules.append((pattern, filters))
+    return rules
+
+
+def filters_for(path: str, rules) -> list | None:
+    """Returns the filters of the first rule matching `path`, or None if no rule matches."""
+    name = strip_compression_suffix(os.path.basename(path))
+    for pattern, filters in rules:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern):
+            return filters
+    return None
+
+
+def filter_records(lines, filters, file_number: int = 0):
+    """
+    Lazily applies a filter list to log lines, keeping their timestamps.
+
+    Lines without a parseable timestamp are dropped and the rest are matched
+    with a compiled `FilterPlan`, like the merged view does. The timestamp
+    format is sniffed from the first lines, the only ones held in memory.
+
+    Args:
+        lines (iterable): The log lines, e.g. an open text file.
+        filters (list): Filter dictionaries in the format written by `save_filters`.
+        file_number (int, optional): Stored in the records, to order lines of
+                                     different files with equal timestamps.
+
+    Returns:
+        generator: `(timestamp, file_number, line_number, line)` records of
+                   the lines that pass, in file order.
+    """
+    lines = iter(lines)
+    head = list(itertools.islice(lines, SNIFF_LINES))
+    parse_ns = TimestampParser.for_lines(head).parse_ns
+    plan = compile_filters(filters)
+    matches = plan.matches
+    with plan.budget():
+        for number, line in enumerate(itertools.chain(head, lines)):
+            ts = parse_ns(line)
+            if ts != NO_TIMESTAMP and matches(line):
+                yield ts, file_number, number, line
+
+
+def _encode(records) -> bytes:
+    # Run file bytes of records whose lines are str or bytes
+    pack = _HEADER.pack
+    parts = []
+    for ts, file_number, number, line in records:
+        data = line.encode("utf-8") if isinstance(line, str) else line
+        parts.append(pack(ts, file_number, number, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def _write_run(records, directory: str) -> str:
+    # Writes records that are in order to a new run file
+    fd, path = tempfile.mkstemp(prefix="logviewer-run-", suffix=".bin", dir=directory)
+    with os.fdopen(fd, "wb", buffering=RUN_BUFFER_BYTES) as f:
+        while batch := list(itertools.islice(records, BATCH_ROWS)):
+            f.write(_encode(batch))
+    return path
+
+
+def read_run(path: str):
+    """Yields the `(timestamp, file_number, line_number, line_bytes)` records of a run file."""
+    with open(path, "rb", buffering=RUN_BUFFER_BYTES) as f:
+        read, unpack, size = f.read, _HEADER.unpack, _HEADER.size
+        while header := read(size):
+            ts, file_number, number, length = unpack(header)
+            yield ts, file_number, number, read(length)
+
+
+def _held_bytes(records) -> int:
+    # Estimated memory of held records
+    return sum(map(len, map(operator.itemgetter(3), records))) + RECORD_OVERHEAD * len(records)
+
+
+def spill_runs(records, memory_bytes: int = MEMORY_BYTES, directory: str = None) -> list[str]:
+    """
+    Sorts records of any length into run files, holding at most about `memory_bytes` of lines.
+
+    Uses replacement selection in blocks: when the held records fill the
+    budget they are sorted and the earlier half is appended to the current
+    run. Records arriving later than the last one written join the held
+    ones, earlier records wait for the next run, which starts once they are
+    all that is held. Input in time order therefore becomes a single run
+    however large it is, lines out of order by less than half the budget do
+    not break a run, and shuffled input gives runs of at least the budget.
+
+    Args:
+        records (iterable): `(timestamp, file_number, line_number, line)` tuples.
+        memory_bytes (int, optional): Budget for held lines. Defaults to MEMORY_BYTES.
+        directory (str, optional): Where to write the runs. Defaults to the
+                                   system temporary directory.
+
+    Returns:
+        list: Paths of the run files, each sorted; the caller removes them.
+    """
+    held = []
+    waiting = []
+    held_bytes = 0
+    runs = []
+    output = None
+    last = None
+
+    def write(batch):
+        nonlocal output, last
+        if output is None:
+            fd, path = tempfile.mkstemp(prefix="logviewer-run-", suffix=".bin", dir=directory)
+            output = os.fdopen(fd, "wb", buffering=RUN_BUFFER_BYTES)
+            runs.append(path)
+        output.write(_encode(batch))
+        last = batch[-1]
+
+    def end_run():
+        nonlocal output, last, held, waiting
+        output.close()
+        output, last = None, None
+        held, waiting = waiting, []
+
+    try:
+        for record in records:
+            (waiting if last is not None and record < last else held).append(record)
+            held_bytes += len(record[3]) + RECORD_OVERHEAD
+            while held_bytes > memory_bytes:
+                if not held:
+                    end_run()
+                    continue
+                held.sort()
+                half = held[:max(len(held) // 2, 1)]
+                del held[:len(half)]
+                write(half)
+                held_bytes -= _held_bytes(half)
+        while held or waiting:
+            if held:
+                held.sort()
+                write(held)
+            end_run()
+    except BaseException:
+        for path in runs:
+            remove_quietly(path)
+        raise
+    finally:
+        if output is not None:
+            output.close()
+    return runs
+
+
+def merge_spilled(runs, directory: str = None, fan_in: int = MAX_FAN_IN):
+    """
+    Merges sorted run files with a k-way merge of at most `fan_in` runs at a time.
+
+    Groups of runs are merged into new run files until at most `fan_in`
+    remain; merged runs are removed as soon as they are consumed.
+
+    Returns:
+        tuple: `(records, passes)`: an iterator over the merged records and
+               the number of intermediate merge passes. The caller removes
+               the files in `runs` once the iterator is exhausted.
+    """
+    passes = 0
+    while len(runs) > fan_in:
+        merged = []
+        for first in range(0, len(runs), fan_in):
+            group = runs[first:first + fan_in]
+            merged.append(_write_run(heapq.merge(*map(read_run, group)), directory))
+            for path in group:
+                remove_quietly(path)
+        runs[:] = merged
+        passes += 1
+    return heapq.merge(*map(read_run, runs)), passes
+
+
+def peak_rss_mb() -> float | None:
+    """Returns the peak resident set size of this process so far, in MB (None where unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def batch_merge(paths, rules, output_path: str, fmt: str = "Plain", compression: str = "None",
+                memory_bytes: int = MEMORY_BYTES, directory: str = None) -> dict:
+    """
+    Filters many logs and writes their lines as one time-ordered file, in bounded memory.
+
+    Each file is streamed (decompressing it on the fly) through its filters
+    from `rules`; files no rule matches are skipped. The kept lines are
+    sorted into runs on disk by `spill_runs()`, which are then merged by
+    `merge_spilled()`, so memory depends on `memory_bytes` and the merge
+    fan-in, not on the size of the logs. Lines with equal timestamps keep
+    the order of `paths`, then file order, like the merged view.
+
+    Args:
+        paths (list): The log files.
+        rules (list): `(pattern, filters)` pairs from `load_filter_mapping()`.
+        output_path (str): The merged file to write.
+        fmt (str, optional): One of `export_utils.EXPORT_FORMATS`. Defaults to "Plain".
+        compression (str, optional): One of `export_utils.COMPRESSIONS`. Defaults to "None".
+        memory_bytes (int, optional): Budget for lines held while sorting.
+                                      Defaults to MEMORY_BYTES.
+        directory (str, optional): Where to spill the runs. Defaults to the
+                                   system temporary directory.
+
+    Returns:
+        dict: Statistics of the run: files, skipped files, input bytes,
+              lines read and written, runs, spilled bytes, merge passes,
+              seconds and peak RSS in MB.
+    """
+    start = time.perf_counter()
+    selected = [(path, filters_for(path, rules)) for path in paths]
+    skipped = [path for path, filters in selected if filters is None]
+    selected = [(path, filters) for path, filters in selected if filters is not None]
+    names = [os.path.basename(path) for path, _ in selected]
+    stats = {"files": len(selected), "skipped": skipped, "input_bytes": sum(os.path.getsize(p) for p, _ in selected),
+             "lines_read": 0, "lines_written": 0}
+
+    def records():
+        for number, (path, filters) in enumerate(selected):
+            # Lines end at LF only, as in the web view and the CLI's other modes
+            with io.TextIOWrapper(open_decompressed(path), encoding="utf-8", errors="replace",
+                                  newline="\n") as log_file:
+                # Lines are counted by pairing them with a counter, in C
+                counter = itertools.count()
+                lines = map(normalize_newline, map(operator.itemgetter(0), zip(log_file, counter)))
+                yield from filter_records(lines, filters, number)
+                stats["lines_read"] += next(counter)
+
+    runs = spill_runs(records(), memory_bytes, directory)
+    stats["runs"] = len(runs)
+    stats["spill_bytes"] = sum(os.path.getsize(path) for path in runs)
+    try:
+        merged, stats["merge_passes"] = merge_spilled(runs, directory)
+        with open_output(output_path, compression) as output:
+            stats["lines_written"] = write_batches(_merged_batches(merged, names), output, fmt)
+    finally:
+        for path in runs:
+            remove_quietly(path)
+    stats["seconds"] = time.perf_counter() - start
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return stats
+
+
+def _merged_batches(records, names):
+    # Formats merged records into rows for export_utils.write_batches
+    cache = {}
+    while batch := [(names[file_number], format_timestamp(cache, ts), data.decode("utf-8"))
+                    for ts, file_number, _, data in itertools.islice(records, BATCH_ROWS)]:
+        yield batch
@@ -1,7 +1,30 @@
 import os
 import json
 import argparse
-import requests
+import io
+import time
+from .batch import MEMORY_BYTES, batch_merge, expand_inputs, filter_records, load_filter_mapping
+from .compression_utils import decompress_to_file, detect_compression, open_decompressed, remove_quietly, \
+    strip_compression_suffix
+from .export_utils import COMPRESSIONS, EXPORT_FORMATS
+from .filter_utils import RegexTimeout
+from .line_store import normalize_newline
+from .parallel import filter_file_chunks
+
+# Write buffer for the local processing mode.
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+def default_output_path(log_file_path: str, filter_file_path: str) -> str:
+    """
+    Builds the default output name, e.g. `app_filters_filtered.txt` for `app.log` and `filters.json`.
+    """
+    log_file_name = strip_compression_suffix(os.path.basename(log_file_path))
+    filter_file_name = os.path.basename(filter_file_path)
+
+    log_base, log_ext = os.path.splitext(log_file_name)
+    filter_base, filter_ext = os.path.splitext(filter_file_name)
+
+    return f"{log_base}_{filter_base}_filtered.txt"
 
 def run_log_processing(log_file_path: str, filter_file_path: str, output_file_path: str = None):
     """
@@ -13,6 +36,9 @@ def run_log_processing(log_file_path: str, filter_file_path: str, output_file_pa
         output_file_path (str, optional): Path to the output file. 
                                           Defaults to a generated name if not provided.
     """
+    # Only the server mode needs an HTTP client
+    import requests
+
     base_url = "http://localhost:7860"
 
     print(f"Loading filters from: {filter_file_path}")
@@ -34,25 +60,180 @@ def run_log_processing(log_file_path: str, filter_file_path: str, output_file_pa
     print("Filters applied.")
 
     if output_file_path is None:
-        log_file_name = os.path.basename(log_file_path)
-        filter_file_name = os.path.basename(filter_file_path)
-        
-        log_base, log_ext = os.path.splitext(log_file_name)
-        filter_base, filter_ext = os.path.splitext(filter_file_name)
-        
-        output_file_path = f"{log_base}_{filter_base}_filtered.txt"
+        output_file_path = default_output_path(log_file_path, filter_file_path)
 
     with open(output_file_path, "w") as f:
         f.write(filtered_log_content)
 
     print(f"Filtered log saved to: {output_file_path}")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Process log files using a Gradio API.")
-    parser.add_argument("log_file", help="Path to the input log file.")
-    parser.add_argument("filter_file", help="Path to the JSON filter file.")
+def filter_log_stream(lines, filters):
+    """
+    Lazily applies a filter list to an iterable of log lines.
+
+    Uses the same rules as the merged view in `app.py`: lines without a
+    parseable timestamp are dropped, then the filters are evaluated with a
+    compiled `FilterPlan`. The timestamp format is sniffed from the first
+    lines, which are the only ones held in memory.
+
+    Args:
+        lines (iterable): The log lines, e.g. an open text file.
+        filters (list): Filter dictionaries in the format written by `save_filters`.
+
+    Returns:
+        generator: The lines that pass the filters, unchanged.
+    """
+    for _, _, _, line in filter_records(lines, filters):
+        yield line
+
+def process_log_locally(log_file_path: str, filter_file_path: str, output_file_path: str = None, workers: int = 1):
+    """
+    Filters a log file in-process, without a running Gradio application.
+
+    The log is streamed line by line and matching lines are written as they
+    are found, so memory use does not depend on the size of the file.
+    Compressed logs (gzip, bz2, xz, zstd) are decompressed on the fly; with
+    several workers they are first decompressed to a temporary file so that
+    byte ranges of it can be filtered in parallel.
+
+    Args:
+        log_file_path (str): Path to the input log file.
+        filter_file_path (str): Path to the JSON filter file.
+        output_file_path (str, optional): Path to the output file.
+                                          Defaults to a generated name if not provided.
+        workers (int, optional): Worker processes filtering byte ranges of the
+                                 log in parallel. Defaults to 1 (streaming in-process).
+
+    Returns:
+        str: The path of the output file.
+    """
+    print(f"Loading filters from: {filter_file_path}")
+    with open(filter_file_path, 'r') as f:
+        filters = json.load(f)
+
+    if output_file_path is None:
+        output_file_path = default_output_path(log_file_path, filter_file_path)
+
+    print(f"Applying filters to log file: {log_file_path}")
+    start = time.perf_counter()
+    with open(output_file_path, 'w', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+        if workers > 1:
+            compressed = detect_compression(log_file_path) is not None
+            path = decompress_to_file(log_file_path) if compressed else log_file_path
+            try:
+                for chunk in filter_file_chunks(path, filters, workers):
+                    output_file.write(chunk)
+            finally:
+                if compressed:
+                    remove_quietly(path)
+        else:
+            # Lines end at LF only, as in the parallel path and the web view
+            with io.TextIOWrapper(open_decompressed(log_file_path), encoding='utf-8', errors='replace',
+                                  newline='\n') as log_file:
+                for line in filter_log_stream(map(normalize_newline, log_file), filters):
+                    output_file.write(line)
+    elapsed = time.perf_counter() - start
+
+    size_mb = os.path.getsize(log_file_path) / (1024 * 1024)
+    print(f"Processed {size_mb:.1f} MB in {elapsed:.2f}s ({size_mb / max(elapsed, 1e-9):.1f} MB/s) with {workers} worker(s)")
+    print(f"Filtered log saved to: {output_file_path}")
+    return output_file_path
+
+def process_batch(inputs, filter_file_path: str, output_file_path: str = None, fmt: str = "Plain",
+                  compression: str = "None", memory_bytes: int = MEMORY_BYTES, spill_dir: str = None):
+    """
+    Filters many logs in-process and writes them as one merged, time-sorted file.
+
+    See `batch.batch_merge()`: every file is streamed through the filters the
+    mapping gives it, and the kept lines are sorted with an external merge
+    that holds about `memory_bytes` of lines, spilling runs to `spill_dir`.
+
+    Args:
+        inputs (list): Log files, directories and glob patterns.
+        filter_file_path (str): A filter file for all logs, or a JSON object
+                                mapping file name patterns to filters.
+        output_file_path (str, optional): Path to the output file.
+                                          Defaults to `merged_filtered.txt`.
+        fmt (str, optional): One of `export_utils.EXPORT_FORMATS`. Defaults to "Plain".
+        compression (str, optional): One of `export_utils.COMPRESSIONS`. Defaults to "None".
+        memory_bytes (int, optional): Memory for held lines. Defaults to `batch.MEMORY_BYTES`.
+        spill_dir (str, optional): Where sorted runs are spilled. Defaults to
+                                   the system temporary directory.
+
+    Returns:
+        dict: The statistics of `batch_merge()`.
+    """
+    paths = expand_inputs(inputs)
+    print(f"Loading filters from: {filter_file_path}")
+    rules = load_filter_mapping(filter_file_path)
+    if output_file_path is None:
+        output_file_path = f"merged_filtered{EXPORT_FORMATS[fmt]}{COMPRESSIONS[compression]}"
+
+    print(f"Merging {len(paths)} log files")
+    stats = batch_merge(paths, rules, output_file_path, fmt, compression, memory_bytes, spill_dir)
+    for path in stats["skipped"]:
+        print(f"Skipped {path}: no filter pattern matches it")
+
+    size_mb = stats["input_bytes"] / (1024 * 1024)
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Merged {stats['lines_written']} of {stats['lines_read']} lines from {stats['files']} files "
+          f"({size_mb:.1f} MB) in {stats['seconds']:.2f}s: {size_mb / seconds:.1f} MB/s, "
+          f"{stats['lines_read'] / seconds:.0f} lines/s")
+    print(f"Sorted in {stats['runs']} runs ({stats['spill_bytes'] / (1024 * 1024):.1f} MB spilled), "
+          f"{stats['merge_passes']} extra merge passes")
+    if stats["peak_rss_mb"] is not None:
+        print(f"Peak memory: {stats['peak_rss_mb']:.0f} MB")
+    print(f"Merged log saved to: {output_file_path}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Filter log files through a running Gradio app, in-process with --local, "
+                    "or merge many logs into one time-sorted file with --batch.")
+    parser.add_argument("log_file", nargs="+",
+                        help="Path to the input log file. With --batch: log files, directories or glob patterns.")
+    parser.add_argument("filter_file",
+                        help="Path to the JSON filter file. With --batch it may also map file name patterns to filters.")
     parser.add_argument("-o", "--output_file", help="Optional: Path to the output file. Defaults to a generated name.")
+    parser.add_argument("--local", action="store_true",
+                        help="Filter the log in-process instead of through a running Gradio app.")
+    parser.add_argument("--workers", type=int,
+                        help="With --local: number of worker processes filtering the log in parallel. Defaults to 1.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Filter all given logs in-process and merge them into one time-sorted file.")
+    parser.add_argument("--memory-mb", type=int,
+                        help="With --batch: memory for lines held while sorting; the rest is spilled to disk. "
+                             f"Defaults to {MEMORY_BYTES // (1024 * 1024)}.")
+    parser.add_argument("--spill-dir", help="With --batch: directory for the sorted runs. Defaults to the temporary directory.")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="With --batch: output format. Defaults to Plain.")
+    parser.add_argument("--compression", choices=list(COMPRESSIONS),
+                        help="With --batch: output compression. Defaults to None.")
 
     args = parser.parse_args()
 
-    run_log_processing(args.log_file, args.filter_file, args.output_file)
+    if len(args.log_file) > 1 and not args.batch:
+        parser.error("several log files need --batch")
+    if args.workers is not None and not args.local:
+        parser.error("--workers needs --local")
+    if args.batch and args.local:
+        parser.error("--batch and --local cannot be combined; --batch always filters in-process")
+    batch_options = {"--memory-mb": args.memory_mb, "--spill-dir": args.spill_dir, "--format": args.format,
+                     "--compression": args.compression}
+    for option, value in batch_options.items():
+        if value is not None and not args.batch:
+            parser.error(f"{option} needs --batch")
+    try:
+        if args.batch:
+            memory_bytes = MEMORY_BYTES if args.memory_mb is None else args.memory_mb * 1024 * 1024
+            process_batch(args.log_file, args.filter_file, args.output_file, args.format or "Plain",
+                          args.compression or "None", memory_bytes, args.spill_dir)
+        elif args.local:
+            process_log_locally(args.log_file[0], args.filter_file, args.output_file, args.workers or 1)
+        else:
+            run_log_processing(args.log_file[0], args.filter_file, args.output_file)
+    except RegexTimeout as e:
+        # A runaway regex ends the run with an error instead of hanging it
+        parser.exit(1, f"{parser.prog}: error: {e}; simplify the filter or raise LOGVIEWER_REGEX_BUDGET\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+
+# Leading bytes of each supported compressed format.
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# File name suffixes of the supported formats, stripped from derived names.
+SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+# Size of the blocks copied while decompressing.
+CHUNK_BYTES = 1024 * 1024
+
+
+def detect_compression(path: str) -> str | None:
+    """
+    Returns the compression format of a file from its leading bytes, or None if it is not compressed.
+    """
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for name, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def strip_compression_suffix(name: str) -> str:
+    """
+    Removes a compression suffix from a file name, e.g. `app.log.gz` -> `app.log`.
+    """
+    for suffix in SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def open_decompressed(path: str):
+    """
+    Opens a file for reading as a binary stream, decompressing it on the fly if needed.
+
+    Multi-member gzip files and multi-frame zstd files are read as one stream.
+    zstd needs the optional `zstandard` package.
+    """
+    compression = detect_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading .zst logs requires the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+    return open(path, "rb")
+
+
+def decompress_to_file(path: str, directory: str = None) -> str:
+    """
+    Streams a compressed file into an uncompressed temporary file.
+
+    The copy is made in blocks of CHUNK_BYTES, so memory use does not depend
+    on the size of the log. The caller owns the returned file and removes it
+    when done.
+
+    Args:
+        path (str): The compressed file.
+        directory (str, optional): Where to create the file. Defaults to the
+                                   system temporary directory.
+
+    Returns:
+        str: The path of the decompressed copy.
+    """
+    name = strip_compression_suffix(os.path.basename(path))
+    fd, out_path = tempfile.mkstemp(prefix="logviewer-", suffix=f"-{name}", dir=directory)
+    try:
+        with open_decompressed(path) as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_BYTES)
+    except BaseException:
+        os.remove(out_path)
+        raise
+    return out_path
+
+
+def remove_quietly(path: str):
+    """
+    Deletes a file, ignoring errors (e.g. when it is already gone).
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+# Memory the shared datasets may hold together, in bytes; beyond it the least
+# recently used ones are unloaded to disk.
+MEMORY_BUDGET = int(os.environ.get("LOGVIEWER_MEMORY_BUDGET", 1024 ** 3))
+
+# Directory for unloaded index arrays; defaults to the system temporary directory.
+SPILL_DIR = os.environ.get("LOGVIEWER_SPILL_DIR") or None
+
+
+class Dataset:
+    """
+    One loaded log, shared by every session that opened the same content under the same name.
+
+    Args:
+        key (tuple): `(digest, source)` of the log.
+        store (LineStore): The loaded log.
+    """
+
+    def __init__(self, key: tuple, store):
+        self.key = key
+        self.store = store
+        self.lines = len(store)
+        self.sessions = 0
+
+
+class DatasetRegistry:
+    """
+    Server-wide registry of the logs opened by all sessions.
+
+    Uploads are identified by a digest of their contents plus the file name
+    they are shown under, so sessions opening the same log share one
+    `LineStore` instead of holding a copy each. Datasets are reference
+    counted by session and closed when the last one releases them. When the
+    loaded datasets exceed the memory budget, the least recently used ones
+    are unloaded to disk (`LineStore.unload()`) and read back on next use.
+
+    Args:
+        max_bytes (int, optional): The memory budget. Defaults to MEMORY_BUDGET.
+        spill_dir (str, optional): Where unloaded arrays are written. Defaults
+                                   to SPILL_DIR.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_BUDGET, spill_dir: str = SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        # Least recently used first
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: tuple):
+        """
+        Returns the store of a registered dataset for one more session, or None if there is none.
+        """
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return None
+            dataset.sessions += 1
+            self._datasets.move_to_end(key)
+            return dataset.store
+
+    def add(self, key: tuple, store):
+        """
+        Registers a newly loaded store for one session.
+
+        Returns:
+            LineStore: The registered store. If another session registered the
+                       same dataset meanwhile, its store is returned and
+                       `store` is closed.
+        """
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                dataset = self._datasets[key] = Dataset(key, store)
+            elif dataset.store is not store:
+                store.close()
+            dataset.sessions += 1
+            self._datasets.move_to_end(key)
+            return dataset.store
+
+    def release(self, key: tuple):
+        """
+        Drops one session's reference to a dataset, closing it when no session uses it any more.
+        """
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return
+            dataset.sessions -= 1
+            if dataset.sessions > 0:
+                return
+            del self._datasets[key]
+        logging.info(f"Closing dataset {dataset.store.source}, no session uses it any more")
+        dataset.store.close()
+
+    def touch(self, keys):
+        """
+        Marks datasets as recently used.
+        """
+        with self._lock:
+            for key in keys:
+                if key in self._datasets:
+                    self._datasets.move_to_end(key)
+
+    def enforce(self, keep=()):
+        """
+        Unloads the least recently used datasets until the loaded ones fit in the budget.
+
+        Args:
+            keep (iterable, optional): Keys of datasets not to unload, e.g. the
+                                       ones the current request works on.
+        """
+        keep = set(keep)
+        with self._lock:
+            datasets = list(self._datasets.values())
+        total = sum(dataset.store.nbytes() for dataset in datasets)
+        for dataset in datasets:
+            if total <= self.max_bytes:
+                break
+            if dataset.key in keep or not dataset.store.loaded:
+                continue
+            freed = dataset.store.unload(self.spill_dir)
+            total -= freed
+            if freed:
+                logging.info(f"Unloaded dataset {dataset.store.source} ({freed} bytes) to stay within "
+                             f"the memory budget of {self.max_bytes} bytes")
+
+    def usage(self) -> list[dict]:
+        """
+        Returns one row per dataset, most recently used first, with its sessions and memory use.
+        """
+        with self._lock:
+            datasets = list(self._datasets.values())
+        return [{"Dataset": dataset.store.source,
+                 "Digest": dataset.key[0][:12] if dataset.key[0] else "",
+                 "Sessions": dataset.sessions,
+                 "Lines": dataset.lines,
+                 "Memory (MB)": round(dataset.store.nbytes() / 1024 / 1024, 1),
+                 "Loaded": dataset.store.loaded}
+                for dataset in reversed(datasets)]
+
+
+REGISTRY = DatasetRegistry()
@@ -0,0 +1,128 @@
+import array
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sys
+from .parallel import index_files
+from .timestamp_utils import PARSER_VERSION
+
+# Directory holding the cached indexes; set LOGVIEWER_CACHE_DIR to "" to disable the cache.
+CACHE_DIR = os.environ.get("LOGVIEWER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "logviewer"))
+
+# Total size of the cache; the least recently used indexes are evicted beyond it.
+CACHE_MAX_BYTES = int(os.environ.get("LOGVIEWER_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Bumped whenever the layout of a cache entry changes.
+INDEX_VERSION = 1
+
+
+def file_digest(path: str) -> str:
+    """
+    Returns a hex digest of the file's contents.
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()[:40]
+
+
+def _entry_path(digest: str) -> str:
+    # The key covers the content, the parser and the array layout, so entries
+    # written by another version or architecture are never read back. It also
+    # covers the year, which syslog timestamps lack and get from the clock;
+    # any file may hold such lines, so every entry is parsed again once a year.
+    year = datetime.date.today().year
+    return os.path.join(CACHE_DIR, f"{digest}-p{PARSER_VERSION}-i{INDEX_VERSION}-y{year}-{sys.byteorder}.idx")
+
+
+def load_index(digest: str):
+    """
+    Returns the cached `(offsets, timestamps, fmt)` index for a digest, or None.
+    """
+    if not CACHE_DIR:
+        return None
+    path = _entry_path(digest)
+    try:
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            offsets = array.array("q")
+            offsets.fromfile(f, meta["lines"])
+            timestamps = array.array("q")
+            timestamps.fromfile(f, meta["lines"])
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, KeyError) as e:
+        logging.warning(f"Discarding corrupt index cache entry {path}: {e}")
+        os.remove(path)
+        return None
+    # Mark the entry as recently used for the LRU eviction
+    os.utime(path)
+    return offsets, timestamps, meta["format"]
+
+
+def save_index(digest: str, index):
+    """
+    Writes an `(offsets, timestamps, fmt)` index to the cache and evicts old entries.
+    """
+    if not CACHE_DIR:
+        return
+    offsets, timestamps, fmt = index
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps({"lines": len(timestamps), "format": fmt}).encode() + b"\n")
+        offsets.tofile(f)
+        timestamps.tofile(f)
+    os.replace(tmp_path, path)
+    evict(CACHE_MAX_BYTES)
+
+
+def evict(max_bytes: int):
+    """
+    Deletes the least recently used entries until the cache fits in `max_bytes`.
+    """
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".idx"):
+            stat = os.stat(os.path.join(CACHE_DIR, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(CACHE_DIR, name))
+        total -= size
+        logging.info(f"Evicted {name} from the index cache")
+
+
+def cached_index_files(paths: list[str], workers: int = None, digests: list[str] = None):
+    """
+    Like `parallel.index_files`, but reuses indexes cached on disk.
+
+    Files are identified by a digest of their contents, so a re-uploaded or
+    renamed copy of a file that was indexed before is loaded from the cache
+    instead of being parsed again. Misses are indexed in parallel and saved.
+
+    Args:
+        paths (list): Files to index.
+        workers (int, optional): Worker processes for the misses.
+        digests (list, optional): The paths' `file_digest`s, if the caller
+                                  already computed them.
+
+    Returns:
+        list: One `(offsets, timestamps, fmt)` index per path.
+    """
+    if not CACHE_DIR:
+        digests = [None] * len(paths)
+    elif digests is None:
+        digests = [file_digest(path) for path in paths]
+    indexes = [load_index(digest) if digest else None for digest in digests]
+    misses = [n for n, index in enumerate(indexes) if index is None]
+    logging.info(f"Index cache: {len(paths) - len(misses)} hits, {len(misses)} misses")
+
+    for n, index in zip(misses, index_files([paths[n] for n in misses], workers)):
+        if digests[n]:
+            save_index(digests[n], index)
+        indexes[n] = index
+    return indexes
@@ -0,0 +1,165 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+from .timestamp_utils import from_epoch_ns
+
+# Export formats: name -> file extension
+EXPORT_FORMATS = {"Plain": ".txt", "CSV": ".csv", "JSON Lines": ".jsonl"}
+
+# Output compressions: name -> file extension. zstd needs the optional
+# `zstandard` package.
+COMPRESSIONS = {"None": "", "gzip": ".gz", "zstd": ".zst"}
+
+COLUMNS = ["File", "Timestamp", "Log Entry"]
+
+# Rows formatted per write, and the size of the output buffer.
+BATCH_ROWS = 10_000
+BUFFER_SIZE = 1024 * 1024
+
+_NS_PER_SECOND = 1_000_000_000
+
+
+def format_timestamp(cache: dict, ns: int) -> str:
+    """
+    Formats an epoch-nanosecond timestamp like the log table does, with milliseconds.
+
+    `strftime` runs once per distinct second; `cache` maps seconds to their text
+    and should be reused across the rows of one export.
+    """
+    seconds, rest = divmod(ns, _NS_PER_SECOND)
+    text = cache.get(seconds)
+    if text is None:
+        if len(cache) >= 65536:
+            cache.clear()
+        text = cache[seconds] = from_epoch_ns(seconds * _NS_PER_SECOND).strftime('%Y-%m-%d %H:%M:%S')
+    return f"{text}.{rest // 1_000_000:03d}"
+
+
+def open_output(path: str, compression: str = "None"):
+    """
+    Opens a text file for writing, compressing it with gzip or zstd if requested.
+    """
+    if compression == "gzip":
+        return io.TextIOWrapper(gzip.GzipFile(path, "wb", compresslevel=6), encoding="utf-8", newline="")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd export requires the 'zstandard' package (pip install zstandard)")
+        raw = open(path, "wb", buffering=BUFFER_SIZE)
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True),
+                                encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="", buffering=BUFFER_SIZE)
+
+
+def _row_batches(view):
+    # Yields lists of (file, timestamp, entry) rows, decoding each line once.
+    cache = {}
+    batch = []
+    for ts, s, i in view:
+        source = view.sources[s]
+        batch.append((source.source, format_timestamp(cache, ts), source.line(i)))
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timed(batches, spent: list):
+    # Yields the batches, adding the time spent producing them to spent[0]
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        spent[0] += time.perf_counter() - start
+        if batch is None:
+            return
+        yield batch
+
+
+def write_rows(view, output, fmt: str = "Plain") -> int:
+    """
+    Streams every row of a view to an open text file.
+
+    Args:
+        view (MergedView): The rows to write, in merged order.
+        output: A file opened with `open_output`.
+        fmt (str, optional): One of EXPORT_FORMATS. Defaults to "Plain", the
+                             "[file] [timestamp] line" layout.
+
+    Returns:
+        int: The number of rows written.
+    """
+    return write_batches(_row_batches(view), output, fmt)
+
+
+def write_batches(batches, output, fmt: str = "Plain") -> int:
+    """
+    Writes lists of `(file, timestamp text, line)` rows in one of EXPORT_FORMATS.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rows = 0
+    if fmt == "CSV":
+        writer = csv.writer(output)
+        writer.writerow(COLUMNS)
+        for batch in batches:
+            writer.writerows((file, ts, line.rstrip("\n")) for file, ts, line in batch)
+            rows += len(batch)
+    elif fmt == "JSON Lines":
+        # Produces the same text as json.dumps of one dict per row, but only
+        # the entry is escaped per row; the file name part is built once.
+        dumps = json.dumps
+        heads = {}
+        entry_key = dumps(COLUMNS[2])
+        for batch in batches:
+            for file, _, _ in batch:
+                if file not in heads:
+                    heads[file] = f'{{{dumps(COLUMNS[0])}: {dumps(file)}, {dumps(COLUMNS[1])}: "'
+            output.write("".join(f'{heads[file]}{ts}", {entry_key}: {dumps(line.rstrip(chr(10)))}}}\n'
+                                 for file, ts, line in batch))
+            rows += len(batch)
+    else:
+        for batch in batches:
+            output.write("".join(f"[{file}] [{ts}] {line}" for file, ts, line in batch))
+            rows += len(batch)
+    return rows
+
+
+def export_view(view, fmt: str = "Plain", compression: str = "None", directory: str = None,
+                stages: dict = None) -> tuple[str, int, float]:
+    """
+    Writes the whole view to a new file of its own.
+
+    Every export goes to a fresh temporary directory, so concurrent sessions
+    never overwrite each other's downloads.
+
+    Args:
+        view (MergedView): The rows to export.
+        fmt (str, optional): One of EXPORT_FORMATS. Defaults to "Plain".
+        compression (str, optional): One of COMPRESSIONS. Defaults to "None".
+        directory (str, optional): Parent of the temporary directory. Defaults
+                                   to the system temporary directory.
+        stages (dict, optional): Receives the seconds spent on "rows" (merging
+                                 and decoding the rows) and on "serialise"
+                                 (formatting, compressing and writing them).
+
+    Returns:
+        tuple: `(path, rows, seconds)` of the written file.
+    """
+    start = time.perf_counter()
+    path = os.path.join(tempfile.mkdtemp(prefix="logviewer-export-", dir=directory),
+                        f"filtered_log{EXPORT_FORMATS[fmt]}{COMPRESSIONS[compression]}")
+    producing = [0.0]
+    with open_output(path, compression) as output:
+        rows = write_batches(_timed(_row_batches(view), producing), output, fmt)
+    seconds = time.perf_counter() - start
+    if stages is not None:
+        stages["rows"] = producing[0]
+        stages["serialise"] = seconds - producing[0]
+    return path, rows, seconds
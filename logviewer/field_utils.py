@@ -0,0 +1,247 @@
+import array
+import json
+import re
+
+# Field conditions: "field=value", "field=low..high", "field>value", "field>=value", "field<value", "field<=value".
+_CONDITION = re.compile(r'^\s*([^=<>\s]+)\s*(>=|<=|=|>|<)\s*(.*?)\s*$')
+
+# Sentinel code for lines that do not have a field.
+MISSING = -1
+
+
+def flatten(record, prefix=""):
+    """
+    Yields `(name, value)` pairs of a parsed JSON object, with nested objects as dotted names.
+    """
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{name}.")
+        else:
+            yield name, value
+
+
+def parse_record(line: str) -> dict:
+    """
+    Parses a JSON log line into a dict of flattened fields ({} if it is not a JSON object).
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return {}
+    if not isinstance(record, dict):
+        return {}
+    for value in record.values():
+        if isinstance(value, dict):
+            return dict(flatten(record))
+    return record
+
+
+def sniff_fields(lines) -> list[str]:
+    """
+    Returns the field names found in a sample of JSON log lines, in order of first appearance.
+    """
+    names = {}
+    for line in lines:
+        for name in parse_record(line):
+            names.setdefault(name)
+    return list(names)
+
+
+def _number(value):
+    # Numeric value of a field, or None (booleans are not numbers).
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _parse_number(text: str):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _text(value) -> str:
+    # Text form of a field value, as it appears in the JSON for non-strings.
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+class FieldRule:
+    """
+    One field condition of a "Include Field"/"Exclude Field" filter.
+
+    The filter value is `<field><op><operand>`: `=` tests equality (numerically
+    when both sides are numbers, otherwise on the text form of the value, e.g.
+    `true` or `null`), `low..high` after `=` is an inclusive range, and `>`,
+    `>=`, `<`, `<=` compare numbers with numbers and strings with strings.
+    Nested objects are addressed with dotted names, e.g. `http.status=500`.
+
+    Args:
+        value (str): The filter value.
+        case_sensitive (bool): Whether string comparisons respect case.
+
+    Raises:
+        ValueError: If the value is not a valid condition.
+    """
+
+    def __init__(self, value: str, case_sensitive: bool = True):
+        match = _CONDITION.match(value)
+        if not match:
+            raise ValueError(f"expected <field><op><value> with op one of =, <, <=, >, >=, got {value!r}")
+        self.field, self.op, operand = match.groups()
+        self.case_sensitive = case_sensitive
+        if self.op == "=" and ".." in operand:
+            self.op = ".."
+            texts = operand.split("..", 1)
+        else:
+            texts = [operand]
+        numbers = [_parse_number(text) for text in texts]
+        # Numeric operands compare with numeric values, anything else with strings
+        self.numbers = numbers if all(n is not None for n in numbers) else None
+        self.texts = [self._fold(text) for text in texts]
+
+    def _fold(self, text):
+        return text if self.case_sensitive else text.lower()
+
+    def matches_value(self, value) -> bool:
+        """Returns True if a field value satisfies the condition."""
+        if self.op == "=":
+            number = _number(value)
+            if self.numbers is not None and number is not None:
+                return number == self.numbers[0]
+            return self._fold(_text(value)) == self.texts[0]
+        if self.numbers is not None:
+            value, operands = _number(value), self.numbers
+        elif isinstance(value, str):
+            value, operands = self._fold(value), self.texts
+        else:
+            return False
+        if value is None:
+            return False
+        if self.op == "..":
+            return operands[0] <= value <= operands[1]
+        if self.op == ">":
+            return value > operands[0]
+        if self.op == ">=":
+            return value >= operands[0]
+        if self.op == "<":
+            return value < operands[0]
+        return value <= operands[0]
+
+    def matches_record(self, record: dict) -> bool:
+        """Returns True if a parsed record (from `parse_record`) satisfies the condition."""
+        return self.field in record and self.matches_value(record[self.field])
+
+    def select(self, columns) -> set:
+        """Returns the line indices of a `FieldColumns` whose field satisfies the condition."""
+        column = columns.column(self.field)
+        if column is None:
+            return set()
+        codes = [code for code, value in enumerate(column.categories) if self.matches_value(value)]
+        return column.rows(codes)
+
+
+class FieldColumn:
+    """
+    One field of a JSON log, dictionary-encoded.
+
+    `codes[i]` is the index of line `i`'s value in `categories` (MISSING if the
+    line lacks the field), so each distinct value is stored once and a
+    condition is tested once per distinct value rather than once per line.
+    """
+
+    def __init__(self, length: int):
+        self.codes = array.array("l", [MISSING]) * length
+        self.categories = []
+        self._category_codes = {}
+        self._postings = None
+
+    def grow(self, length: int):
+        """Extends the column to `length` lines, which lack the field until `set`."""
+        self.codes.extend(array.array("l", [MISSING]) * (length - len(self.codes)))
+
+    def set(self, i: int, value):
+        """Records line `i`'s value; lines are set in increasing order."""
+        if value.__class__ is str:
+            # The common case; strings never collide with other types' keys
+            key = value
+        else:
+            # Keyed by type too, so that 1, 1.0 and True stay distinct
+            # categories; lists are keyed by their (hashable) JSON text
+            key = (value.__class__, json.dumps(value) if isinstance(value, list) else value)
+        code = self._category_codes.get(key)
+        if code is None:
+            code = self._category_codes[key] = len(self.categories)
+            self.categories.append(value)
+            if self._postings is not None:
+                self._postings.append(array.array("q"))
+        self.codes[i] = code
+        if self._postings is not None:
+            self._postings[code].append(i)
+
+    def rows(self, codes) -> set:
+        """Returns the indices of the lines whose value has one of the given codes."""
+        if self._postings is None:
+            # Built on first use: the line indices of every distinct value
+            postings = [array.array("q") for _ in self.categories]
+            for i, code in enumerate(self.codes):
+                if code != MISSING:
+                    postings[code].append(i)
+            self._postings = postings
+        rows = set()
+        for code in codes:
+            rows.update(self._postings[code])
+        return rows
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the codes and postings arrays, in bytes."""
+        postings = self._postings or []
+        return (len(self.codes) * self.codes.itemsize
+                + sum(len(rows) * rows.itemsize for rows in postings))
+
+
+class FieldColumns:
+    """
+    Columnar fields of a JSON-lines log, parsed once.
+
+    Every line is decoded with `json.loads` exactly once and each flattened
+    field becomes a `FieldColumn`. Field filters then work on the columns
+    instead of re-parsing or regex-matching the raw JSON.
+
+    Args:
+        lines (sequence): The log lines, e.g. a `LineStore`.
+    """
+
+    def __init__(self, lines):
+        self.length = 0
+        self.columns = {}
+        self.update(lines)
+
+    def update(self, lines):
+        """Parses the lines added to `lines` since the columns were last built or updated."""
+        start, length = self.length, len(lines)
+        if length == start:
+            return
+        for column in self.columns.values():
+            column.grow(length)
+        columns = self.columns
+        for i in range(start, length):
+            for name, value in parse_record(lines[i]).items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = FieldColumn(length)
+                column.set(i, value)
+        self.length = length
+
+    def column(self, name: str) -> FieldColumn | None:
+        """Returns the column of a field, or None if no line has it."""
+        return self.columns.get(name)
+
+    def names(self) -> list[str]:
+        """Returns the field names, in order of first appearance."""
+        return list(self.columns)
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the columns' arrays, in bytes."""
+        return sum(column.nbytes() for column in self.columns.values())
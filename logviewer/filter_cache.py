@@ -0,0 +1,215 @@
+import array
+import collections
+import threading
+import time
+from .merge_utils import sorted_run
+from .filter_utils import regex_key
+from .parallel import filter_store
+from .timestamp_utils import NO_TIMESTAMP
+
+# Number of filter results remembered per file.
+CACHE_ENTRIES = 8
+
+
+def filter_key(filters):
+    """
+    Returns a hashable key for a filter list.
+
+    Includes are OR'ed and excludes are applied as a whole, so neither the order
+    of the filters nor duplicates change the result; the key is therefore a
+    pair of frozensets and reordering filters maps onto the same cache entry.
+    """
+    includes = set()
+    excludes = set()
+    for f in filters:
+        rule = (f["type"], f["value"], f["case_sensitive"])
+        if "Include" in f["type"]:
+            includes.add(rule)
+        elif "Exclude" in f["type"]:
+            excludes.add(rule)
+    return frozenset(includes), frozenset(excludes)
+
+
+class FilterCache:
+    """
+    Remembers the filtered line indices of one file for its recent filter lists.
+
+    A lookup is answered in one of three ways:
+
+    * ``"hit"``: the same filter set (in any order) was evaluated before.
+    * ``"narrowed"``: a cached result with the same includes and a subset of
+      the excludes exists, so only the additional excludes are applied to it.
+    * ``"miss"``: the filter list is evaluated over all valid lines.
+
+    It also holds the regexes of the file that were stopped for overrunning
+    the regex time budget (see `filter_utils.FilterPlan`); each stays stopped
+    until a lookup no longer has it among its filters.
+
+    Args:
+        max_entries (int, optional): Results kept per file. Defaults to CACHE_ENTRIES.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self.stopped = {}
+        # A session's superseded recompute may still be finishing a file
+        # while the next one starts
+        self._lock = threading.RLock()
+
+    def __deepcopy__(self, memo):
+        # Entries are immutable results keyed by content, so copies can share them.
+        return self
+
+    def clear(self):
+        """Drops all cached results, e.g. after the underlying lines changed."""
+        with self._lock:
+            self._entries.clear()
+
+    def has(self, filters) -> bool:
+        """Returns True if the result for `filters` is cached, i.e. a lookup would be a hit."""
+        return filter_key(filters) in self._entries
+
+    def lookup(self, store, filters):
+        """
+        Returns the indices of the lines of `store` that pass `filters`.
+
+        Args:
+            store (LineStore): The file's lines.
+            filters (list): The file's filter dictionaries.
+
+        Returns:
+            tuple: `(indices, outcome, seconds_saved)` where `outcome` is "hit",
+                   "narrowed" or "miss" and `seconds_saved` estimates the time
+                   a full evaluation would have taken beyond what was spent.
+        """
+        with self._lock:
+            self._forget_stopped(filters)
+            key = filter_key(filters)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                indices, full_cost, _, _ = entry
+                return indices, "hit", full_cost
+
+            start = time.perf_counter()
+            parent = self._narrowest_parent(key)
+            if parent is not None:
+                parent_key, (parent_indices, parent_cost, _, _) = parent
+                extra = [{"type": t, "value": v, "case_sensitive": c} for t, v, c in key[1] - parent_key[1]]
+                indices = filter_store(store, extra, parent_indices, stopped=self.stopped)
+                elapsed = time.perf_counter() - start
+                self._remember(key, indices, parent_cost)
+                return indices, "narrowed", max(parent_cost - elapsed, 0.0)
+
+            indices = filter_store(store, filters, stopped=self.stopped)
+            self._remember(key, indices, time.perf_counter() - start)
+            return indices, "miss", 0.0
+
+    def _forget_stopped(self, filters):
+        # A stopped regex the user removed runs again if added back; results
+        # computed without it would then be stale
+        current = {regex_key(f) for f in filters}
+        forgotten = [key for key in self.stopped if key not in current]
+        for key in forgotten:
+            del self.stopped[key]
+        if forgotten:
+            self._entries.clear()
+
+    def lookup_run(self, store, filters):
+        """
+        Like `lookup`, but returns the result as a time-ordered run.
+
+        The run is a `(keys, indices)` pair from `merge_utils.sorted_run`,
+        cached with the result, so a date range is cut from it with two
+        bisections on `keys` instead of a scan over the lines.
+
+        Returns:
+            tuple: `((keys, indices), outcome, seconds_saved)`.
+        """
+        with self._lock:
+            indices, outcome, saved = self.lookup(store, filters)
+            key = filter_key(filters)
+            indices, full_cost, run, timeline = self._entries[key]
+            if run is None:
+                run = sorted_run(store.timestamps, indices)
+                self._entries[key] = (indices, full_cost, run, timeline)
+            return run, outcome, saved
+
+    def timeline(self, store, filters):
+        """
+        Returns the `timeline.Timeline` of the result for `filters`, built once from its run and cached with it.
+
+        Lines appended by `extend()` in time order are added to the cached
+        timeline; otherwise it is built again on the next call.
+        """
+        # Imported on first use, like the token index, to keep numpy out of
+        # the filtering path
+        from .timeline import Timeline
+        with self._lock:
+            (keys, _), _, _ = self.lookup_run(store, filters)
+            key = filter_key(filters)
+            indices, full_cost, run, timeline = self._entries[key]
+            if timeline is None:
+                timeline = Timeline(keys)
+                self._entries[key] = (indices, full_cost, run, timeline)
+            return timeline
+
+    def extend(self, store, filters, first):
+        """
+        Brings the cached result for `filters` up to date after lines were appended.
+
+        Only the lines from `first` on are evaluated. Results for other filter
+        sets are dropped, since they no longer cover the whole store.
+
+        Args:
+            store (LineStore): The file's lines, after `LineStore.refresh()`.
+            filters (list): The file's filter dictionaries.
+            first (int): Index of the first appended line.
+
+        Returns:
+            tuple: The `(keys, indices)` run of the appended lines that pass,
+                   in timestamp order, or None if `filters` had no cached result.
+        """
+        with self._lock:
+            key = filter_key(filters)
+            entry = self._entries.get(key)
+            self._entries.clear()
+            if entry is None:
+                return None
+
+            timestamps = store.timestamps
+            candidates = array.array("q", (i for i in range(first, len(timestamps)) if timestamps[i] != NO_TIMESTAMP))
+            new_indices = filter_store(store, filters, candidates, stopped=self.stopped)
+            new_keys, new_run_indices = sorted_run(timestamps, new_indices)
+
+            indices, full_cost, run, timeline = entry
+            indices.extend(new_indices)
+            if run is not None:
+                keys, run_indices = run
+                if new_run_indices is new_indices and (not keys or not new_keys or new_keys[0] >= keys[-1]):
+                    keys.extend(new_keys)
+                    # For files in time order the run shares its indices with the result
+                    if run_indices is not indices:
+                        run_indices.extend(new_indices)
+                    if timeline is not None:
+                        timeline.extend(new_keys)
+                else:
+                    # The appended lines go back in time; sort again on the next lookup
+                    run = None
+            if run is None:
+                timeline = None
+            self._entries[key] = (indices, full_cost, run, timeline)
+            return new_keys, new_run_indices
+
+    def _narrowest_parent(self, key):
+        includes, excludes = key
+        candidates = [(k, v) for k, v in self._entries.items() if k[0] == includes and k[1] < excludes]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda item: len(item[1][0]))
+
+    def _remember(self, key, indices, full_cost):
+        self._entries[key] = (indices, full_cost, None, None)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
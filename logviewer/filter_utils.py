@@ -1,5 +1,69 @@
-
+import contextlib
+import functools
+import logging
+import os
 import re
+import signal
+import threading
+import time
+from .field_utils import FieldRule, parse_record
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Characters on which `backtracking_risk()` compares character classes: ASCII,
+# Latin-1 and a few other letters, digits and spaces with special cases.
+_PROBE_CHARS = [chr(c) for c in range(256)] + list("İıſΣσςKж٣\u2028\u3000中")
+
+# Category codes of \d, \D, \s, \S, \w and \W, by the escape that matches them.
+_CATEGORY_ESCAPES = {sre_parse.CATEGORIES[escape][1][0][1]: escape for escape in (r"\d", r"\D", r"\s", r"\S", r"\w", r"\W")}
+
+# Atomic groups and possessive quantifiers, whose body is never backtracked
+# into (Python 3.11+).
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+_POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+
+# Shortest literal worth checking before running a regex.
+MIN_LITERAL_LENGTH = 3
+
+# From this many literals on, one combined regex scan beats separate `in`
+# tests (see benchmarks/bench_filter_engine.py).
+MULTI_PATTERN_MIN_LITERALS = 20
+
+# Lines each filter is timed on by `profile_filters`.
+PROFILE_SAMPLE_LINES = 5_000
+
+# Regexes kept compiled (with their analysis) by `compile_regex`, shared by
+# all sessions and filter plans.
+REGEX_CACHE_SIZE = 1024
+
+# Time a regex that may backtrack catastrophically may run on one line before
+# it is stopped (at most 1.5 times as long); 0 disables the budget.
+REGEX_BUDGET_SECONDS = float(os.environ.get("LOGVIEWER_REGEX_BUDGET", 1.0))
+
+
+class RegexTimeout(TimeoutError):
+    """
+    Raised when a regex runs longer than REGEX_BUDGET_SECONDS on one line.
+
+    The search is stopped at most 1.5 times REGEX_BUDGET_SECONDS after it
+    started (see `_Watchdog`).
+
+    Args:
+        pattern (str): The regex.
+        flags (int): Its flags as given to `compile_regex` (0 or re.IGNORECASE).
+    """
+
+    def __init__(self, pattern, flags=0):
+        super().__init__(pattern, flags)
+        self.pattern = pattern
+        self.flags = flags
+
+    def __str__(self):
+        return f"regex {self.pattern!r} ran longer than {REGEX_BUDGET_SECONDS:g}s on one line"
+
 
 def filter_lines(lines, include_text=None, exclude_text=None, include_regex=None, exclude_regex=None, case_sensitive=True):
     """
@@ -37,7 +101,7 @@ def filter_lines(lines, include_text=None, exclude_text=None, include_regex=None
     # Include regex filter
     if include_regex:
         try:
-            pattern = re.compile(include_regex, flags)
+            pattern = compile_regex(include_regex, flags)[0]
             filtered = [line for line in filtered if pattern.search(line)]
         except re.error as e:
             # Handle invalid regex gracefully, maybe log the error or return an empty list
@@ -47,10 +111,736 @@ def filter_lines(lines, include_text=None, exclude_text=None, include_regex=None
     # Exclude regex filter
     if exclude_regex:
         try:
-            pattern = re.compile(exclude_regex, flags)
+            pattern = compile_regex(exclude_regex, flags)[0]
             filtered = [line for line in filtered if not pattern.search(line)]
         except re.error as e:
             print(f"Invalid exclude regex: {e}")
             return []
 
     return filtered
+
+
+def literal_matcher(literals):
+    """
+    Builds one test for "does the text contain any of these literals".
+
+    Up to MULTI_PATTERN_MIN_LITERALS literals are `in` tests, which use
+    CPython's fast substring search. More literals are merged into one regex
+    shaped like a trie of the literals (common prefixes are shared and a
+    literal that extends a shorter one is dropped), so all of them are found
+    in one scan of the text instead of one scan per literal.
+
+    Args:
+        literals (iterable): Non-empty strings.
+
+    Returns:
+        callable: A function taking the text and returning a truthy value if
+                  any literal occurs in it, or None if there are no literals.
+    """
+    literals = sorted(set(literals))
+    if not literals:
+        return None
+    if len(literals) == 1:
+        literal = literals[0]
+        return lambda text: literal in text
+    if len(literals) < MULTI_PATTERN_MIN_LITERALS:
+        literals = tuple(literals)
+
+        def contains_any(text):
+            for literal in literals:
+                if literal in text:
+                    return True
+            return False
+        return contains_any
+
+    trie = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = {}
+
+    def build(node):
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return re.compile(build(trie)).search
+
+
+def _literal_runs(items, runs, current):
+    # Collects the runs of consecutive literal characters that every match of
+    # a parsed pattern must contain; anything optional or variable ends a run.
+    # A plain group continues the current run; the caller ends the last run.
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            _literal_runs(av[3], runs, current)
+            continue
+        runs.append("".join(current))
+        current.clear()
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            inner = []
+            _literal_runs(av[2], runs, inner)
+            runs.append("".join(inner))
+
+
+def required_literal(pattern):
+    """
+    Returns the longest literal string that every match of a compiled regex contains.
+
+    Used as a cheap prefilter: a line without the literal cannot match, so the
+    regex engine is skipped for it.
+
+    Args:
+        pattern (re.Pattern): A compiled `str` pattern.
+
+    Returns:
+        tuple: `(literal, ignore_case)`, or `(None, False)` if the pattern has
+               no required literal of at least MIN_LITERAL_LENGTH characters.
+               With `ignore_case` the literal is lower-cased and must be
+               looked up in the lower-cased line.
+    """
+    try:
+        return compile_regex(pattern.pattern, pattern.flags & ~re.UNICODE)[1:3]
+    except Exception:
+        return None, False
+
+
+def _required_literal(parsed):
+    # required_literal() of a parsed pattern
+    runs = []
+    current = []
+    _literal_runs(parsed, runs, current)
+    runs.append("".join(current))
+    literal = max(runs, key=len)
+    if len(literal) < MIN_LITERAL_LENGTH:
+        return None, False
+    if parsed.state.flags & re.IGNORECASE:
+        # Unicode case folding differs from str.lower() for a few characters,
+        # so case-insensitive literals are only used for ASCII
+        if not literal.isascii():
+            return None, False
+        return literal.lower(), True
+    return literal, False
+
+
+def _char_test(op, av, flags):
+    # Membership test of a one-character item, or None for other items
+    if op is sre_parse.LITERAL:
+        return lambda c: ord(c) == av
+    if op is sre_parse.NOT_LITERAL:
+        return lambda c: ord(c) != av
+    if op is sre_parse.ANY:
+        return lambda c: flags & re.DOTALL or c != "\n"
+    if op is not sre_parse.IN:
+        return None
+    negate = bool(av) and av[0][0] is sre_parse.NEGATE
+    tests = []
+    for kind, value in av[negate:]:
+        if kind is sre_parse.LITERAL:
+            tests.append(lambda c, value=value: ord(c) == value)
+        elif kind is sre_parse.RANGE:
+            tests.append(lambda c, low=value[0], high=value[1]: low <= ord(c) <= high)
+        elif kind is sre_parse.CATEGORY and value in _CATEGORY_ESCAPES:
+            regex = re.compile(_CATEGORY_ESCAPES[value], flags & re.ASCII)
+            tests.append(lambda c, match=regex.match: match(c) is not None)
+        else:
+            return lambda c: True
+    return lambda c: any(test(c) for test in tests) != negate
+
+
+def _char_set(op, av, flags):
+    # The probe characters a one-character item matches, or None for other items
+    test = _char_test(op, av, flags)
+    if test is None:
+        return None
+    if flags & re.IGNORECASE and op is not sre_parse.ANY:
+        # Case variants that are one character (not e.g. "ß".upper())
+        return frozenset(c for c in _PROBE_CHARS
+                         if any(test(v) for v in (c, c.lower(), c.upper()) if len(v) == 1))
+    return frozenset(c for c in _PROBE_CHARS if test(c))
+
+
+def _group_flags(flags, av):
+    # Flags inside a group with inline flags, e.g. (?i:...)
+    return (flags | av[1]) & ~av[2]
+
+
+def _first(items, flags):
+    # (the probe characters a match of `items` can start with, whether it can
+    # be empty); unknown items count as any character and possibly empty
+    chars = frozenset()
+    for op, av in items:
+        item_chars = _char_set(op, av, flags)
+        nullable = False
+        if item_chars is not None:
+            pass
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, _POSSESSIVE_REPEAT):
+            item_chars, nullable = _first(av[2], flags)
+            nullable = nullable or av[0] == 0
+        elif op is sre_parse.SUBPATTERN:
+            item_chars, nullable = _first(av[3], _group_flags(flags, av))
+        elif op is _ATOMIC_GROUP:
+            item_chars, nullable = _first(av, flags)
+        elif op is sre_parse.BRANCH:
+            firsts = [_first(branch, flags) for branch in av[1]]
+            item_chars = frozenset().union(*(first for first, _ in firsts))
+            nullable = any(empty for _, empty in firsts)
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            item_chars, nullable = frozenset(), True
+        else:
+            item_chars, nullable = frozenset(_PROBE_CHARS), True
+        chars |= item_chars
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _ambiguity(items, follow, flags):
+    # Why one pass over `items`, followed by one of the characters `follow`,
+    # can match the same text in several ways, or None. Inside a repeated
+    # group, such a choice multiplies with every repetition.
+    items = list(items)
+    for i, (op, av) in enumerate(items):
+        after, nullable = _first(items[i + 1:], flags)
+        if nullable:
+            after |= follow
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            first = _first(body, flags)[0]
+            # A variable quantifier whose body can start with what follows it
+            # can stop at several points
+            if low < high and first & after:
+                return "nested quantifiers that can match the same text"
+            reason = _ambiguity(body, first | after if high > 1 else after, flags)
+        elif op is sre_parse.SUBPATTERN:
+            reason = _ambiguity(av[3], after, _group_flags(flags, av))
+        elif op is sre_parse.BRANCH:
+            firsts = []
+            for branch in av[1]:
+                first, empty = _first(branch, flags)
+                firsts.append(first | after if empty else first)
+            if any(a & b for j, a in enumerate(firsts) for b in firsts[j + 1:]):
+                return "alternatives inside a quantifier that can match the same prefix"
+            reason = next(filter(None, (_ambiguity(branch, after, flags) for branch in av[1])), None)
+        else:
+            # One-character items and assertions have one way to match; atomic
+            # groups and possessive quantifiers never backtrack into their body
+            continue
+        if reason:
+            return reason
+    return None
+
+
+def _backtracking_risk(items, flags):
+    # (why a parsed pattern may backtrack catastrophically or None, its
+    # number of unbounded `.` quantifiers in a row)
+    wildcards = 0
+    for op, av in items:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            reason = None
+            if low < high and high > 1:
+                reason = _ambiguity(body, _first(body, flags)[0], flags)
+            if not reason:
+                reason, inner = _backtracking_risk(body, flags)
+            if high == sre_parse.MAXREPEAT and list(body) == [(sre_parse.ANY, None)]:
+                wildcards += 1
+            elif low == high:
+                wildcards += inner * high
+        elif op is sre_parse.SUBPATTERN:
+            reason, inner = _backtracking_risk(av[3], _group_flags(flags, av))
+            wildcards += inner
+        elif op is sre_parse.BRANCH:
+            reason = next(filter(None, (_backtracking_risk(branch, flags)[0] for branch in av[1])), None)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            reason = _backtracking_risk(av[1], flags)[0]
+        else:
+            # Atomic groups and possessive quantifiers never backtrack into
+            # their body
+            continue
+        if reason:
+            return reason, 0
+    if wildcards >= 3:
+        return "three or more unbounded wildcards in a row", wildcards
+    return None, wildcards
+
+
+def backtracking_risk(pattern):
+    """
+    Tells whether a regex may backtrack catastrophically on some lines.
+
+    A static check of the parsed pattern for the shapes behind most runaway
+    regexes: inside a repeated group, a variable quantifier whose body can
+    start with a character that may follow it (e.g. `(a+)+` or
+    `(\\w+\\s?)*`) or alternatives that can start with the same character
+    (e.g. `(a|aa)*`), and three or more unbounded wildcards in a row (e.g.
+    `.*=.*=.*;`). These can match a line in exponentially or highly
+    polynomially many ways. Repeated groups that can only be split one way,
+    such as `(foo|bar)+` or `(\\d+\\.)+\\d+`, are not flagged. Character
+    classes are compared on ASCII, Latin-1 and a few other characters.
+    Flagged regexes are only run under the time budget (REGEX_BUDGET_SECONDS),
+    which stops the ones that actually run away.
+
+    Args:
+        pattern (re.Pattern): A compiled `str` pattern.
+
+    Returns:
+        str: The risky construct, or None if the pattern has none.
+    """
+    try:
+        return compile_regex(pattern.pattern, pattern.flags & ~re.UNICODE)[3]
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(pattern, flags=0):
+    """
+    Compiles and analyses a regex, through a bounded cache shared by all sessions.
+
+    Filter plans are compiled for every file on every view update and in
+    every worker, so parsing the pattern again each time (for its required
+    literal and its risk) would cost more than the compilation `re` caches.
+
+    Args:
+        pattern (str): The regex.
+        flags (int, optional): `re` flags. Defaults to 0.
+
+    Returns:
+        tuple: `(regex, literal, ignore_case, risk)`: the compiled pattern,
+               the result of `required_literal()` and that of
+               `backtracking_risk()`.
+
+    Raises:
+        re.error: If the pattern is invalid (failures are not cached).
+    """
+    regex = re.compile(pattern, flags)
+    parsed = sre_parse.parse(pattern, flags)
+    return (regex,) + _required_literal(parsed) + (_backtracking_risk(parsed, parsed.state.flags)[0],)
+
+
+def regex_key(f):
+    """Returns the `(pattern, flags)` a regex filter is compiled with, or None for other filters."""
+    if f["type"] not in ("Include Regex", "Exclude Regex") or not f["value"]:
+        return None
+    return f["value"], 0 if f["case_sensitive"] else re.IGNORECASE
+
+
+def regex_status(f, stopped=None):
+    """
+    Returns "stopped" for a regex filter in `stopped` (see `FilterPlan`),
+    "risky" for one that runs under the time budget, and "" for any other filter.
+    """
+    key = regex_key(f)
+    if key is None:
+        return ""
+    if stopped and key in stopped:
+        return "stopped"
+    try:
+        return "risky" if compile_regex(*key)[3] else ""
+    except re.error:
+        return ""
+
+
+def budget_enabled():
+    """True if risky regexes get a time budget (it needs `signal.setitimer`, so not on Windows)."""
+    return REGEX_BUDGET_SECONDS > 0 and hasattr(signal, "setitimer")
+
+
+def can_interrupt():
+    """True if a regex running in this thread can be stopped by the time budget (only a main thread can)."""
+    return budget_enabled() and threading.current_thread() is threading.main_thread()
+
+
+class _Watchdog:
+    # Stops a budgeted regex search that is still running at three consecutive
+    # ticks of a periodic SIGALRM timer every REGEX_BUDGET_SECONDS / 2, i.e.
+    # after it ran for at least REGEX_BUDGET_SECONDS and at most 1.5 times
+    # that. A search costs two attribute updates, instead of two setitimer calls.
+    # The timer and the handler only exist inside (nested) `armed()` blocks.
+
+    def __init__(self):
+        self.pid = None
+        self.depth = 0
+        self.previous = None
+        self.serial = 0
+        self.seen = 0
+        self.strikes = 0
+        self.running = None
+
+    def tick(self, signum, frame):
+        if self.running is not None and self.serial == self.seen:
+            self.strikes += 1
+            if self.strikes == 2:
+                raise RegexTimeout(*self.running)
+        else:
+            self.strikes = 0
+        self.seen = self.serial
+
+    @contextlib.contextmanager
+    def armed(self):
+        if self.pid != os.getpid():
+            # A forked process does not inherit the parent's timer
+            self.pid, self.depth = os.getpid(), 0
+        if self.depth == 0:
+            if signal.getitimer(signal.ITIMER_REAL)[0]:
+                # The timer belongs to other code; leave it alone, unguarded
+                yield
+                return
+            self.previous = signal.signal(signal.SIGALRM, self.tick)
+            interval = REGEX_BUDGET_SECONDS / 2
+            signal.setitimer(signal.ITIMER_REAL, interval, interval)
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, signal.SIG_DFL if self.previous is None else self.previous)
+
+    def guard(self, regex):
+        # regex.search, stopped when it overruns the budget inside `armed()`
+        search = regex.search
+        key = (regex.pattern, regex.flags & ~re.UNICODE)
+
+        def budgeted_search(line):
+            self.serial += 1
+            self.running = key
+            try:
+                return search(line)
+            finally:
+                self.running = None
+        return budgeted_search
+
+
+_watchdog = _Watchdog()
+
+
+class FilterPlan:
+    """
+    A file's filter list compiled once into a single predicate over lines.
+
+    The plan keeps the semantics of the merged view: include filters are OR'ed
+    together (a line is kept if any include matches, or if there are no
+    includes at all) and exclude filters are applied afterwards, dropping any
+    line that one of them matches. Every rule is evaluated in a single pass per
+    line, and case-insensitive rules share one lower-cased copy of it.
+
+    Text rules are merged per group (includes or excludes) and case mode into
+    one `literal_matcher`, so 50 text filters cost about as much as a few.
+    Regex rules run only on lines containing their `required_literal`.
+
+    Regexes that `backtracking_risk()` flags run under a time budget when the
+    plan is compiled in a thread that can enforce it (see `can_interrupt()`)
+    and evaluated inside `budget()`: a search taking longer than
+    REGEX_BUDGET_SECONDS on one line raises `RegexTimeout`. Callers add the
+    regex to their `stopped` regexes, which plans compiled with them treat as
+    invalid. `has_unguarded_regexes` tells callers on other threads to
+    evaluate the plan in a worker process.
+
+    Field rules ("Include Field"/"Exclude Field", see `field_utils.FieldRule`)
+    test a field of JSON lines. Applied to a `LineStore` they are evaluated
+    on its columnar fields; on plain lines each line is parsed at most once.
+
+    Args:
+        filters (list): Filter dictionaries as stored in the application state
+                        and saved by `save_filters`
+                        (`{"type": ..., "value": ..., "case_sensitive": ...}`).
+        stopped (dict, optional): Regexes stopped for overrunning the time
+                                  budget, as `{(pattern, flags): reason}`
+                                  keyed like `regex_key()`.
+    """
+
+    def __init__(self, filters, stopped=None):
+        self.includes = []
+        self.excludes = []
+        self.has_includes = False
+        self.include_all = False
+        self.exclude_all = False
+
+        for f in filters:
+            filter_type = f["type"]
+            value = f["value"]
+            case = f["case_sensitive"]
+
+            if "Include" in filter_type:
+                self.has_includes = True
+                rule = self._compile_rule(filter_type, value, case, "include", stopped)
+                if rule is True:
+                    self.include_all = True
+                elif rule:
+                    self.includes.append(rule)
+            elif "Exclude" in filter_type:
+                rule = self._compile_rule(filter_type, value, case, "exclude", stopped)
+                if rule is False:
+                    self.exclude_all = True
+                elif rule and rule is not True:
+                    self.excludes.append(rule)
+
+        self._include_fields = [matcher for kind, matcher, _ in self.includes if kind == "field"]
+        self._exclude_fields = [matcher for kind, matcher, _ in self.excludes if kind == "field"]
+        risky = budget_enabled() and any(kind == "regex" and backtracking_risk(matcher)
+                                         for kind, matcher, _ in self.includes + self.excludes)
+        self.guarded = risky and can_interrupt()
+        self._unguarded = risky and not self.guarded
+        self._include_group = self._compile_group([rule for rule in self.includes if rule[0] != "field"], self.guarded)
+        self._exclude_group = self._compile_group([rule for rule in self.excludes if rule[0] != "field"], self.guarded)
+        self.needs_lower = any(group[1] is not None or any(folded for _, _, folded in group[2])
+                               for group in (self._include_group, self._exclude_group) if group)
+
+    @staticmethod
+    def _compile_rule(filter_type, value, case_sensitive, kind, stopped=None):
+        """
+        Turns one filter into a `(rule_kind, matcher, case_sensitive)` tuple.
+
+        Returns True for a rule that matches every line (an empty value), False
+        for a rule that cannot be evaluated (an invalid regex or field
+        condition, or a regex in `stopped`), and None for an
+        unknown filter type. This mirrors how `filter_lines` treats the same
+        inputs: empty values are ignored and invalid regexes yield no lines.
+        """
+        if filter_type in ("Include Text", "Exclude Text"):
+            if not value:
+                return True
+            return ("text", value if case_sensitive else value.lower(), case_sensitive)
+        if filter_type in ("Include Regex", "Exclude Regex"):
+            if not value:
+                return True
+            flags = 0 if case_sensitive else re.IGNORECASE
+            if stopped and (value, flags) in stopped:
+                return False
+            try:
+                return ("regex", compile_regex(value, flags)[0], case_sensitive)
+            except re.error as e:
+                print(f"Invalid {kind} regex: {e}")
+                return False
+        if filter_type in ("Include Field", "Exclude Field"):
+            if not value:
+                return True
+            try:
+                return ("field", FieldRule(value, case_sensitive), case_sensitive)
+            except ValueError as e:
+                print(f"Invalid {kind} field filter: {e}")
+                return False
+        return None
+
+    @staticmethod
+    def _compile_group(rules, guarded):
+        # (case-sensitive text matcher, lower-cased text matcher, regex
+        # searches with their required literal) for one group of rules. With
+        # `guarded` the searches of risky regexes run under the time budget.
+        sensitive = literal_matcher(matcher for kind, matcher, case in rules if kind == "text" and case)
+        insensitive = literal_matcher(matcher for kind, matcher, case in rules if kind == "text" and not case)
+        regexes = []
+        for kind, matcher, _ in rules:
+            if kind == "regex":
+                search = _watchdog.guard(matcher) if guarded and backtracking_risk(matcher) else matcher.search
+                regexes.append((search,) + required_literal(matcher))
+        return (sensitive, insensitive, regexes) if rules else None
+
+    @staticmethod
+    def _any_match(group, line, lowered):
+        sensitive, insensitive, regexes = group
+        if sensitive is not None and sensitive(line):
+            return True
+        if insensitive is not None and insensitive(lowered):
+            return True
+        for search, literal, folded in regexes:
+            if literal is not None:
+                if not folded:
+                    if literal not in line:
+                        continue
+                elif literal not in lowered and line.isascii():
+                    continue
+            if search(line):
+                return True
+        return False
+
+    @property
+    def has_field_rules(self):
+        """True if the plan tests JSON fields, which are fastest on a store's columns."""
+        return bool(self._include_fields or self._exclude_fields)
+
+    def budget(self):
+        """
+        Returns a context manager that runs the regex time budget for its block.
+
+        Guarded regexes are only stopped while the plan is evaluated inside
+        it; the budget's timer and SIGALRM handler are removed (and a previous
+        handler restored) when the block ends. For plans without guarded
+        regexes it does nothing.
+        """
+        return _watchdog.armed() if self.guarded else contextlib.nullcontext()
+
+    @property
+    def has_unguarded_regexes(self):
+        """True if the plan has risky regexes that this thread cannot stop, so it should run in a worker process."""
+        return self._unguarded
+
+    @property
+    def matches_everything(self):
+        """True if the plan keeps every line, so callers can skip the scan."""
+        return (not self.has_includes or self.include_all) and not self.excludes and not self.exclude_all
+
+    def matches(self, line):
+        """Returns True if `line` passes the compiled filter list."""
+        if self.exclude_all:
+            return False
+        lowered = line.lower() if self.needs_lower else None
+        record = None
+        if self.has_includes and not self.include_all and \
+                (self._include_group is None or not self._any_match(self._include_group, line, lowered)):
+            if not self._include_fields:
+                return False
+            record = parse_record(line)
+            if not any(rule.matches_record(record) for rule in self._include_fields):
+                return False
+        if self._exclude_group is not None and self._any_match(self._exclude_group, line, lowered):
+            return False
+        if self._exclude_fields:
+            if record is None:
+                record = parse_record(line)
+            return not any(rule.matches_record(record) for rule in self._exclude_fields)
+        return True
+
+    def apply(self, lines, indices=None):
+        """
+        Yields the indices of the lines that pass the filter list.
+
+        Args:
+            lines (list): The lines to evaluate.
+            indices (iterable, optional): Restrict evaluation to these indices
+                                          of `lines`. Defaults to all of them.
+
+        Returns:
+            generator: The matching indices, in the order they were visited.
+        """
+        if indices is None:
+            indices = range(len(lines))
+        if self.matches_everything:
+            yield from indices
+            return
+        if self.exclude_all:
+            return
+        with self.budget():
+            if self.has_field_rules and hasattr(lines, "fields"):
+                yield from self._apply_columns(lines, indices)
+                return
+            matches = self.matches
+            for i in indices:
+                if matches(lines[i]):
+                    yield i
+
+    def _apply_columns(self, store, indices):
+        # Field rules become sets of line indices selected on the store's
+        # columns; lines are only decoded when text or regex rules remain.
+        columns = store.fields()
+        include_rows = set().union(*(rule.select(columns) for rule in self._include_fields))
+        exclude_rows = set().union(*(rule.select(columns) for rule in self._exclude_fields))
+        check_includes = self.has_includes and not self.include_all
+        include_group = self._include_group
+        exclude_group = self._exclude_group
+        any_match = self._any_match
+        for i in indices:
+            if i in exclude_rows:
+                continue
+            included = not check_includes or i in include_rows
+            if included and exclude_group is None:
+                yield i
+                continue
+            if not included and include_group is None:
+                continue
+            line = store[i]
+            lowered = line.lower() if self.needs_lower else None
+            if not included and not any_match(include_group, line, lowered):
+                continue
+            if exclude_group is None or not any_match(exclude_group, line, lowered):
+                yield i
+
+
+def compile_filters(filters, stopped=None):
+    """
+    Compiles a list of filter dictionaries into a `FilterPlan`.
+    """
+    return FilterPlan(filters, stopped)
+
+
+def profile_filters(lines, filters, indices=None, sample_lines=PROFILE_SAMPLE_LINES, stopped=None):
+    """
+    Measures every filter of a list on its own, to find slow or unselective ones.
+
+    A `FilterPlan` evaluates all rules in one pass, so their individual costs
+    are not visible in it. Here each rule is compiled alone and run over the
+    same evenly spaced sample of lines (decoded once, outside the timing).
+
+    Args:
+        lines (sequence): The lines, e.g. a `LineStore`.
+        filters (list): The filter dictionaries.
+        indices (sequence, optional): The candidate line indices. Defaults to
+                                      all lines.
+        sample_lines (int, optional): Size of the sample. Defaults to
+                                      PROFILE_SAMPLE_LINES.
+        stopped (dict, optional): The stopped regexes (see `FilterPlan`);
+                                  regexes stopped here are added to it.
+
+    Returns:
+        list: One dict per filter with the estimated `seconds` over all
+              candidates, the `selectivity`, the fraction of sampled lines
+              the rule matches (includes) or removes (excludes), and the
+              `status` of its regex (see `regex_status()`).
+    """
+    sample, scale = profile_sample(lines, indices, sample_lines)
+    return time_filters(sample, filters, scale, stopped)
+
+
+def profile_sample(lines, indices=None, sample_lines=PROFILE_SAMPLE_LINES):
+    """
+    Returns `profile_filters`' evenly spaced sample of the lines, and the
+    factor from the sample's timings to estimates for all candidates.
+    """
+    if indices is None:
+        indices = range(len(lines))
+    step = max(1, len(indices) // sample_lines)
+    sample = [lines[i] for i in indices[::step]]
+    return sample, len(indices) / len(sample) if sample else 0.0
+
+
+def time_filters(sample, filters, scale=1.0, stopped=None):
+    """
+    Times each filter alone on sample lines (see `profile_filters`).
+
+    A risky regex that overruns the time budget is added to `stopped`; its
+    entry then has the `seconds` spent until it was stopped and no
+    `selectivity`.
+    """
+    stopped = {} if stopped is None else stopped
+    profile = []
+    for f in filters:
+        plan = compile_filters([f], stopped)
+        start = time.perf_counter()
+        try:
+            with plan.budget():
+                passed = sum(1 for line in sample if plan.matches(line))
+        except RegexTimeout as e:
+            logging.warning(f"Stopped pathological regex: {e}")
+            stopped[(e.pattern, e.flags)] = str(e)
+            passed = None
+        elapsed = time.perf_counter() - start
+        if passed is None:
+            selectivity = None
+        else:
+            hits = passed if "Include" in f["type"] else len(sample) - passed
+            selectivity = hits / len(sample) if sample else 0.0
+        profile.append({"filter": f, "seconds": elapsed * scale, "selectivity": selectivity,
+                        "status": regex_status(f, stopped)})
+    return profile
@@ -0,0 +1,386 @@
+import array
+import datetime
+import itertools
+import mmap
+import operator
+import os
+import sys
+import tempfile
+import threading
+import weakref
+from .compression_utils import remove_quietly
+from .field_utils import FieldColumns
+from .timestamp_utils import NO_TIMESTAMP, SNIFF_LINES, TimestampParser, detect_format, from_epoch_ns
+
+_source_ids = {}
+_source_names = []
+
+
+def intern_source(name: str) -> int:
+    """
+    Returns a small integer id for a source filename, allocating one if needed.
+    """
+    source_id = _source_ids.get(name)
+    if source_id is None:
+        source_id = len(_source_names)
+        _source_ids[name] = source_id
+        _source_names.append(name)
+    return source_id
+
+
+def source_name(source_id: int) -> str:
+    """
+    Returns the source filename for an id allocated by `intern_source`.
+    """
+    return _source_names[source_id]
+
+
+def decode_line(raw: bytes) -> str:
+    """
+    Decodes one line as UTF-8, normalising a trailing CRLF to LF.
+    """
+    return normalize_newline(raw.decode("utf-8", errors="replace"))
+
+
+def normalize_newline(line: str) -> str:
+    """
+    Normalises a trailing CRLF of a decoded line to LF, like `decode_line`.
+
+    Lines read as text for the same rules as the stores must be split on LF
+    only (`newline="\n"`), since a bare CR does not end a line there.
+    """
+    if line.endswith("\r\n"):
+        return line[:-2] + "\n"
+    return line
+
+
+def _valid_range(timestamps) -> tuple[int, int]:
+    # Earliest and latest timestamp, or NO_TIMESTAMP twice if there is none
+    valid = [ts for ts in timestamps if ts != NO_TIMESTAMP]
+    return (min(valid), max(valid)) if valid else (NO_TIMESTAMP, NO_TIMESTAMP)
+
+
+def _merge_ranges(a: tuple[int, int], b: tuple[int, int]) -> tuple[int, int]:
+    # The range covering two ranges from _valid_range
+    if a[0] == NO_TIMESTAMP:
+        return b
+    if b[0] == NO_TIMESTAMP:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1])
+
+
+def sniff_format(data, size: int) -> str | None:
+    """
+    Detects the timestamp format from the first SNIFF_LINES lines of a mapped file.
+    """
+    sample = []
+    start = 0
+    while start < size and len(sample) < SNIFF_LINES:
+        end = data.find(b"\n", start)
+        end = size if end == -1 else end + 1
+        sample.append(decode_line(data[start:end]))
+        start = end
+    return detect_format(sample)
+
+
+def read_index(data, start: int, end: int, fmt: str | None) -> tuple[array.array, array.array]:
+    """
+    Indexes the lines of a mapped file between two line boundaries.
+
+    Args:
+        data: The mapped file contents.
+        start (int): Byte offset of the first line.
+        end (int): Byte offset just past the last line.
+        fmt (str): Timestamp format from `sniff_format`, or None.
+
+    Returns:
+        tuple: `(offsets, timestamps)` arrays with the start offset and the
+               epoch-nanosecond timestamp of every line in the range.
+    """
+    parse_ns = TimestampParser(fmt).parse_ns
+    offsets = array.array("q")
+    timestamps = array.array("q")
+    while start < end:
+        stop = data.find(b"\n", start, end)
+        stop = end if stop == -1 else stop + 1
+        offsets.append(start)
+        timestamps.append(parse_ns(decode_line(data[start:stop])))
+        start = stop
+    return offsets, timestamps
+
+
+class LineStore:
+    """
+    Compact view of a log file.
+
+    The file is memory-mapped and only two arrays are kept in memory: the byte
+    offset where each line starts and each line's timestamp in epoch
+    nanoseconds. Line text is decoded on demand, so indexing a store (or
+    slicing it with `lines()`) behaves like a list of strings without holding
+    one Python object per line. Existing lines never change; a followed store
+    only grows through `refresh()`. `unload()` moves the arrays to disk until
+    they are next used.
+
+    Args:
+        path (str): Path to the log file.
+        source (str): Name shown for the file in the merged view.
+        index (tuple, optional): A precomputed `(offsets, timestamps, fmt)`
+                                 index, e.g. from `parallel.index_files`.
+                                 Defaults to indexing the file here.
+        follow (bool, optional): Hold back a trailing line without a newline,
+                                 since it may still be being written.
+        temporary (bool, optional): The store owns `path` (e.g. a decompressed
+                                    copy) and deletes it once closed or
+                                    garbage collected.
+    """
+
+    def __init__(self, path: str, source: str, index=None, follow: bool = False, temporary: bool = False):
+        self.path = path
+        self.source = source
+        self.source_id = intern_source(source)
+        self.follow = follow
+        self._remove_file = weakref.finalize(self, remove_quietly, path) if temporary else None
+        self._fields = None
+        self._time_ordered = None
+        self._time_range = None
+        self.token_index = None
+        self._lock = threading.Lock()
+        self._spill_path = None
+        self._remove_spill = None
+
+        self._file = open(path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self._inode = stat.st_ino
+        size = stat.st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        if follow:
+            size = self._data.rfind(b"\n") + 1
+        if index is None:
+            fmt = sniff_format(self._data, size)
+            offsets, timestamps = read_index(self._data, 0, size, fmt)
+        else:
+            offsets, timestamps, fmt = index
+        offsets.append(size)
+        self._offsets = offsets
+        self._timestamps = timestamps
+        self.timestamp_format = fmt
+
+    @property
+    def offsets(self) -> array.array:
+        """Byte offset of every line, followed by the end of the last line."""
+        offsets = self._offsets
+        return offsets if offsets is not None else self._load()[0]
+
+    @property
+    def timestamps(self) -> array.array:
+        """Epoch-nanosecond timestamp of every line (NO_TIMESTAMP if it has none)."""
+        timestamps = self._timestamps
+        return timestamps if timestamps is not None else self._load()[1]
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the index arrays are in memory."""
+        return self._offsets is not None
+
+    def _load(self) -> tuple[array.array, array.array]:
+        # Reads back the arrays written by unload()
+        with self._lock:
+            if self._offsets is None:
+                with open(self._spill_path, "rb") as f:
+                    count = int.from_bytes(f.read(8), sys.byteorder)
+                    offsets = array.array("q")
+                    offsets.fromfile(f, count + 1)
+                    timestamps = array.array("q")
+                    timestamps.fromfile(f, count)
+                self._timestamps = timestamps
+                self._offsets = offsets
+            return self._offsets, self._timestamps
+
+    def unload(self, directory: str = None) -> int:
+        """
+        Frees the index arrays and parsed fields, keeping the arrays in a file.
+
+        The arrays are written once, to a file owned by the store, and read
+        back transparently the next time `offsets` or `timestamps` is used;
+        field columns are rebuilt on demand. The token index is kept. Followed
+        stores still grow and are never unloaded.
+
+        Args:
+            directory (str, optional): Where to write the arrays. Defaults to
+                                       the system temporary directory.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        if self.follow:
+            return 0
+        with self._lock:
+            if self._offsets is None:
+                return 0
+            freed = self.nbytes()
+            if self._spill_path is None:
+                fd, path = tempfile.mkstemp(prefix="logviewer-", suffix=".idx", dir=directory)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(len(self._timestamps).to_bytes(8, sys.byteorder))
+                    self._offsets.tofile(f)
+                    self._timestamps.tofile(f)
+                self._spill_path = path
+                self._remove_spill = weakref.finalize(self, remove_quietly, path)
+            self._offsets = None
+            self._timestamps = None
+            self._fields = None
+        return freed - self.nbytes()
+
+    def refresh(self) -> int | None:
+        """
+        Indexes the complete lines appended to the file since it was last read.
+
+        Returns:
+            int: The index of the first new line (equal to `len(self)` when
+                 nothing was appended), or None if the file was truncated or
+                 replaced, e.g. by log rotation. The store then still shows the
+                 old contents and the caller should open a new one.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Rotated away and not recreated yet
+            return len(self)
+        end = self.offsets[-1]
+        if stat.st_ino != self._inode or stat.st_size < end:
+            return None
+
+        first = len(self)
+        if stat.st_size > end:
+            data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            stop = data.rfind(b"\n", end) + 1
+            if stop > end:
+                if self.timestamp_format is None and first == 0:
+                    self.timestamp_format = sniff_format(data, stop)
+                offsets, timestamps = read_index(data, end, stop, self.timestamp_format)
+                offsets.append(stop)
+                # Readers may be rendering a page meanwhile: the old map stays
+                # valid for them, and the sentinel offset is replaced by the
+                # new offsets in one step before the new lines become visible.
+                self._data = data
+                self.offsets[-1:] = offsets
+                self.timestamps.extend(timestamps)
+                self._time_ordered = None
+                if self._time_range is not None:
+                    self._time_range = _merge_ranges(self._time_range, _valid_range(timestamps))
+        return first
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, i: int) -> str:
+        return self.line(i)
+
+    def __deepcopy__(self, memo):
+        # Lines are never changed, so session state copies can share the store.
+        return self
+
+    def line(self, i: int) -> str:
+        """Returns the text of line `i`, including its trailing newline."""
+        offsets = self.offsets
+        return decode_line(self._data[offsets[i]:offsets[i + 1]])
+
+    def lines(self, indices):
+        """Yields the text of the given lines."""
+        for i in indices:
+            yield self.line(i)
+
+    def timestamp(self, i: int) -> datetime.datetime | None:
+        """Returns the parsed timestamp of line `i`, or None."""
+        return from_epoch_ns(self.timestamps[i])
+
+    def valid_indices(self) -> list[int]:
+        """Returns the indices of all lines with a parseable timestamp."""
+        return [i for i, ts in enumerate(self.timestamps) if ts != NO_TIMESTAMP]
+
+    def time_range(self) -> tuple[datetime.datetime | None, datetime.datetime | None]:
+        """
+        Returns the earliest and latest timestamps in the file.
+
+        The lines are scanned once; lines appended by `refresh()` only widen
+        the remembered range.
+        """
+        if self._time_range is None:
+            self._time_range = _valid_range(self.timestamps)
+        low, high = self._time_range
+        return from_epoch_ns(low), from_epoch_ns(high)
+
+    def is_time_ordered(self) -> bool:
+        """Returns True if the lines with a timestamp are in non-decreasing time order (checked once)."""
+        if self._time_ordered is None:
+            valid = filter(NO_TIMESTAMP.__ne__, self.timestamps)
+            self._time_ordered = all(itertools.starmap(operator.le, itertools.pairwise(valid)))
+        return self._time_ordered
+
+    def first_at_or_after(self, ns: int) -> int:
+        """
+        Returns the index of the first line with a timestamp at or after `ns`, or `len(self)` if there is none.
+
+        The store must be time ordered (`is_time_ordered()`); lines without a
+        timestamp are stepped over during the bisection.
+        """
+        timestamps = self.timestamps
+        lo, hi = 0, len(timestamps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            j = mid
+            while j < hi and timestamps[j] == NO_TIMESTAMP:
+                j += 1
+            if j < hi and timestamps[j] < ns:
+                lo = j + 1
+            else:
+                hi = mid
+        while lo < len(timestamps) and timestamps[lo] == NO_TIMESTAMP:
+            lo += 1
+        return lo
+
+    def fields(self) -> FieldColumns:
+        """
+        Returns the columnar fields of a JSON-lines log.
+
+        The lines are parsed on first use and lines appended by `refresh()`
+        are parsed on the next call; lines that are not JSON objects have no
+        fields.
+        """
+        if self._fields is None:
+            self._fields = FieldColumns(self)
+        else:
+            self._fields.update(self)
+        return self._fields
+
+    def index_tokens(self):
+        """
+        Builds the store's `token_index.TokenIndex` once, so that text and regex filters only evaluate candidate lines.
+
+        Followed stores still grow and are not indexed.
+        """
+        # Imported on first use, so that reading logs does not load numpy
+        from .token_index import TokenIndex
+        if self.token_index is None and not self.follow:
+            self.token_index = TokenIndex(self._data, self.offsets)
+        return self.token_index
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the index arrays, parsed fields and token index, in bytes."""
+        offsets, timestamps, fields = self._offsets, self._timestamps, self._fields
+        tokens = self.token_index.nbytes() if self.token_index is not None else 0
+        if offsets is None:
+            return tokens
+        return (len(offsets) * offsets.itemsize + len(timestamps) * timestamps.itemsize
+                + (fields.nbytes() if fields is not None else 0) + tokens)
+
+    def close(self):
+        """Releases the memory map and the underlying file handle."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+        if self._remove_file is not None:
+            self._remove_file()
+        if self._remove_spill is not None:
+            self._remove_spill()
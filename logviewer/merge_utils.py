@@ -0,0 +1,178 @@
+import array
+import bisect
+import heapq
+import itertools
+import logging
+import operator
+
+
+def is_sorted(keys) -> bool:
+    """
+    Returns True if the sequence is in non-decreasing order.
+    """
+    return all(map(operator.le, keys, itertools.islice(keys, 1, None)))
+
+
+def sorted_run(timestamps, indices):
+    """
+    Returns the selected lines of one file in timestamp order.
+
+    Args:
+        timestamps: The file's per-line timestamps (e.g. `LineStore.timestamps`).
+        indices: The selected line indices, in file order.
+
+    Returns:
+        tuple: `(keys, indices)` arrays, where `keys[j]` is the timestamp of
+               line `indices[j]`. Files that are already time ordered (the
+               common case) are returned as-is; out-of-order files are sorted
+               stably.
+    """
+    keys = array.array("q", (timestamps[i] for i in indices))
+    if not isinstance(indices, array.array):
+        indices = array.array("q", indices)
+    if not is_sorted(keys):
+        logging.info(f"Run of {len(keys)} lines is not in timestamp order, sorting it")
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        keys = array.array("q", (keys[k] for k in order))
+        indices = array.array("q", (indices[k] for k in order))
+    return keys, indices
+
+
+def _run_iter(keys, indices, run_id: int, start: int = 0):
+    # Lazily yields (timestamp, run_id, line_index) from position `start` on.
+    positions = range(start, len(keys))
+    return zip(map(keys.__getitem__, positions), itertools.repeat(run_id), map(indices.__getitem__, positions))
+
+
+def timestamp_run(timestamps, indices, run_id: int):
+    """
+    Turns one file's selected lines into a sorted run for `merge_runs`.
+
+    Args:
+        timestamps: The file's per-line timestamps (e.g. `LineStore.timestamps`).
+        indices: The selected line indices, in file order.
+        run_id (int): Identifies the file in the merged output and breaks ties
+                      between files, so equal timestamps keep file order.
+
+    Returns:
+        iterator: `(timestamp, run_id, line_index)` tuples in timestamp order.
+    """
+    keys, indices = sorted_run(timestamps, indices)
+    return _run_iter(keys, indices, run_id)
+
+
+def merge_runs(runs):
+    """
+    Lazily merges sorted runs with a heap-based k-way merge.
+
+    Args:
+        runs (list): Iterables of tuples, each already sorted.
+
+    Returns:
+        iterator: The tuples of all runs in sorted order. Only one pending item
+                  per run is held at a time.
+    """
+    if len(runs) == 1:
+        return iter(runs[0])
+    return heapq.merge(*runs)
+
+
+class MergedView:
+    """
+    The merged, time-ordered result of several files, addressable by row number.
+
+    Only each file's sorted run is kept. The row at any offset is located by
+    counting, with bisections, how many rows of each run fall before a
+    candidate timestamp, so fetching a page costs O(k log n) plus the page
+    itself, independent of how many rows the view has.
+
+    Args:
+        sources (list): One entry per run (e.g. the LineStore it came from).
+        runs (list): `(keys, indices)` pairs from `sorted_run`, in the same
+                     order as `sources`; ties between runs keep this order.
+                     The view owns the arrays and may extend them.
+    """
+
+    def __init__(self, sources, runs):
+        self.sources = sources
+        self.runs = runs
+        self._length = sum(len(keys) for keys, _ in runs)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __deepcopy__(self, memo):
+        # Views are only rebuilt or extended, so session state copies can share them.
+        return self
+
+    def __iter__(self):
+        return self.rows()
+
+    def extend(self, run_id: int, keys, indices):
+        """
+        Adds rows to one run, e.g. lines appended to a followed file.
+
+        Args:
+            run_id (int): The run to extend.
+            keys, indices: A `(keys, indices)` pair from `sorted_run`.
+        """
+        if not keys:
+            return
+        run_keys, run_indices = self.runs[run_id]
+        if not run_keys or keys[0] >= run_keys[-1]:
+            run_indices.extend(indices)
+            run_keys.extend(keys)
+        else:
+            # Rows that go back in time are merged into the run
+            merged = list(heapq.merge(zip(run_keys, run_indices), zip(keys, indices), key=operator.itemgetter(0)))
+            self.runs[run_id] = (array.array("q", (k for k, _ in merged)), array.array("q", (i for _, i in merged)))
+        self._length += len(keys)
+
+    def rank(self, ts: int) -> int:
+        """Returns the number of rows with a timestamp before `ts`."""
+        return sum(bisect.bisect_left(keys, ts) for keys, _ in self.runs)
+
+    def _positions(self, offset: int) -> list[int]:
+        # Per-run start positions of the row at `offset` in the merged order.
+        if offset <= 0:
+            return [0] * len(self.runs)
+        if offset >= self._length:
+            return [len(keys) for keys, _ in self.runs]
+
+        # Find the timestamp of the row at `offset`: the smallest value with
+        # more than `offset` rows at or before it.
+        lo = min(keys[0] for keys, _ in self.runs if keys)
+        hi = max(keys[-1] for keys, _ in self.runs if keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sum(bisect.bisect_right(keys, mid) for keys, _ in self.runs) > offset:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        # Rows strictly before it are skipped in every run; the remaining
+        # rows with exactly that timestamp are taken in run order.
+        positions = [bisect.bisect_left(keys, lo) for keys, _ in self.runs]
+        remaining = offset - sum(positions)
+        for run_id, (keys, _) in enumerate(self.runs):
+            if remaining <= 0:
+                break
+            take = min(bisect.bisect_right(keys, lo) - positions[run_id], remaining)
+            positions[run_id] += take
+            remaining -= take
+        return positions
+
+    def rows(self, offset: int = 0, count: int | None = None):
+        """
+        Yields `(timestamp, run_id, line_index)` tuples in merged order.
+
+        Args:
+            offset (int, optional): Number of rows to skip. Defaults to 0.
+            count (int, optional): Maximum number of rows. Defaults to all.
+        """
+        positions = self._positions(offset)
+        merged = merge_runs([_run_iter(keys, indices, run_id, positions[run_id])
+                             for run_id, (keys, indices) in enumerate(self.runs)])
+        if count is not None:
+            merged = itertools.islice(merged, count)
+        return merged
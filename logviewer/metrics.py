@@ -0,0 +1,131 @@
+import bisect
+import collections
+import contextlib
+import http.server
+import logging
+import os
+import threading
+import time
+
+# Port of the local Prometheus endpoint (bound to 127.0.0.1); unset or "" leaves it off.
+METRICS_PORT = os.environ.get("LOGVIEWER_METRICS_PORT", "")
+
+# Upper bounds of the latency histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class StageMetrics:
+    """
+    Server-wide latency histograms of the processing stages, in Prometheus text format.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counts = collections.defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums = collections.defaultdict(float)
+
+    def observe(self, stage: str, seconds: float):
+        """Records one run of a stage."""
+        with self._lock:
+            self._counts[stage][bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sums[stage] += seconds
+
+    def render(self) -> str:
+        """Returns the histograms in the Prometheus text exposition format."""
+        lines = ["# HELP logviewer_stage_seconds Time spent in each processing stage.",
+                 "# TYPE logviewer_stage_seconds histogram"]
+        with self._lock:
+            for stage in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self._counts[stage]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'logviewer_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'logviewer_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]}')
+                lines.append(f'logviewer_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = StageMetrics()
+
+
+class Timings:
+    """
+    The latest timing of each stage for one session, shown in the UI.
+
+    Entries are keyed by label (e.g. "filter app.log"), so a stage that runs
+    again replaces its previous entry. `filters` holds the latest per-filter
+    profile of each file (see `filter_utils.profile_filters`).
+    """
+
+    def __init__(self):
+        self.stages = collections.OrderedDict()
+        self.filters = {}
+
+    def __deepcopy__(self, memo):
+        # Only ever replaced entry by entry, so session state copies can share it.
+        return self
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, label: str = None, detail: str = ""):
+        """
+        Times a block as one run of `stage`, for this session and for the server-wide metrics.
+
+        Args:
+            stage (str): The stage, e.g. "parse" or "filter".
+            label (str, optional): The entry shown in the UI. Defaults to `stage`.
+            detail (str, optional): Extra information shown with the entry.
+
+        Yields:
+            dict: Holds the `detail`, which the block may update.
+        """
+        entry = {"detail": detail}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.record(stage, time.perf_counter() - start, label, entry["detail"])
+
+    def record(self, stage: str, seconds: float, label: str = None, detail: str = ""):
+        """
+        Records one run of `stage` measured elsewhere, like `stage()` does for a block.
+        """
+        METRICS.observe(stage, seconds)
+        label = label or stage
+        self.stages.pop(label, None)
+        self.stages[label] = (seconds, detail)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1"):
+    """
+    Serves `/metrics` on a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The server, or None if the port is not available.
+    """
+    try:
+        server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.warning(f"Not serving metrics on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
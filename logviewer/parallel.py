@@ -0,0 +1,305 @@
+import array
+import bisect
+import concurrent.futures
+import logging
+import mmap
+import os
+from .filter_utils import RegexTimeout, compile_filters, profile_sample, regex_key, time_filters
+from .line_store import decode_line, read_index, sniff_format
+from .timestamp_utils import NO_TIMESTAMP, TimestampParser
+
+# Worker processes used for ingestion and filtering; 1 keeps everything in-process.
+WORKERS = int(os.environ.get("LOGVIEWER_WORKERS", os.cpu_count() or 1))
+
+# Files and stores smaller than these are handled in-process: below them the
+# cost of shipping work to another process outweighs the gain.
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+PARALLEL_MIN_LINES = 100_000
+
+# Upper bound on the size of one unit of work.
+CHUNK_BYTES = 64 * 1024 * 1024
+
+_pool = None
+_pool_workers = 0
+
+
+def get_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Returns a shared process pool with `workers` processes, creating it on first use.
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def _any_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    # The shared pool at whatever size it has, for work that only needs to run
+    # in another process
+    return _pool if _pool is not None else get_pool(max(workers, 1))
+
+
+def _open_map(path: str):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        return (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""), size
+
+
+def split_ranges(path: str, parts: int, chunk_bytes: int = CHUNK_BYTES) -> list[tuple[int, int]]:
+    """
+    Splits a file into byte ranges that start and end on line boundaries.
+
+    Args:
+        path (str): The file to split.
+        parts (int): Preferred number of ranges (e.g. the worker count).
+        chunk_bytes (int, optional): Maximum size of a range. Defaults to CHUNK_BYTES.
+
+    Returns:
+        list: `(start, end)` byte offsets covering the whole file.
+    """
+    data, size = _open_map(path)
+    target = min(max(-(-size // max(parts, 1)), 1), chunk_bytes)
+    ranges = []
+    start = 0
+    while start < size:
+        end = min(start + target, size)
+        if end < size:
+            newline = data.find(b"\n", end - 1)
+            end = size if newline == -1 else newline + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _index_range(path: str, start: int, end: int, fmt: str | None) -> tuple[bytes, bytes]:
+    # Worker: index one byte range and return the arrays as raw bytes.
+    data, _ = _open_map(path)
+    offsets, timestamps = read_index(data, start, end, fmt)
+    return offsets.tobytes(), timestamps.tobytes()
+
+
+def index_files(paths: list[str], workers: int = None) -> list[tuple[array.array, array.array, str | None]]:
+    """
+    Indexes several files in parallel, per file and per chunk of large files.
+
+    Args:
+        paths (list): Files to index.
+        workers (int, optional): Number of worker processes. Defaults to WORKERS.
+
+    Returns:
+        list: One `(offsets, timestamps, fmt)` index per path, ready to pass to
+              `LineStore(path, source, index=...)`.
+    """
+    workers = WORKERS if workers is None else workers
+    plans = []
+    for path in paths:
+        data, size = _open_map(path)
+        fmt = sniff_format(data, size)
+        parts = workers if size >= PARALLEL_MIN_BYTES else 1
+        plans.append((path, fmt, split_ranges(path, parts) if size else []))
+
+    total_ranges = sum(len(ranges) for _, _, ranges in plans)
+    if workers <= 1 or total_ranges <= 1:
+        results = [[_index_range(path, start, end, fmt) for start, end in ranges] for path, fmt, ranges in plans]
+    else:
+        pool = get_pool(workers)
+        futures = [[pool.submit(_index_range, path, start, end, fmt) for start, end in ranges]
+                   for path, fmt, ranges in plans]
+        results = [[future.result() for future in file_futures] for file_futures in futures]
+
+    indexes = []
+    for (path, fmt, _), chunks in zip(plans, results):
+        offsets = array.array("q")
+        timestamps = array.array("q")
+        for offsets_bytes, timestamps_bytes in chunks:
+            offsets.frombytes(offsets_bytes)
+            timestamps.frombytes(timestamps_bytes)
+        indexes.append((offsets, timestamps, fmt))
+    return indexes
+
+
+def _filter_range(path: str, first: int, offsets_bytes: bytes, timestamps_bytes: bytes,
+                  candidates_bytes: bytes | None, filters: list, stopped: dict) -> bytes:
+    # Worker: evaluate a filter list over lines `first`.. of a file. Without
+    # candidates every line with a timestamp is evaluated.
+    data, _ = _open_map(path)
+    offsets = array.array("q")
+    offsets.frombytes(offsets_bytes)
+    if candidates_bytes is None:
+        timestamps = array.array("q")
+        timestamps.frombytes(timestamps_bytes)
+        candidates = (first + j for j, ts in enumerate(timestamps) if ts != NO_TIMESTAMP)
+    else:
+        candidates = array.array("q")
+        candidates.frombytes(candidates_bytes)
+    plan = compile_filters(filters, stopped)
+    matches = plan.matches
+    result = array.array("q")
+    with plan.budget():
+        for i in candidates:
+            j = i - first
+            if matches(decode_line(data[offsets[j]:offsets[j + 1]])):
+                result.append(i)
+    return result.tobytes()
+
+
+def filter_store(store, filters: list, indices=None, workers: int = None, stopped: dict = None) -> array.array:
+    """
+    Returns the indices of the lines of `store` that pass `filters`.
+
+    If the store has a token index (`LineStore.index_tokens()`), the lines
+    are first narrowed to its candidates for the include filters. Large
+    stores are split into contiguous line ranges that are filtered in
+    worker processes; each worker receives only its slice of the offset array
+    (and of the timestamps or candidate indices) and returns matching indices
+    as a packed array.
+
+    Risky regexes run under the time budget of `filter_utils`, which only a
+    process's main thread can enforce, so from other threads (the web UI's
+    handlers) filter lists with such regexes go to a worker whatever the
+    size of the store. A regex that overruns the budget is added to
+    `stopped` and the filters are evaluated again, treating it as invalid.
+
+    Args:
+        store (LineStore): The file's lines.
+        filters (list): The file's filter dictionaries.
+        indices (array, optional): Sorted candidate line indices. Defaults to
+                                   every line with a timestamp.
+        workers (int, optional): Number of worker processes. Defaults to WORKERS.
+        stopped (dict, optional): The caller's stopped regexes, as
+                                  `{(pattern, flags): reason}` (see
+                                  `filter_utils.FilterPlan`).
+    """
+    workers = WORKERS if workers is None else workers
+    stopped = {} if stopped is None else stopped
+    try:
+        return _filter_store(store, filters, indices, workers, stopped)
+    except RegexTimeout as e:
+        logging.warning(f"Stopped pathological regex: {e}")
+        stopped[(e.pattern, e.flags)] = str(e)
+        return filter_store(store, filters, indices, workers, stopped)
+
+
+def _filter_store(store, filters: list, indices, workers: int, stopped: dict) -> array.array:
+    plan = compile_filters(filters, stopped)
+    # With a token index only the lines that may match the includes are evaluated
+    if store.token_index is not None:
+        narrowed = store.token_index.narrow(plan, store.timestamps, indices)
+        if narrowed is not None:
+            indices = narrowed
+    count = len(store) if indices is None else len(indices)
+    # Field filters run on the store's columns, which live in this process
+    parallel = workers > 1 and count >= PARALLEL_MIN_LINES and not plan.has_field_rules
+    if not parallel and not plan.has_unguarded_regexes:
+        if indices is None:
+            indices = store.valid_indices()
+        return array.array("q", plan.apply(store, indices))
+
+    parts = workers if parallel else 1
+    bounds = [len(store) * k // parts for k in range(parts + 1)]
+    pool = get_pool(workers) if parallel else _any_pool(workers)
+    futures = []
+    for first, last in zip(bounds, bounds[1:]):
+        if first == last:
+            continue
+        offsets_bytes = store.offsets[first:last + 1].tobytes()
+        if indices is None:
+            futures.append(pool.submit(_filter_range, store.path, first, offsets_bytes,
+                                       store.timestamps[first:last].tobytes(), None, filters, stopped))
+        else:
+            lo = bisect.bisect_left(indices, first)
+            hi = bisect.bisect_left(indices, last)
+            if lo == hi:
+                continue
+            futures.append(pool.submit(_filter_range, store.path, first, offsets_bytes, None,
+                                       array.array("q", indices[lo:hi]).tobytes(), filters, stopped))
+
+    result = array.array("q")
+    for future in futures:
+        result.frombytes(future.result())
+    return result
+
+
+def profile_store(store, filters: list, indices=None, workers: int = None, stopped: dict = None) -> list:
+    """
+    Runs `filter_utils.profile_filters()` on the lines of a store.
+
+    Like `filter_store()`, it moves to a worker process when a filter has a
+    risky regex that this thread cannot stop; regexes stopped there are added
+    to `stopped` here too.
+
+    Args:
+        store (LineStore): The file's lines.
+        filters (list): The file's filter dictionaries.
+        indices (sequence, optional): The candidate line indices. Defaults to
+                                      all lines.
+        workers (int, optional): Size of the pool if it has to be created.
+                                 Defaults to WORKERS.
+        stopped (dict, optional): The caller's stopped regexes (see `filter_store()`).
+
+    Returns:
+        list: The profile of `profile_filters()`, one dict per filter.
+    """
+    workers = WORKERS if workers is None else workers
+    stopped = {} if stopped is None else stopped
+    sample, scale = profile_sample(store, indices)
+    if not any(compile_filters([f], stopped).has_unguarded_regexes for f in filters):
+        return time_filters(sample, filters, scale, stopped)
+    profile = _any_pool(workers).submit(time_filters, sample, filters, scale, stopped).result()
+    for entry in profile:
+        if entry["status"] == "stopped":
+            key = regex_key(entry["filter"])
+            stopped.setdefault(key, str(RegexTimeout(*key)))
+    return profile
+
+
+def _filter_text_range(path: str, start: int, end: int, fmt: str | None, filters: list) -> str:
+    # Worker: the CLI's local mode over one byte range, returning the kept lines.
+    data, _ = _open_map(path)
+    parse_ns = TimestampParser(fmt).parse_ns
+    plan = compile_filters(filters)
+    matches = plan.matches
+    kept = []
+    with plan.budget():
+        while start < end:
+            stop = data.find(b"\n", start, end)
+            stop = end if stop == -1 else stop + 1
+            line = decode_line(data[start:stop])
+            if parse_ns(line) != NO_TIMESTAMP and matches(line):
+                kept.append(line)
+            start = stop
+    return "".join(kept)
+
+
+def filter_file_chunks(path: str, filters: list, workers: int = None):
+    """
+    Filters a file in parallel byte ranges, yielding the kept text in file order.
+
+    At most two ranges per worker are in flight, so memory stays bounded by
+    the chunk size regardless of the file size.
+
+    Args:
+        path (str): The log file.
+        filters (list): Filter dictionaries in the format written by `save_filters`.
+        workers (int, optional): Number of worker processes. Defaults to WORKERS.
+    """
+    workers = WORKERS if workers is None else workers
+    data, size = _open_map(path)
+    fmt = sniff_format(data, size)
+    ranges = split_ranges(path, workers * 4)
+    if workers <= 1:
+        for start, end in ranges:
+            yield _filter_text_range(path, start, end, fmt, filters)
+        return
+
+    pool = get_pool(workers)
+    pending = []
+    for start, end in ranges:
+        pending.append(pool.submit(_filter_text_range, path, start, end, fmt, filters))
+        if len(pending) >= workers * 2:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
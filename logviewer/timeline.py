@@ -0,0 +1,145 @@
+import bisect
+import numpy as np
+
+_SECOND = 1_000_000_000
+
+# Bucket widths counted for every timeline, in nanoseconds, finest first.
+LEVELS = (_SECOND, 60 * _SECOND, 3600 * _SECOND, 86400 * _SECOND)
+
+# Bar widths offered for histograms, narrowest first; each is a multiple of a
+# level, so its bars are sums of whole buckets.
+BAR_WIDTHS = tuple(n * _SECOND for n in (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+                                         86400, 7 * 86400, 30 * 86400))
+
+# Most bars a histogram is drawn with; the narrowest bar width that fits is used.
+MAX_BARS = 120
+
+
+def bar_layout(start_ns: int, end_ns: int, max_bars: int = MAX_BARS) -> tuple[int, int, int]:
+    """
+    Picks the bars of a histogram over a time range.
+
+    Args:
+        start_ns (int): Start of the range, in epoch nanoseconds.
+        end_ns (int): End of the range (inclusive).
+        max_bars (int, optional): Most bars wanted. Defaults to MAX_BARS.
+
+    Returns:
+        tuple: `(first, width, bars)`: the bars are `[first + i * width,
+               first + (i + 1) * width)`, aligned to multiples of `width`.
+    """
+    for width in BAR_WIDTHS:
+        first = start_ns // width * width
+        bars = end_ns // width - start_ns // width + 1
+        if bars <= max_bars:
+            break
+    return first, width, bars
+
+
+def width_label(width: int) -> str:
+    """Returns a bar width as text, e.g. "15 min" or "1 day"."""
+    seconds = width // _SECOND
+    for unit, name in ((86400, "day"), (3600, "h"), (60, "min"), (1, "s")):
+        if seconds % unit == 0:
+            count = seconds // unit
+            return f"{count} {name}s" if name == "day" and count > 1 else f"{count} {name}"
+
+
+class Timeline:
+    """
+    Line counts of one time-ordered run per second, minute, hour and day.
+
+    Every level keeps the ids of its non-empty buckets (`timestamp // width`)
+    and the running total of lines up to each, so the lines in any whole
+    buckets are the difference of two totals found by bisection, and all the
+    bars of a histogram come from one vectorised `searchsorted`. Ranges that
+    do not start or end on a bucket boundary are counted exactly by bisecting
+    the run's keys, which the timeline keeps a reference to.
+
+    Building a timeline is a few vectorised passes over the keys; lines
+    appended in time order are added with `extend()` without rebuilding.
+
+    Args:
+        keys (array): The run's timestamps in non-decreasing order (the keys
+                      of a `merge_utils.sorted_run`), without NO_TIMESTAMP.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.levels = [(np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)) for _ in LEVELS]
+        self._add(np.frombuffer(keys, dtype=np.int64) if len(keys) else np.empty(0, dtype=np.int64))
+
+    def _add(self, values: np.ndarray):
+        # Counts appended keys, which must not be earlier than the last one
+        if not len(values):
+            return
+        for n, width in enumerate(LEVELS):
+            ids, totals = self.levels[n]
+            buckets = values // width
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            counts = np.diff(np.r_[starts, len(buckets)])
+            new_ids = buckets[starts]
+            if len(ids) and new_ids[0] == ids[-1]:
+                # The first appended lines fall into the last bucket
+                totals = totals.copy()
+                totals[-1] += counts[0]
+                new_ids, counts = new_ids[1:], counts[1:]
+            self.levels[n] = (np.r_[ids, new_ids], np.r_[totals, totals[-1] + np.cumsum(counts)])
+
+    def extend(self, new_keys):
+        """
+        Counts keys appended to the run in time order.
+
+        `keys` is expected to already hold them (runs are extended in place);
+        `new_keys` must not be earlier than the keys counted before.
+        """
+        self._add(np.array(new_keys, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return int(self.levels[0][1][-1])
+
+    @property
+    def first(self) -> int | None:
+        """The earliest timestamp, or None if the run is empty."""
+        return self.keys[0] if len(self.keys) else None
+
+    @property
+    def last(self) -> int | None:
+        """The latest timestamp, or None if the run is empty."""
+        return self.keys[-1] if len(self.keys) else None
+
+    def count(self, start_ns: int, end_ns: int) -> int:
+        """Returns the number of lines with a timestamp in `[start_ns, end_ns)`."""
+        return bisect.bisect_left(self.keys, end_ns) - bisect.bisect_left(self.keys, start_ns)
+
+    def histogram(self, first: int, width: int, bars: int, start_ns: int = None, end_ns: int = None) -> np.ndarray:
+        """
+        Returns the number of lines in each of a row of equal-width bars.
+
+        Args:
+            first (int): Start of the first bar, a multiple of `width`.
+            width (int): Bar width in nanoseconds, a multiple of one of LEVELS.
+            bars (int): Number of bars.
+            start_ns (int, optional): Lines before this are not counted in the
+                                      first bar.
+            end_ns (int, optional): Lines after this (inclusive end) are not
+                                    counted in the last bar.
+
+        Returns:
+            numpy.ndarray: The int64 count of every bar.
+        """
+        n = max(i for i, level in enumerate(LEVELS) if width % level == 0)
+        ids, totals = self.levels[n]
+        level = LEVELS[n]
+        bounds = first // level + np.arange(bars + 1, dtype=np.int64) * (width // level)
+        counts = np.diff(totals[np.searchsorted(ids, bounds)])
+        if bars and start_ns is not None and start_ns > first:
+            counts[0] = self.count(start_ns, first + width)
+        if bars and end_ns is not None and end_ns < first + bars * width - 1:
+            last = first + (bars - 1) * width
+            counts[-1] = self.count(max(last, start_ns if start_ns is not None else last), end_ns + 1)
+        return counts
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the bucket counts, in bytes."""
+        return sum(ids.nbytes + totals.nbytes for ids, totals in self.levels)
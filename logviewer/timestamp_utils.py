@@ -2,11 +2,43 @@ import datetime
 import json
 import re
 
-def parse_timestamp(log_line: str) -> datetime.datetime | None:
+# Timestamps are stored as signed 64-bit nanoseconds since the epoch; lines
+# without a parseable timestamp get this sentinel value instead.
+NO_TIMESTAMP = -(2 ** 63)
+
+# Bumped whenever parsing results change, invalidating cached indexes.
+PARSER_VERSION = 1
+
+# Number of lines `detect_format` looks at when sniffing a file's format.
+SNIFF_LINES = 200
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MONTHS = {name: i for i, name in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], start=1)}
+_MONTHS_LOWER = {name.lower(): i for name, i in _MONTHS.items()}
+_PREFIX_CACHE_SIZE = 65536
+
+
+def to_epoch_ns(ts: datetime.datetime | None) -> int:
     """
-    Attempts to parse a timestamp from the beginning of a log line.
-    This function supports multiple timestamp formats.
+    Converts a naive datetime to nanoseconds since the epoch (NO_TIMESTAMP for None).
     """
+    if ts is None:
+        return NO_TIMESTAMP
+    delta = ts - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+def from_epoch_ns(ns: int) -> datetime.datetime | None:
+    """
+    Converts nanoseconds since the epoch back to a naive datetime (None for NO_TIMESTAMP).
+    """
+    if ns == NO_TIMESTAMP:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=ns // 1000)
+
+
+def _parse_iso(log_line: str) -> datetime.datetime | None:
     # Format 1: YYYY-MM-DD HH:MM:SS.milliseconds or YYYY-MM-DDTHH:MM:SS,SSS
     match = re.match(r'^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}[.,]\d{3})', log_line)
     if match:
@@ -14,7 +46,10 @@ def parse_timestamp(log_line: str) -> datetime.datetime | None:
             return datetime.datetime.strptime(match.group(1).replace('T', ' ').replace(',', '.'), '%Y-%m-%d %H:%M:%S.%f')
         except ValueError:
             pass
+    return None
 
+
+def _parse_syslog(log_line: str) -> datetime.datetime | None:
     # Format 2: "MMM DD HH:MM:SS" (e.g., "Jun 29 14:22:27")
     match = re.match(r'^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}', log_line)
     if match:
@@ -25,7 +60,10 @@ def parse_timestamp(log_line: str) -> datetime.datetime | None:
             return datetime.datetime.strptime(timestamp_str, '%Y %b %d %H:%M:%S')
         except ValueError:
             pass
+    return None
 
+
+def _parse_bracket(log_line: str) -> datetime.datetime | None:
     # Format 3: [YYYY-Mon-DD HH:MM:SS.ffffff]
     match = re.match(r'^\[(\d{4}-\w{3}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{6})\]', log_line)
     if match:
@@ -33,7 +71,10 @@ def parse_timestamp(log_line: str) -> datetime.datetime | None:
             return datetime.datetime.strptime(match.group(1), '%Y-%b-%d %H:%M:%S.%f') + datetime.timedelta(hours=2)
         except ValueError:
             pass
+    return None
+
 
+def _parse_json(log_line: str) -> datetime.datetime | None:
     # Format 4: JSON with asctime
     try:
         log_data = json.loads(log_line)
@@ -41,34 +82,208 @@ def parse_timestamp(log_line: str) -> datetime.datetime | None:
             return datetime.datetime.strptime(log_data['asctime'], '%Y-%m-%d %H:%M:%S,%f')
     except (json.JSONDecodeError, ValueError):
         pass
+    return None
+
+
+# The supported formats, in the order `parse_timestamp` tries them.
+FORMATS = (
+    ("iso", _parse_iso),
+    ("syslog", _parse_syslog),
+    ("bracket", _parse_bracket),
+    ("json", _parse_json),
+)
+
+
+def parse_timestamp(log_line: str) -> datetime.datetime | None:
+    """
+    Attempts to parse a timestamp from the beginning of a log line.
+    This function supports multiple timestamp formats.
+    """
+    for _, parser in FORMATS:
+        ts = parser(log_line)
+        if ts is not None:
+            return ts
+    return None
+
+
+def detect_format(log_lines: list[str]) -> str | None:
+    """
+    Returns the name of the format in FORMATS that parses most of the given lines,
+    or None if none of them has a timestamp.
+    """
+    counts = {}
+    for line in log_lines[:SNIFF_LINES]:
+        for name, parser in FORMATS:
+            if parser(line) is not None:
+                counts[name] = counts.get(name, 0) + 1
+                break
+    if not counts:
+        return None
+    return max(counts, key=counts.get)
+
+
+def _is_digits(text):
+    # strptime only accepts ASCII digits, so anything else takes the slow path.
+    return text.isdecimal() and text.isascii()
+
+
+def _remember(cache, key, base):
+    if len(cache) >= _PREFIX_CACHE_SIZE:
+        cache.clear()
+    cache[key] = base
 
+
+def _iso_ns(cache, line):
+    # "YYYY-MM-DD[T ]HH:MM:SS[.,]mmm": the first 19 characters are validated and
+    # converted once per distinct second, the milliseconds are sliced per line.
+    key = line[:19]
+    base = cache.get(key)
+    if base is None:
+        if len(key) != 19 or key[4] != '-' or key[7] != '-' or key[10] not in 'T ' \
+                or key[13] != ':' or key[16] != ':' \
+                or not _is_digits(key[0:4] + key[5:7] + key[8:10] + key[11:13] + key[14:16] + key[17:19]):
+            return None
+        try:
+            base = to_epoch_ns(datetime.datetime(int(key[0:4]), int(key[5:7]), int(key[8:10]),
+                                                 int(key[11:13]), int(key[14:16]), int(key[17:19])))
+        except ValueError:
+            return None
+        _remember(cache, key, base)
+    millis = line[20:23]
+    if len(millis) == 3 and line[19] in '.,' and _is_digits(millis):
+        return base + int(millis) * 1_000_000
+    return None
+
+
+def _syslog_ns(cache, line):
+    # "Mmm dd HH:MM:SS" or "Mmm  d HH:MM:SS", in the current year.
+    key = line[:15]
+    base = cache.get(key)
+    if base is None:
+        month = _MONTHS.get(key[:3])
+        if month is None or len(key) != 15 or key[3] != ' ' or key[6] != ' ' or key[9] != ':' or key[12] != ':' \
+                or not _is_digits(key[5] + key[7:9] + key[10:12] + key[13:15]) \
+                or not (key[4] == ' ' or _is_digits(key[4])):
+            return None
+        try:
+            base = to_epoch_ns(datetime.datetime(datetime.datetime.now().year, month, int(key[4:6]),
+                                                 int(key[7:9]), int(key[10:12]), int(key[13:15])))
+        except ValueError:
+            return None
+        _remember(cache, key, base)
+    return base
+
+
+def _bracket_ns(cache, line):
+    # "[YYYY-Mon-DD HH:MM:SS.ffffff]", shifted by the same two hours as `parse_timestamp`.
+    key = line[:21]
+    base = cache.get(key)
+    if base is None:
+        month = _MONTHS_LOWER.get(key[6:9].lower())
+        if month is None or len(key) != 21 or key[0] != '[' or key[5] != '-' or key[9] != '-' or key[12] != ' ' \
+                or key[15] != ':' or key[18] != ':' \
+                or not _is_digits(key[1:5] + key[10:12] + key[13:15] + key[16:18] + key[19:21]):
+            return None
+        try:
+            base = to_epoch_ns(datetime.datetime(int(key[1:5]), month, int(key[10:12]),
+                                                 int(key[13:15]), int(key[16:18]), int(key[19:21]))
+                               + datetime.timedelta(hours=2))
+        except ValueError:
+            return None
+        _remember(cache, key, base)
+    micros = line[22:28]
+    if line[21:22] == '.' and line[28:29] == ']' and len(micros) == 6 and _is_digits(micros):
+        return base + int(micros) * 1000
     return None
 
+
+def _json_ns(cache, line):
+    # JSON lines still need a full decode, but the "YYYY-MM-DD HH:MM:SS,fff"
+    # asctime value goes through the same per-second cache as ISO lines.
+    try:
+        log_data = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(log_data, dict):
+        return None
+    asctime = log_data.get('asctime')
+    if not isinstance(asctime, str) or len(asctime) != 23 or asctime[10] != ' ' or asctime[19] != ',':
+        return None
+    return _iso_ns(cache, asctime)
+
+
+_FAST_PARSERS = {
+    "iso": _iso_ns,
+    "syslog": _syslog_ns,
+    "bracket": _bracket_ns,
+    "json": _json_ns,
+}
+
+
+class TimestampParser:
+    """
+    Timestamp parser specialised for one file's format.
+
+    Lines in the expected format are parsed by slicing fixed offsets and
+    calling `int()` instead of running the regex/strptime chain, and the
+    conversion of each distinct second is cached. Any line the fast path does
+    not recognise falls back to `parse_timestamp`, so the results are the same
+    as calling `parse_timestamp` on every line.
+
+    Args:
+        fmt (str, optional): One of the names in FORMATS, typically from
+                             `detect_format`. None always uses the full chain.
+    """
+
+    def __init__(self, fmt: str | None = None):
+        self.format = fmt
+        self._fast = _FAST_PARSERS.get(fmt)
+        self._cache = {}
+
+    @classmethod
+    def for_lines(cls, log_lines: list[str]) -> "TimestampParser":
+        """
+        Creates a parser for the format detected in the first lines of a file.
+        """
+        return cls(detect_format(log_lines))
+
+    def parse_ns(self, log_line: str) -> int:
+        """
+        Returns the line's timestamp in epoch nanoseconds, or NO_TIMESTAMP.
+        """
+        if self._fast is not None:
+            ns = self._fast(self._cache, log_line)
+            if ns is not None:
+                return ns
+        return to_epoch_ns(parse_timestamp(log_line))
+
+    def __call__(self, log_line: str) -> datetime.datetime | None:
+        return from_epoch_ns(self.parse_ns(log_line))
+
+
 def get_timestamp_range(log_lines: list[str]) -> tuple[datetime.datetime | None, datetime.datetime | None]:
     """
     Parses timestamps from a list of log lines and returns the earliest and latest timestamps found.
     """
-    min_ts = None
-    max_ts = None
-    for line in log_lines:
-        ts = parse_timestamp(line)
-        if ts:
-            if min_ts is None or ts < min_ts:
-                min_ts = ts
-            if max_ts is None or ts > max_ts:
-                max_ts = ts
-    return min_ts, max_ts
+    parser = TimestampParser.for_lines(log_lines)
+    timestamps = [ts for ts in map(parser.parse_ns, log_lines) if ts != NO_TIMESTAMP]
+    if not timestamps:
+        return None, None
+    return from_epoch_ns(min(timestamps)), from_epoch_ns(max(timestamps))
 
 def filter_by_time_range(log_lines: list[str], start_time: datetime.datetime | None, end_time: datetime.datetime | None) -> list[str]:
     """
     Filters log lines to include only those within a specified time range.
     Lines without a parseable timestamp are excluded.
     """
+    parser = TimestampParser.for_lines(log_lines)
+    start_ns = to_epoch_ns(start_time) if start_time is not None else None
+    end_ns = to_epoch_ns(end_time) if end_time is not None else None
     filtered_lines = []
     for line in log_lines:
-        ts = parse_timestamp(line)
-        if ts:
-            if (start_time is None or ts >= start_time) and \
-               (end_time is None or ts <= end_time):
+        ts = parser.parse_ns(line)
+        if ts != NO_TIMESTAMP:
+            if (start_ns is None or ts >= start_ns) and \
+               (end_ns is None or ts <= end_ns):
                 filtered_lines.append(line)
     return filtered_lines
@@ -0,0 +1,312 @@
+import array
+import bisect
+import itertools
+import os
+import re
+import numpy as np
+from .filter_utils import required_literal
+from .timestamp_utils import NO_TIMESTAMP
+
+# Build a token index for every uploaded log ("1"); off by default since it
+# about doubles the time to load a log.
+TOKEN_INDEX = os.environ.get("LOGVIEWER_TOKEN_INDEX", "") == "1"
+
+# Bytes of a log tokenized at a time while building its index; the temporary
+# arrays take about ten times as much.
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# A query fragment contained in more distinct tokens than this does not narrow
+# the candidates: the union of their posting lists would cover most lines.
+MAX_EXPANSION = 4096
+
+# Tokens are runs of ASCII letters, digits and underscores of the lower-cased
+# line. Lines with non-ASCII bytes are recorded too, since their Unicode
+# lower-casing may differ from the ASCII one.
+_WORD_BYTES = np.zeros(256, dtype=bool)
+_WORD_BYTES[list(b"0123456789abcdefghijklmnopqrstuvwxyz_")] = True
+_QUERY_TOKENS = re.compile(rb"[0-9a-z_]+")
+
+# Multiplier of the polynomial token hash (odd, so no bits are lost).
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Encodings of a posting list: deltas as uint8, uint16 or uint32, or a bitmap.
+_DELTA_TYPES = (np.uint8, np.uint16, np.uint32)
+_BITMAP = len(_DELTA_TYPES)
+
+
+def _run_starts(values: np.ndarray) -> np.ndarray:
+    # Positions where a run of equal values starts in a sorted array.
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+def _unique(values: np.ndarray) -> np.ndarray:
+    # Sorted distinct values; sorting and masking is much faster than
+    # numpy.unique for large integer arrays.
+    values = np.sort(values)
+    return values[_run_starts(values)]
+
+
+def _longest_first(lengths: np.ndarray) -> np.ndarray:
+    # Order of the tokens by decreasing length, so that the ones still running
+    # at a character position are always a prefix. A stable sort of 16-bit
+    # keys is a radix sort
+    key = -lengths.astype(np.int16 if len(lengths) and lengths.max() < 2 ** 15 else np.int64)
+    return np.argsort(key, kind="stable")
+
+
+def _hash_tokens(buf: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # 64-bit polynomial hashes of the tokens buf[starts[i]:starts[i] + lengths[i]],
+    # one vectorised step per character position
+    order = _longest_first(lengths)
+    starts, lengths = starts[order], lengths[order]
+    hashes = lengths.astype(np.uint64)
+    for k in range(int(lengths[0]) if len(lengths) else 0):
+        running = np.searchsorted(-lengths, -k, side="left")
+        hashes[:running] = hashes[:running] * _HASH_MULTIPLIER + buf[starts[:running] + k]
+    result = np.empty_like(hashes)
+    result[order] = hashes
+    return result
+
+
+def _differ(buf: np.ndarray, starts: np.ndarray, lengths: np.ndarray, other_starts: np.ndarray,
+            other_lengths: np.ndarray) -> np.ndarray:
+    # Whether each token buf[starts[i]:starts[i] + lengths[i]] differs from the
+    # token at other_starts[i], compared like _hash_tokens hashes them
+    result = lengths != other_lengths
+    same = np.flatnonzero(~result)
+    order = _longest_first(lengths[same])
+    same = same[order]
+    starts, other_starts, lengths = starts[same], other_starts[same], lengths[same]
+    differ = np.zeros(len(same), dtype=bool)
+    for k in range(int(lengths[0]) if len(lengths) else 0):
+        running = np.searchsorted(-lengths, -k, side="left")
+        differ[:running] |= buf[starts[:running] + k] != buf[other_starts[:running] + k]
+    result[same] = differ
+    return result
+
+
+class TokenIndex:
+    """
+    Inverted index of the tokens of a log, for narrowing text and regex filters.
+
+    Every token maps to the sorted ids of the lines containing it. A posting
+    list is stored as its first line id plus the gaps to the next ones in the
+    narrowest unsigned type that holds its largest gap, or as a bitmap over all
+    lines when that is smaller, as it is for tokens found on most lines.
+
+    The index answers "which lines may contain this text": each token of the
+    query must occur inside a token of the line, so the candidates are the
+    intersection, over the query's tokens, of the union of the posting lists
+    of the vocabulary entries containing it. Candidates are a superset of the
+    matches; the filters still run on them, so results are unchanged. For
+    case-insensitive queries lines with non-ASCII bytes are always candidates,
+    since their Unicode lower-casing is not indexed.
+
+    The lines are tokenized with vectorised byte classification and the
+    occurrences are grouped by a 64-bit hash of the token, so building the
+    index costs a few passes over the bytes plus Python work per distinct
+    token rather than per occurrence. Every occurrence is then compared with
+    the first one of its group, and the rare ones whose token only shares the
+    hash are looked up by their bytes.
+
+    Args:
+        data: The mapped file contents.
+        offsets (array): Byte offset of every line, followed by the end of the
+                         last line (`LineStore.offsets`).
+    """
+
+    def __init__(self, data, offsets):
+        self.lines = len(offsets) - 1
+        vocab = {}
+        keys = []
+        non_ascii = []
+        first = 0
+        while first < self.lines:
+            last = max(bisect.bisect_right(offsets, offsets[first] + CHUNK_BYTES, first, self.lines), first + 1)
+            raw = data[offsets[first]:offsets[last]].lower()
+            buf = np.frombuffer(raw, dtype=np.uint8)
+            newlines = np.flatnonzero(buf == ord("\n"))
+            non_ascii.append(first + np.searchsorted(newlines, np.flatnonzero(buf >= 0x80)))
+
+            edges = np.diff(_WORD_BYTES[buf].view(np.int8), prepend=0, append=0)
+            starts = np.flatnonzero(edges == 1)
+            lengths = np.flatnonzero(edges == -1) - starts
+            hashes = _hash_tokens(buf, starts, lengths)
+            line_ids = first + np.searchsorted(newlines, starts)
+
+            # Group the occurrences by hash and number the distinct tokens,
+            # adding new ones to the vocabulary
+            order = np.argsort(hashes)
+            hashes = hashes[order]
+            bounds = _run_starts(hashes)
+            firsts = order[bounds]
+            ids = np.fromiter((vocab.setdefault(raw[start:start + length], len(vocab))
+                               for start, length in zip(starts[firsts].tolist(), lengths[firsts].tolist())),
+                              dtype=np.int64, count=len(bounds))
+
+            sizes = np.diff(np.r_[bounds, len(hashes)])
+            ids = np.repeat(ids, sizes)
+
+            # Equal hashes do not imply equal tokens: any odd multiplier has
+            # colliding pairs, which must not share a posting list
+            sorted_starts, sorted_lengths = starts[order], lengths[order]
+            firsts = np.repeat(firsts, sizes)
+            collided = _differ(buf, sorted_starts, sorted_lengths, starts[firsts], lengths[firsts])
+            for j in np.flatnonzero(collided).tolist():
+                start, length = int(sorted_starts[j]), int(sorted_lengths[j])
+                ids[j] = vocab.setdefault(raw[start:start + length], len(vocab))
+
+            keys.append(_unique((ids << 32) | line_ids[order]))
+            first = last
+
+        keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+        token_ids = keys >> 32
+        line_ids = keys & 0xFFFFFFFF
+        self.non_ascii = _unique(np.concatenate(non_ascii)) if non_ascii else np.empty(0, dtype=np.int64)
+
+        # Vocabulary entries, in token order, joined for substring searches
+        words = list(vocab)
+        self._words = b"\n".join(words) + b"\n"
+        self._word_starts = np.cumsum([0] + [len(word) + 1 for word in words[:-1]])
+
+        # Every token has at least one line, so the runs of token ids are in
+        # vocabulary order
+        starts = _run_starts(token_ids)
+        counts = np.diff(np.r_[starts, len(line_ids)])
+        gaps = np.diff(line_ids, prepend=0)
+        gaps[starts] = 0
+        largest = np.maximum.reduceat(gaps, starts) if len(starts) else np.empty(0, dtype=np.int64)
+        encoding = np.select([largest < 2 ** 8, largest < 2 ** 16], [0, 1], 2)
+        delta_bytes = (counts - 1) * np.choose(encoding, [1, 2, 4])
+        encoding[delta_bytes > (self.lines + 7) // 8] = _BITMAP
+
+        self._firsts = line_ids[starts].astype(np.uint32)
+        self._encoding = encoding.astype(np.uint8)
+        self._counts = counts.astype(np.uint32)
+        self._positions = np.zeros(len(starts), dtype=np.int64)
+        element_encoding = np.repeat(encoding, counts)
+        element_encoding[starts] = -1
+        self._deltas = []
+        for code, dtype in enumerate(_DELTA_TYPES):
+            self._deltas.append(gaps[element_encoding == code].astype(dtype))
+            tokens = encoding == code
+            self._positions[tokens] = np.cumsum(counts[tokens] - 1) - (counts[tokens] - 1)
+        self._bitmaps = {}
+        for t in np.flatnonzero(encoding == _BITMAP).tolist():
+            bits = np.zeros(self.lines, dtype=bool)
+            bits[line_ids[starts[t]:starts[t] + counts[t]]] = True
+            self._bitmaps[t] = np.packbits(bits)
+
+    def __len__(self) -> int:
+        return len(self._firsts)
+
+    def posting(self, t: int) -> np.ndarray:
+        """Returns the sorted line ids of token number `t` of the vocabulary."""
+        encoding = self._encoding[t]
+        if encoding == _BITMAP:
+            return np.flatnonzero(np.unpackbits(self._bitmaps[t], count=self.lines))
+        position = self._positions[t]
+        deltas = self._deltas[encoding][position:position + self._counts[t] - 1]
+        return np.cumsum(np.r_[np.int64(self._firsts[t]), deltas.astype(np.int64)])
+
+    def containing(self, fragment: bytes, limit: int = MAX_EXPANSION) -> np.ndarray | None:
+        """
+        Returns the numbers of the vocabulary tokens containing `fragment`, or None if it occurs more than `limit` times.
+        """
+        matches = itertools.islice(re.finditer(re.escape(fragment), self._words), limit + 1)
+        positions = [m.start() for m in matches]
+        if len(positions) > limit:
+            return None
+        return _unique(np.searchsorted(self._word_starts, positions, side="right") - 1)
+
+    def lookup(self, text: str, case_sensitive: bool = True) -> np.ndarray | None:
+        """
+        Returns the sorted ids of the lines that may contain `text`.
+
+        Args:
+            text (str): The text searched for.
+            case_sensitive (bool, optional): Whether `text` is matched as is or
+                                             against the lower-cased line.
+
+        Returns:
+            numpy.ndarray: The candidate line ids, or None if the index cannot
+                           narrow the search (e.g. `text` has no tokens).
+        """
+        # Case-sensitive text must occur as is, so it is lower-cased like the
+        # indexed lines; otherwise it is matched in the Unicode-lowered line
+        encoded = text.encode().lower() if case_sensitive else text.lower().encode()
+        fragments = sorted(set(_QUERY_TOKENS.findall(encoded)), key=len, reverse=True)
+        result = None
+        for fragment in fragments:
+            tokens = self.containing(fragment)
+            if tokens is None:
+                continue
+            postings = [self.posting(t) for t in tokens.tolist()]
+            lines = _unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64)
+            result = lines if result is None else np.intersect1d(result, lines, assume_unique=True)
+            if not len(result):
+                break
+        if result is not None and not case_sensitive:
+            result = _unique(np.concatenate([result, self.non_ascii]))
+        return result
+
+    def candidates(self, plan) -> np.ndarray | None:
+        """
+        Returns the sorted ids of the lines that may pass the include rules of a `FilterPlan`.
+
+        Includes are OR'ed, so this is the union of each include rule's
+        candidates. Regex rules are looked up by their `required_literal`.
+
+        Returns:
+            numpy.ndarray: The candidate line ids, or None if the plan has no
+                           include rules or one of them cannot be looked up.
+        """
+        if not plan.has_includes or plan.include_all:
+            return None
+        parts = []
+        for kind, matcher, case_sensitive in plan.includes:
+            if kind == "text":
+                lines = self.lookup(matcher, case_sensitive)
+            elif kind == "regex":
+                literal, folded = required_literal(matcher)
+                lines = self.lookup(literal, not folded) if literal is not None else None
+            else:
+                lines = None
+            if lines is None:
+                return None
+            parts.append(lines)
+        return _unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def narrow(self, plan, timestamps, indices=None) -> array.array | None:
+        """
+        Narrows the lines a `FilterPlan` has to evaluate to the index's candidates.
+
+        Args:
+            plan (FilterPlan): The compiled filters.
+            timestamps (array): The lines' timestamps, for dropping lines
+                                without one when `indices` is not given.
+            indices (array, optional): Sorted line ids to narrow. Defaults to
+                                       every line with a timestamp.
+
+        Returns:
+            array.array: The sorted candidate line ids, or None if the index
+                         cannot narrow the plan.
+        """
+        candidates = self.candidates(plan)
+        if candidates is None:
+            return None
+        if indices is None:
+            candidates = candidates[np.frombuffer(timestamps, dtype=np.int64)[candidates] != NO_TIMESTAMP]
+        else:
+            candidates = np.intersect1d(np.asarray(indices, dtype=np.int64), candidates, assume_unique=True)
+        narrowed = array.array("q")
+        narrowed.frombytes(candidates.astype(np.int64).tobytes())
+        return narrowed
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the index, in bytes."""
+        arrays = [self.non_ascii, self._word_starts, self._firsts, self._encoding, self._counts, self._positions]
+        return (len(self._words) + sum(a.nbytes for a in arrays) + sum(a.nbytes for a in self._deltas)
+                + sum(a.nbytes for a in self._bitmaps.values()))